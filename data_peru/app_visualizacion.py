@@ -5,11 +5,12 @@ Aplicación Streamlit para visualizar datos del Reporte de Seguimiento Perú 201
 
 import streamlit as st
 import pandas as pd
-import sqlite3
 import plotly.graph_objects as go
 import plotly.express as px
 from pathlib import Path
 
+from datos_app import cargar_datos, listar_tablas, leer_tabla, esquema_tabla
+
 # Configuración de página
 st.set_page_config(
     page_title="Análisis Sector Cemento Perú",
@@ -18,7 +19,6 @@ st.set_page_config(
 )
 
 # Rutas
-DB_PATH = Path(__file__).parent / "peru_consolidado.db"
 GRAFICOS_PATH = Path(__file__).parent / "graficos"
 REPORTES_HR_PATH = Path(__file__).parent / "reportes_hr"
 
@@ -129,60 +129,9 @@ METAS_HR_2030 = {
     },
 }
 
-def cargar_agregados_nacionales():
-    """Carga agregados nacionales desde la base de datos."""
-    conn = sqlite3.connect(DB_PATH)
-    query = """
-        SELECT
-            codigo_indicador,
-            año,
-            valor_nacional,
-            tipo_agregacion,
-            num_empresas
-        FROM agregados_nacionales
-        ORDER BY codigo_indicador, año
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
-
-def cargar_datos_empresas():
-    """Carga datos por empresa (nivel 2: suma de plantas)."""
-    conn = sqlite3.connect(DB_PATH)
-    query = """
-        SELECT
-            e.codigo_empresa,
-            de.codigo_indicador,
-            de.año,
-            de.valor
-        FROM datos_empresas de
-        JOIN empresas e ON de.id_empresa = e.id_empresa
-        WHERE de.mes IS NULL
-        ORDER BY de.año, e.codigo_empresa, de.codigo_indicador
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
-
-def cargar_datos_pdf():
-    """Carga datos extraídos del PDF de referencia."""
-    conn = sqlite3.connect(DB_PATH)
-    query = """
-        SELECT
-            codigo_indicador,
-            año,
-            valor,
-            unidad
-        FROM datos_pdf_referencia
-        ORDER BY codigo_indicador, año
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
-
-def crear_grafico_trayectoria_hr(df_agregados, codigo_indicador, meta_info):
+def crear_grafico_trayectoria_hr(datos, codigo_indicador, meta_info):
     """Crea gráfico interactivo de trayectoria hacia meta 2030 con Plotly."""
-    df_ind = df_agregados[df_agregados['codigo_indicador'] == codigo_indicador].copy()
+    df_ind = datos.agregado(codigo_indicador)
 
     if len(df_ind) == 0:
         return None
@@ -275,17 +224,16 @@ def crear_grafico_trayectoria_hr(df_agregados, codigo_indicador, meta_info):
     return fig
 
 
-def crear_grafico_progreso_metas(df_agregados):
+def crear_grafico_progreso_metas(datos):
     """Crea gráfico interactivo de barras con progreso hacia metas 2030."""
     resultados = []
 
     for codigo, meta_info in METAS_HR_2030.items():
-        df_ind = df_agregados[df_agregados['codigo_indicador'] == codigo].copy()
+        df_ind = datos.agregado(codigo)
 
         if len(df_ind) == 0:
             continue
 
-        df_ind = df_ind.sort_values('año')
         valor_actual = df_ind['valor_nacional'].iloc[-1]
         año_actual = df_ind['año'].iloc[-1]
 
@@ -364,11 +312,11 @@ def crear_grafico_progreso_metas(df_agregados):
     return fig
 
 
-def crear_grafico_serie_temporal(df_agregados, df_empresas, indicador, mostrar_empresas=True, df_pdf=None,
+def crear_grafico_serie_temporal(datos, indicador, mostrar_empresas=True,
                                 mostrar_pdf=True, mostrar_calculado=True,
                                 mostrar_pacas=True, mostrar_yura=True, mostrar_unacem=True):
     """Crea gráfico de serie temporal para un indicador con datos por empresa, agregado y PDF."""
-    df_ind = df_agregados[df_agregados['codigo_indicador'] == indicador].copy()
+    df_ind = datos.agregado(indicador)
 
     if len(df_ind) == 0:
         return None
@@ -381,7 +329,7 @@ def crear_grafico_serie_temporal(df_agregados, df_empresas, indicador, mostrar_e
 
     # Si se solicita, agregar datos por empresa con control individual
     if mostrar_empresas:
-        df_empresas_ind = df_empresas[df_empresas['codigo_indicador'] == indicador].copy()
+        df_empresas_ind = datos.empresas_indicador(indicador)
 
         empresas_config = {
             'PACAS': {'mostrar': mostrar_pacas, 'color': '#E63946'},
@@ -404,8 +352,8 @@ def crear_grafico_serie_temporal(df_agregados, df_empresas, indicador, mostrar_e
                 ))
 
     # Agregar línea del PDF si está disponible y activado
-    if mostrar_pdf and df_pdf is not None:
-        df_pdf_ind = df_pdf[df_pdf['codigo_indicador'] == indicador].copy()
+    if mostrar_pdf:
+        df_pdf_ind = datos.pdf_indicador(indicador).copy()
         if len(df_pdf_ind) > 0:
             unidad_pdf = df_pdf_ind.iloc[0]['unidad']
 
@@ -483,10 +431,9 @@ with st.sidebar:
     - UNACEM
     """)
 
-# Cargar datos
-df_agregados = cargar_agregados_nacionales()
-df_empresas = cargar_datos_empresas()
-df_pdf = cargar_datos_pdf()
+# Cargar datos (caché compartida, se recarga solo si cambió la base)
+datos = cargar_datos()
+df_agregados = datos.agregados
 
 # ============================================================================
 # PÁGINA 1: DASHBOARD GENERAL
@@ -503,13 +450,7 @@ if pagina == "📊 Dashboard General":
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        prod_clinker = df_agregados[
-            (df_agregados['codigo_indicador'] == '8') &
-            (df_agregados['año'] == año_actual)
-        ]['valor_nacional'].values[0] if len(df_agregados[
-            (df_agregados['codigo_indicador'] == '8') &
-            (df_agregados['año'] == año_actual)
-        ]) > 0 else 0
+        prod_clinker = datos.valor('8', año_actual)
         st.metric(
             "Producción Clínker",
             f"{prod_clinker/1_000_000:.2f} Mt",
@@ -517,13 +458,7 @@ if pagina == "📊 Dashboard General":
         )
 
     with col2:
-        prod_cemento = df_agregados[
-            (df_agregados['codigo_indicador'] == '20') &
-            (df_agregados['año'] == año_actual)
-        ]['valor_nacional'].values[0] if len(df_agregados[
-            (df_agregados['codigo_indicador'] == '20') &
-            (df_agregados['año'] == año_actual)
-        ]) > 0 else 0
+        prod_cemento = datos.valor('20', año_actual)
         st.metric(
             "Producción Cemento",
             f"{prod_cemento/1_000_000:.2f} Mt",
@@ -531,13 +466,7 @@ if pagina == "📊 Dashboard General":
         )
 
     with col3:
-        factor_clinker = df_agregados[
-            (df_agregados['codigo_indicador'] == '92a') &
-            (df_agregados['año'] == año_actual)
-        ]['valor_nacional'].values[0] if len(df_agregados[
-            (df_agregados['codigo_indicador'] == '92a') &
-            (df_agregados['año'] == año_actual)
-        ]) > 0 else 0
+        factor_clinker = datos.valor('92a', año_actual)
         st.metric(
             "Factor Clínker",
             f"{factor_clinker*100:.1f}%",
@@ -545,13 +474,7 @@ if pagina == "📊 Dashboard General":
         )
 
     with col4:
-        emisiones = df_agregados[
-            (df_agregados['codigo_indicador'] == '62a') &
-            (df_agregados['año'] == año_actual)
-        ]['valor_nacional'].values[0] if len(df_agregados[
-            (df_agregados['codigo_indicador'] == '62a') &
-            (df_agregados['año'] == año_actual)
-        ]) > 0 else 0
+        emisiones = datos.valor('62a', año_actual)
         st.metric(
             "Emisiones CO₂ Cementitious",
             f"{emisiones:.0f} kg/t",
@@ -588,13 +511,13 @@ if pagina == "📊 Dashboard General":
 
     with col1:
         st.subheader("Producción de Clínker")
-        fig1 = crear_grafico_serie_temporal(df_agregados, df_empresas, '8', mostrar_empresas, df_pdf, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
+        fig1 = crear_grafico_serie_temporal(datos, '8', mostrar_empresas, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
         if fig1:
             st.plotly_chart(fig1, use_container_width=True)
 
     with col2:
         st.subheader("Producción de Cemento")
-        fig2 = crear_grafico_serie_temporal(df_agregados, df_empresas, '20', mostrar_empresas, df_pdf, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
+        fig2 = crear_grafico_serie_temporal(datos, '20', mostrar_empresas, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
         if fig2:
             st.plotly_chart(fig2, use_container_width=True)
 
@@ -604,13 +527,13 @@ if pagina == "📊 Dashboard General":
 
     with col3:
         st.subheader("Factor Clínker")
-        fig3 = crear_grafico_serie_temporal(df_agregados, df_empresas, '92a', mostrar_empresas, df_pdf, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
+        fig3 = crear_grafico_serie_temporal(datos, '92a', mostrar_empresas, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
         if fig3:
             st.plotly_chart(fig3, use_container_width=True)
 
     with col4:
         st.subheader("Consumo de Clínker")
-        fig4 = crear_grafico_serie_temporal(df_agregados, df_empresas, '11', mostrar_empresas, df_pdf, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
+        fig4 = crear_grafico_serie_temporal(datos, '11', mostrar_empresas, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
         if fig4:
             st.plotly_chart(fig4, use_container_width=True)
 
@@ -620,13 +543,13 @@ if pagina == "📊 Dashboard General":
 
     with col5:
         st.subheader("Emisiones CO₂ Clínker")
-        fig5 = crear_grafico_serie_temporal(df_agregados, df_empresas, '60a', mostrar_empresas, df_pdf, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
+        fig5 = crear_grafico_serie_temporal(datos, '60a', mostrar_empresas, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
         if fig5:
             st.plotly_chart(fig5, use_container_width=True)
 
     with col6:
         st.subheader("Emisiones CO₂ Cementitious")
-        fig6 = crear_grafico_serie_temporal(df_agregados, df_empresas, '62a', mostrar_empresas, df_pdf, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
+        fig6 = crear_grafico_serie_temporal(datos, '62a', mostrar_empresas, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
         if fig6:
             st.plotly_chart(fig6, use_container_width=True)
 
@@ -636,13 +559,13 @@ if pagina == "📊 Dashboard General":
 
     with col7:
         st.subheader("Eficiencia Térmica")
-        fig7 = crear_grafico_serie_temporal(df_agregados, df_empresas, '93', mostrar_empresas, df_pdf, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
+        fig7 = crear_grafico_serie_temporal(datos, '93', mostrar_empresas, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
         if fig7:
             st.plotly_chart(fig7, use_container_width=True)
 
     with col8:
         st.subheader("Consumo Eléctrico Específico")
-        fig8 = crear_grafico_serie_temporal(df_agregados, df_empresas, '97', mostrar_empresas, df_pdf, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
+        fig8 = crear_grafico_serie_temporal(datos, '97', mostrar_empresas, mostrar_pdf, mostrar_calculado, mostrar_pacas, mostrar_yura, mostrar_unacem)
         if fig8:
             st.plotly_chart(fig8, use_container_width=True)
 
@@ -655,11 +578,7 @@ elif pagina == "🗄️ Explorador BD":
     st.markdown("Visualiza el contenido completo de cualquier tabla de la base de datos.")
 
     # Obtener lista de tablas
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
-    tablas = [row[0] for row in cursor.fetchall()]
-    conn.close()
+    tablas = listar_tablas()
 
     # Selector de tabla
     tabla_seleccionada = st.selectbox(
@@ -673,20 +592,7 @@ elif pagina == "🗄️ Explorador BD":
 
     if tabla_seleccionada:
         # Cargar datos de la tabla seleccionada
-        conn = sqlite3.connect(DB_PATH)
-
-        if ver_primeros_50:
-            query = f"SELECT * FROM {tabla_seleccionada} LIMIT 50"
-        else:
-            query = f"SELECT * FROM {tabla_seleccionada}"
-
-        df_tabla = pd.read_sql_query(query, conn)
-
-        # Obtener información adicional sobre la tabla
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT COUNT(*) FROM {tabla_seleccionada}")
-        total_registros = cursor.fetchone()[0]
-        conn.close()
+        df_tabla, total_registros = leer_tabla(tabla_seleccionada, 50 if ver_primeros_50 else None)
 
         # Mostrar información
         col1, col2, col3 = st.columns(3)
@@ -712,13 +618,7 @@ elif pagina == "🗄️ Explorador BD":
 
         # Mostrar esquema de la tabla
         with st.expander("Ver esquema de la tabla"):
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute(f"PRAGMA table_info({tabla_seleccionada})")
-            esquema = cursor.fetchall()
-            conn.close()
-
-            df_esquema = pd.DataFrame(esquema, columns=['cid', 'name', 'type', 'notnull', 'dflt_value', 'pk'])
+            df_esquema = esquema_tabla(tabla_seleccionada)
             st.dataframe(df_esquema, use_container_width=True, hide_index=True)
 
 # ============================================================================
@@ -788,7 +688,7 @@ elif pagina == "🎯 Metas HR 2030":
         meta_info = METAS_HR_2030.get(codigo)
         if meta_info:
             with cols[idx % 2]:
-                fig = crear_grafico_trayectoria_hr(df_agregados, codigo, meta_info)
+                fig = crear_grafico_trayectoria_hr(datos, codigo, meta_info)
                 if fig:
                     st.plotly_chart(fig, use_container_width=True, key=f"tray_princ_{codigo}")
                 else:
@@ -801,7 +701,7 @@ elif pagina == "🎯 Metas HR 2030":
         meta_info = METAS_HR_2030.get(codigo)
         if meta_info:
             with cols[idx % 2]:
-                fig = crear_grafico_trayectoria_hr(df_agregados, codigo, meta_info)
+                fig = crear_grafico_trayectoria_hr(datos, codigo, meta_info)
                 if fig:
                     st.plotly_chart(fig, use_container_width=True, key=f"tray_sec_{codigo}")
                 else:
@@ -814,7 +714,7 @@ elif pagina == "🎯 Metas HR 2030":
         meta_info = METAS_HR_2030.get(codigo)
         if meta_info:
             with cols[idx % 2]:
-                fig = crear_grafico_trayectoria_hr(df_agregados, codigo, meta_info)
+                fig = crear_grafico_trayectoria_hr(datos, codigo, meta_info)
                 if fig:
                     st.plotly_chart(fig, use_container_width=True, key=f"tray_emi_{codigo}")
                 else:
@@ -824,7 +724,7 @@ elif pagina == "🎯 Metas HR 2030":
 
     # Gráfico de progreso general interactivo
     st.markdown("### 📊 Progreso General hacia Metas 2030")
-    fig_progreso = crear_grafico_progreso_metas(df_agregados)
+    fig_progreso = crear_grafico_progreso_metas(datos)
     if fig_progreso:
         st.plotly_chart(fig_progreso, use_container_width=True, key="progreso_metas")
 
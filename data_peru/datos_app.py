@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Acceso a datos de la aplicación de visualización Perú.
+
+Todas las sesiones de Streamlit comparten una sola conexión de solo lectura
+a peru_consolidado.db (WAL + mmap). Los agregados, los datos por empresa y
+los datos del PDF se cargan una vez por versión de la base (mtime del
+archivo y de su -wal + PRAGMA data_version) junto con sus cortes por
+indicador, así que cambiar de indicador o de página no vuelve a consultar
+la base. Al estar en un módulo aparte, la caché sobrevive a los reruns.
+"""
+
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+
+import pandas as pd
+
+# Rutas
+DB_PATH = Path(__file__).parent / "peru_consolidado.db"
+
+# Memoria mapeada para las lecturas (la base completa cabe de sobra)
+MMAP_BYTES = 256 * 1024 * 1024
+
+CONSULTAS = {
+    # Agregados nacionales
+    'agregados': """
+        SELECT
+            codigo_indicador,
+            año,
+            valor_nacional,
+            tipo_agregacion,
+            num_empresas
+        FROM agregados_nacionales
+        ORDER BY codigo_indicador, año
+    """,
+    # Datos por empresa (nivel 2: suma de plantas)
+    'empresas': """
+        SELECT
+            e.codigo_empresa,
+            de.codigo_indicador,
+            de.año,
+            de.valor
+        FROM datos_empresas de
+        JOIN empresas e ON de.id_empresa = e.id_empresa
+        WHERE de.mes IS NULL
+        ORDER BY de.año, e.codigo_empresa, de.codigo_indicador
+    """,
+    # Datos extraídos del PDF de referencia
+    'pdf': """
+        SELECT
+            codigo_indicador,
+            año,
+            valor,
+            unidad
+        FROM datos_pdf_referencia
+        ORDER BY codigo_indicador, año
+    """,
+}
+
+_conexion = None
+_cache = None
+_lock = threading.RLock()
+
+class DatosPeru:
+    """
+    DataFrames de la app para una versión de la base, con cortes por indicador.
+
+    Los DataFrames se comparten entre sesiones: quien los modifique debe
+    trabajar sobre una copia.
+    """
+
+    def __init__(self, agregados, empresas, pdf, version):
+        self.agregados = agregados
+        self.empresas = empresas
+        self.pdf = pdf
+        self.version = version
+
+        self._agregados_ind = _por_indicador(agregados)
+        self._empresas_ind = _por_indicador(empresas)
+        self._pdf_ind = _por_indicador(pdf)
+        # Primer valor de cada (indicador, año), como .values[0] sobre el filtro
+        self._valores = {}
+        for codigo, año, valor in zip(agregados['codigo_indicador'], agregados['año'], agregados['valor_nacional']):
+            self._valores.setdefault((codigo, año), valor)
+
+    def agregado(self, indicador):
+        """Agregados nacionales de un indicador (ordenados por año)."""
+        return self._agregados_ind.get(indicador, self.agregados.iloc[0:0])
+
+    def empresas_indicador(self, indicador):
+        """Datos por empresa de un indicador."""
+        return self._empresas_ind.get(indicador, self.empresas.iloc[0:0])
+
+    def pdf_indicador(self, indicador):
+        """Datos del PDF de referencia de un indicador."""
+        return self._pdf_ind.get(indicador, self.pdf.iloc[0:0])
+
+    def valor(self, indicador, año, defecto=0):
+        """Valor nacional de un indicador en un año (defecto si no existe)."""
+        return self._valores.get((indicador, año), defecto)
+
+def _por_indicador(df):
+    """Corte de df por codigo_indicador, conservando el orden de la consulta."""
+    return {codigo: grupo for codigo, grupo in df.groupby('codigo_indicador', sort=False)}
+
+def _activar_wal():
+    """Deja la base en modo WAL (persistente) para leer mientras los scripts escriben."""
+    if not DB_PATH.exists():
+        return
+
+    try:
+        with closing(sqlite3.connect(DB_PATH)) as conn:
+            if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != 'wal':
+                conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.Error as e:
+        print(f"⚠️  No se pudo activar WAL en {DB_PATH.name}: {e}")
+
+def conexion():
+    """Conexión de solo lectura compartida (se abre en el primer uso)."""
+    global _conexion
+    with _lock:
+        if _conexion is None:
+            _activar_wal()
+            _conexion = sqlite3.connect(f"{DB_PATH.as_uri()}?mode=ro", uri=True, check_same_thread=False)
+            _conexion.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+            _conexion.execute("PRAGMA query_only = ON")
+        return _conexion
+
+def version_bd():
+    """
+    Versión de la base: cambia cuando otro proceso confirma una escritura.
+
+    Returns:
+        Tupla (mtime base, mtime -wal, PRAGMA data_version)
+    """
+    with _lock:
+        data_version = conexion().execute("PRAGMA data_version").fetchone()[0]
+
+    wal = DB_PATH.with_name(DB_PATH.name + '-wal')
+    return (
+        DB_PATH.stat().st_mtime_ns,
+        wal.stat().st_mtime_ns if wal.exists() else None,
+        data_version
+    )
+
+def cargar_datos():
+    """
+    Datos de la app para la versión actual de la base.
+
+    Solo consulta la base si cambió desde la última carga.
+
+    Returns:
+        DatosPeru compartido
+    """
+    global _cache
+    version = version_bd()
+
+    with _lock:
+        if _cache is None or _cache.version != version:
+            conn = conexion()
+            frames = {nombre: pd.read_sql_query(query, conn) for nombre, query in CONSULTAS.items()}
+            _cache = DatosPeru(version=version, **frames)
+        return _cache
+
+def listar_tablas():
+    """Nombres de las tablas de la base."""
+    with _lock:
+        cursor = conexion().execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
+        return [row[0] for row in cursor.fetchall()]
+
+def leer_tabla(tabla, limite=None):
+    """
+    Contenido de una tabla.
+
+    Args:
+        tabla: Nombre de la tabla (de listar_tablas)
+        limite: Máximo de filas (None = todas)
+
+    Returns:
+        Tupla (DataFrame, total de registros de la tabla)
+    """
+    query = f'SELECT * FROM "{tabla}"' + (f" LIMIT {int(limite)}" if limite else "")
+    with _lock:
+        conn = conexion()
+        df = pd.read_sql_query(query, conn)
+        total = conn.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0]
+    return df, total
+
+def esquema_tabla(tabla):
+    """Columnas de una tabla (PRAGMA table_info)."""
+    with _lock:
+        esquema = conexion().execute(f'PRAGMA table_info("{tabla}")').fetchall()
+    return pd.DataFrame(esquema, columns=['cid', 'name', 'type', 'notnull', 'dflt_value', 'pk'])
+
+if __name__ == "__main__":
+    import time
+
+    for _ in range(2):
+        inicio = time.perf_counter()
+        datos = cargar_datos()
+        print(f"✅ {len(datos.agregados):,} agregados, {len(datos.empresas):,} empresas, "
+              f"{len(datos.pdf):,} PDF en {time.perf_counter() - inicio:.3f}s (versión {datos.version})")
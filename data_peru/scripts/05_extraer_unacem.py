@@ -11,6 +11,8 @@ import pandas as pd
 from pathlib import Path
 import io
 
+from carga_consolidada import cargar_datos_empresa
+
 # Rutas
 DB_UNACEM = Path("/home/cpinilla/storage/access/UNACEM.accdb")
 DB_CONSOLIDADA = Path(__file__).parent.parent / "peru_consolidado.db"
@@ -155,38 +157,6 @@ def obtener_id_empresa(conn, codigo_empresa='UNACEM'):
     else:
         raise ValueError(f"Empresa {codigo_empresa} no encontrada en base consolidada")
 
-def registrar_plantas(df, id_empresa, conn):
-    """Registra las plantas en tb_plantas y retorna mapeo id_planta_origen -> id_planta."""
-    cursor = conn.cursor()
-    mapeo_plantas = {}
-
-    # Obtener plantas únicas del dataframe
-    plantas_df = df[['id_planta', 'nombre_planta']].drop_duplicates()
-
-    for _, planta in plantas_df.iterrows():
-        id_planta_origen = planta['id_planta']
-        nombre_planta = planta['nombre_planta']
-
-        # Verificar si ya existe la planta
-        cursor.execute("""
-            SELECT id_planta FROM tb_plantas
-            WHERE id_empresa = ? AND nombre_planta = ?
-        """, (id_empresa, nombre_planta))
-
-        result = cursor.fetchone()
-        if result:
-            mapeo_plantas[id_planta_origen] = result[0]
-        else:
-            # Insertar nueva planta
-            cursor.execute("""
-                INSERT INTO tb_plantas (id_empresa, nombre_planta, codigo_planta)
-                VALUES (?, ?, ?)
-            """, (id_empresa, nombre_planta, str(id_planta_origen)))
-            mapeo_plantas[id_planta_origen] = cursor.lastrowid
-
-    conn.commit()
-    return mapeo_plantas
-
 def cargar_datos_consolidada(df, id_empresa, codigo_empresa):
     """Carga datos en la base consolidada (nueva estructura con plantas)."""
     if len(df) == 0:
@@ -195,80 +165,17 @@ def cargar_datos_consolidada(df, id_empresa, codigo_empresa):
 
     print(f"\n💾 Cargando datos en base consolidada...")
 
-    conn = sqlite3.connect(DB_CONSOLIDADA)
-    cursor = conn.cursor()
+    # Códigos y fuente como texto
+    df = df.assign(codigo_indicador=df['codigo_indicador'].astype(str), fuente=df['fuente'].astype(str))
+
+    # Plantas, datos por planta (upsert) y log de carga en una sola transacción
+    insertados, actualizados, plantas = cargar_datos_empresa(df, id_empresa, Path(__file__).name, DB_CONSOLIDADA)
+
+    print(f"   ✅ {plantas} plantas registradas")
+    print(f"   ✅ {insertados:,} registros nuevos insertados")
+    print(f"   🔄 {actualizados:,} registros actualizados")
 
-    # 1. Registrar plantas y obtener mapeo de IDs
-    print(f"   Registrando plantas...")
-    mapeo_plantas = registrar_plantas(df, id_empresa, conn)
-    print(f"   ✅ {len(mapeo_plantas)} plantas registradas")
-
-    # 2. Insertar datos por planta
-    registros_insertados = 0
-    registros_actualizados = 0
-
-    for _, row in df.iterrows():
-        id_planta = mapeo_plantas[row['id_planta']]
-
-        try:
-            # Intentar insertar en datos_plantas
-            cursor.execute("""
-                INSERT INTO datos_plantas
-                (id_planta, codigo_indicador, año, mes, valor, fuente, id_dataset_origen)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                id_planta,
-                str(row['codigo_indicador']),
-                int(row['año']),
-                int(row['mes']) if pd.notna(row['mes']) else None,
-                float(row['valor']),
-                str(row['fuente']),
-                int(row['id_dataset_origen'])
-            ))
-            registros_insertados += 1
-        except sqlite3.IntegrityError:
-            # Si ya existe, actualizar
-            cursor.execute("""
-                UPDATE datos_plantas
-                SET valor = ?, fuente = ?, id_dataset_origen = ?, fecha_carga = CURRENT_TIMESTAMP
-                WHERE id_planta = ?
-                  AND codigo_indicador = ?
-                  AND año = ?
-                  AND (mes = ? OR (mes IS NULL AND ? IS NULL))
-            """, (
-                float(row['valor']),
-                str(row['fuente']),
-                int(row['id_dataset_origen']),
-                id_planta,
-                str(row['codigo_indicador']),
-                int(row['año']),
-                int(row['mes']) if pd.notna(row['mes']) else None,
-                int(row['mes']) if pd.notna(row['mes']) else None
-            ))
-            registros_actualizados += 1
-
-    # Log de carga
-    cursor.execute("""
-        INSERT INTO log_carga
-        (id_empresa, registros_cargados, años_inicio, años_fin, script_utilizado, estado, observaciones)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (
-        id_empresa,
-        registros_insertados + registros_actualizados,
-        int(df['año'].min()) if len(df) > 0 else None,
-        int(df['año'].max()) if len(df) > 0 else None,
-        '05_extraer_unacem.py',
-        'exitoso',
-        f"{registros_insertados} nuevos, {registros_actualizados} actualizados - {len(mapeo_plantas)} plantas"
-    ))
-
-    conn.commit()
-    conn.close()
-
-    print(f"   ✅ {registros_insertados:,} registros nuevos insertados")
-    print(f"   🔄 {registros_actualizados:,} registros actualizados")
-
-    return registros_insertados, registros_actualizados
+    return insertados, actualizados
 
 def generar_reporte_extraccion(df, codigo_empresa):
     """Genera reporte de la extracción."""
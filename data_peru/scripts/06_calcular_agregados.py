@@ -12,6 +12,8 @@ import pandas as pd
 from pathlib import Path
 from datetime import datetime
 
+from carga_consolidada import reemplazar_tabla
+
 # Rutas
 DB_CONSOLIDADA = Path(__file__).parent.parent / "peru_consolidado.db"
 
@@ -103,31 +105,18 @@ def guardar_datos_empresas(df_empresas):
 
     print(f"\n💾 Guardando {len(df_empresas):,} registros de empresas en base de datos...")
 
-    conn = sqlite3.connect(DB_CONSOLIDADA)
-    cursor = conn.cursor()
-
-    # Limpiar tabla
-    cursor.execute("DELETE FROM datos_empresas")
+    # Limpiar tabla e insertar datos de empresas (mes NULL = dato anual)
+    filas = zip(
+        df_empresas['id_empresa'].astype(int).tolist(),
+        df_empresas['codigo_indicador'].tolist(),
+        df_empresas['año'].astype(int).tolist(),
+        df_empresas['valor'].astype(float).tolist()
+    )
+    registros_insertados = reemplazar_tabla(
+        'datos_empresas', ['id_empresa', 'codigo_indicador', 'año', 'valor'], filas, DB_CONSOLIDADA
+    )
     print(f"   🗑️  Tabla datos_empresas limpiada")
 
-    # Insertar datos de empresas
-    registros_insertados = 0
-    for _, row in df_empresas.iterrows():
-        cursor.execute("""
-            INSERT INTO datos_empresas
-            (id_empresa, codigo_indicador, año, mes, valor)
-            VALUES (?, ?, ?, NULL, ?)
-        """, (
-            int(row['id_empresa']),
-            row['codigo_indicador'],
-            int(row['año']),
-            float(row['valor'])
-        ))
-        registros_insertados += 1
-
-    conn.commit()
-    conn.close()
-
     print(f"   ✅ {registros_insertados:,} registros de empresas guardados")
     return registros_insertados
 
@@ -263,33 +252,22 @@ def guardar_agregados(df_agregados):
 
     print(f"\n💾 Guardando {len(df_agregados):,} agregados en base de datos...")
 
-    conn = sqlite3.connect(DB_CONSOLIDADA)
-    cursor = conn.cursor()
-
-    # Limpiar tabla de agregados (para recalcular)
-    cursor.execute("DELETE FROM agregados_nacionales")
+    # Limpiar tabla de agregados (para recalcular) e insertar
+    filas = zip(
+        df_agregados['codigo_indicador'].tolist(),
+        df_agregados['año'].astype(int).tolist(),
+        df_agregados['valor_nacional'].astype(float).tolist(),
+        df_agregados['tipo_agregacion'].tolist(),
+        df_agregados['ponderador'].astype(object).where(df_agregados['ponderador'].notna(), None).tolist(),
+        df_agregados['num_empresas'].astype(int).tolist()
+    )
+    registros_insertados = reemplazar_tabla(
+        'agregados_nacionales',
+        ['codigo_indicador', 'año', 'valor_nacional', 'tipo_agregacion', 'ponderador', 'num_empresas'],
+        filas, DB_CONSOLIDADA
+    )
     print(f"   🗑️  Tabla agregados_nacionales limpiada")
 
-    # Insertar agregados
-    registros_insertados = 0
-    for _, row in df_agregados.iterrows():
-        cursor.execute("""
-            INSERT INTO agregados_nacionales
-            (codigo_indicador, año, valor_nacional, tipo_agregacion, ponderador, num_empresas)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            row['codigo_indicador'],
-            int(row['año']),
-            float(row['valor_nacional']),
-            row['tipo_agregacion'],
-            row['ponderador'] if pd.notna(row['ponderador']) else None,
-            int(row['num_empresas'])
-        ))
-        registros_insertados += 1
-
-    conn.commit()
-    conn.close()
-
     print(f"   ✅ {registros_insertados:,} agregados guardados")
     return registros_insertados
 
@@ -3,9 +3,23 @@
 Genera gráficos del Reporte de Seguimiento 2010-2024 del Sector Cemento Perú.
 
 Recrea los gráficos principales del reporte usando los agregados nacionales calculados.
+
+La generación es incremental: cada gráfico declara los indicadores y años
+que lee, y junto a cada PNG se guarda un hash (.sha256) de ese subconjunto
+de datos y del código del gráfico. Solo se regeneran los gráficos cuyo hash
+cambió, en un pool de procesos.
+
+Uso:
+    python 07_generar_graficos.py [--forzar] [--workers N]
 """
 
+import os
+import sys
+import time
+import hashlib
+import inspect
 import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
@@ -89,8 +103,8 @@ def grafico_produccion_clinker(df):
     ax.plot(datos['año'], datos['valor_Mt'], marker='o', color='darkblue', linewidth=2)
 
     # Etiquetas de valores
-    for _, row in datos.iterrows():
-        ax.text(row['año'], row['valor_Mt'] + 1, f"{row['valor_Mt']:.2f}",
+    for año, valor in zip(datos['año'], datos['valor_Mt']):
+        ax.text(año, valor + 1, f"{valor:.2f}",
                 ha='center', va='bottom', fontsize=9, fontweight='bold')
 
     ax.set_xlabel('Año', fontweight='bold')
@@ -169,8 +183,8 @@ def grafico_factor_clinker(df):
     ax.fill_between(datos['año'], datos['valor_pct'], alpha=0.3, color='lightgreen')
 
     # Etiquetas de valores
-    for _, row in datos.iterrows():
-        ax.text(row['año'], row['valor_pct'] + 0.5, f"{row['valor_pct']:.1f}%",
+    for año, valor in zip(datos['año'], datos['valor_pct']):
+        ax.text(año, valor + 0.5, f"{valor:.1f}%",
                 ha='center', va='bottom', fontsize=9, fontweight='bold')
 
     ax.set_xlabel('Año', fontweight='bold')
@@ -205,8 +219,8 @@ def grafico_emisiones_clinker(df):
             linewidth=2, markersize=7)
 
     # Etiquetas de valores
-    for _, row in datos.iterrows():
-        ax.text(row['año'], row['valor_nacional'] + 5, f"{row['valor_nacional']:.1f}",
+    for año, valor in zip(datos['año'], datos['valor_nacional']):
+        ax.text(año, valor + 5, f"{valor:.1f}",
                 ha='center', va='bottom', fontsize=9, fontweight='bold')
 
     ax.set_xlabel('Año', fontweight='bold')
@@ -240,8 +254,8 @@ def grafico_emisiones_cementitious(df):
             linewidth=2, markersize=7)
 
     # Etiquetas de valores
-    for _, row in datos.iterrows():
-        ax.text(row['año'], row['valor_nacional'] + 5, f"{row['valor_nacional']:.1f}",
+    for año, valor in zip(datos['año'], datos['valor_nacional']):
+        ax.text(año, valor + 5, f"{valor:.1f}",
                 ha='center', va='bottom', fontsize=9, fontweight='bold')
 
     ax.set_xlabel('Año', fontweight='bold')
@@ -283,8 +297,8 @@ def grafico_emisiones_netas_combustibles(df):
             linewidth=2, markersize=7)
 
     # Etiquetas de valores
-    for _, row in datos.iterrows():
-        ax.text(row['año'], row['valor_Mt'] + 0.05, f"{row['valor_Mt']:.2f}",
+    for año, valor in zip(datos['año'], datos['valor_Mt']):
+        ax.text(año, valor + 0.05, f"{valor:.2f}",
                 ha='center', va='bottom', fontsize=9, fontweight='bold')
 
     ax.set_xlabel('Año', fontweight='bold')
@@ -326,8 +340,8 @@ def grafico_emisiones_indirectas_alcance2(df):
             linewidth=2, markersize=7)
 
     # Etiquetas de valores
-    for _, row in datos.iterrows():
-        ax.text(row['año'], row['valor_kt'] + 5, f"{row['valor_kt']:.1f}",
+    for año, valor in zip(datos['año'], datos['valor_kt']):
+        ax.text(año, valor + 5, f"{valor:.1f}",
                 ha='center', va='bottom', fontsize=9, fontweight='bold')
 
     ax.set_xlabel('Año', fontweight='bold')
@@ -361,8 +375,8 @@ def grafico_especifica_bruta_cementitious(df):
             linewidth=2, markersize=7)
 
     # Etiquetas de valores
-    for _, row in datos.iterrows():
-        ax.text(row['año'], row['valor_nacional'] + 10, f"{row['valor_nacional']:.1f}",
+    for año, valor in zip(datos['año'], datos['valor_nacional']):
+        ax.text(año, valor + 10, f"{valor:.1f}",
                 ha='center', va='bottom', fontsize=9, fontweight='bold')
 
     ax.set_xlabel('Año', fontweight='bold')
@@ -396,8 +410,8 @@ def grafico_emision_bruta_cemento_eq(df):
             linewidth=2, markersize=7)
 
     # Etiquetas de valores
-    for _, row in datos.iterrows():
-        ax.text(row['año'], row['valor_nacional'] + 10, f"{row['valor_nacional']:.1f}",
+    for año, valor in zip(datos['año'], datos['valor_nacional']):
+        ax.text(año, valor + 10, f"{valor:.1f}",
                 ha='center', va='bottom', fontsize=9, fontweight='bold')
 
     ax.set_xlabel('Año', fontweight='bold')
@@ -431,8 +445,8 @@ def grafico_especifica_neta_cementitious(df):
             linewidth=2, markersize=7)
 
     # Etiquetas de valores
-    for _, row in datos.iterrows():
-        ax.text(row['año'], row['valor_nacional'] + 10, f"{row['valor_nacional']:.1f}",
+    for año, valor in zip(datos['año'], datos['valor_nacional']):
+        ax.text(año, valor + 10, f"{valor:.1f}",
                 ha='center', va='bottom', fontsize=9, fontweight='bold')
 
     ax.set_xlabel('Año', fontweight='bold')
@@ -466,8 +480,8 @@ def grafico_emision_neta_cemento_eq(df):
             linewidth=2, markersize=7)
 
     # Etiquetas de valores
-    for _, row in datos.iterrows():
-        ax.text(row['año'], row['valor_nacional'] + 10, f"{row['valor_nacional']:.1f}",
+    for año, valor in zip(datos['año'], datos['valor_nacional']):
+        ax.text(año, valor + 10, f"{valor:.1f}",
                 ha='center', va='bottom', fontsize=9, fontweight='bold')
 
     ax.set_xlabel('Año', fontweight='bold')
@@ -501,8 +515,8 @@ def grafico_eficiencia_termica(df):
     ax.fill_between(datos['año'], datos['valor_nacional'], alpha=0.2, color='purple')
 
     # Etiquetas de valores
-    for _, row in datos.iterrows():
-        ax.text(row['año'], row['valor_nacional'] + 20, f"{row['valor_nacional']:.1f}",
+    for año, valor in zip(datos['año'], datos['valor_nacional']):
+        ax.text(año, valor + 20, f"{valor:.1f}",
                 ha='center', va='bottom', fontsize=9, fontweight='bold')
 
     ax.set_xlabel('Año', fontweight='bold')
@@ -536,8 +550,8 @@ def grafico_consumo_electrico(df):
             linewidth=2, markersize=7)
 
     # Etiquetas de valores
-    for _, row in datos.iterrows():
-        ax.text(row['año'], row['valor_nacional'] + 2, f"{row['valor_nacional']:.1f}",
+    for año, valor in zip(datos['año'], datos['valor_nacional']):
+        ax.text(año, valor + 2, f"{valor:.1f}",
                 ha='center', va='bottom', fontsize=9, fontweight='bold')
 
     ax.set_xlabel('Año', fontweight='bold')
@@ -596,6 +610,135 @@ def grafico_resumen_evolucion(df):
 
     print(f"   ✅ Guardado: resumen_evolucion_indicadores.png")
 
+# Gráficos del reporte: función, archivo (relativo a DIR_GRAFICOS) e
+# indicadores/años que lee (años=None: todos los años del indicador)
+GRAFICOS = [
+    {'funcion': grafico_produccion_clinker, 'archivo': 'grupo1_produccion/01_produccion_clinker.png',
+     'indicadores': ['8'], 'años': AÑOS_REPORTE},
+    {'funcion': grafico_produccion_cemento, 'archivo': 'grupo1_produccion/02_produccion_cemento_cementitious.png',
+     'indicadores': ['20', '21a'], 'años': AÑOS_REPORTE},
+    {'funcion': grafico_factor_clinker, 'archivo': 'grupo2_contenido_clinker/01_factor_clinker.png',
+     'indicadores': ['92a'], 'años': AÑOS_REPORTE},
+    {'funcion': grafico_emisiones_clinker, 'archivo': 'grupo3_emisiones/01_emisiones_clinker.png',
+     'indicadores': ['60a'], 'años': AÑOS_REPORTE},
+    {'funcion': grafico_emisiones_cementitious, 'archivo': 'grupo3_emisiones/02_emisiones_cementitious.png',
+     'indicadores': ['62a'], 'años': AÑOS_REPORTE},
+    {'funcion': grafico_emisiones_netas_combustibles, 'archivo': 'grupo3_emisiones/03_emisiones_netas_combustibles.png',
+     'indicadores': ['60'], 'años': None},
+    {'funcion': grafico_emisiones_indirectas_alcance2, 'archivo': 'grupo3_emisiones/04_emisiones_alcance2.png',
+     'indicadores': ['73'], 'años': None},
+    {'funcion': grafico_especifica_bruta_cementitious, 'archivo': 'grupo3_emisiones/05_especifica_bruta_cementitious.png',
+     'indicadores': ['62'], 'años': AÑOS_REPORTE},
+    {'funcion': grafico_emision_bruta_cemento_eq, 'archivo': 'grupo3_emisiones/06_emision_bruta_cemento_eq.png',
+     'indicadores': ['63'], 'años': AÑOS_REPORTE},
+    {'funcion': grafico_especifica_neta_cementitious, 'archivo': 'grupo3_emisiones/07_especifica_neta_cementitious.png',
+     'indicadores': ['74'], 'años': AÑOS_REPORTE},
+    {'funcion': grafico_emision_neta_cemento_eq, 'archivo': 'grupo3_emisiones/08_emision_neta_cemento_eq.png',
+     'indicadores': ['75'], 'años': AÑOS_REPORTE},
+    {'funcion': grafico_eficiencia_termica, 'archivo': 'grupo4_eficiencia/01_eficiencia_termica.png',
+     'indicadores': ['93'], 'años': AÑOS_REPORTE},
+    {'funcion': grafico_consumo_electrico, 'archivo': 'grupo5_electricos/01_consumo_electrico_especifico.png',
+     'indicadores': ['97'], 'años': AÑOS_REPORTE},
+    {'funcion': grafico_resumen_evolucion, 'archivo': 'resumen_evolucion_indicadores.png',
+     'indicadores': ['8', '92a', '60a', '93', '97'], 'años': AÑOS_REPORTE},
+]
+
+# Columnas que leen los gráficos (las demás no invalidan el hash)
+COLUMNAS_GRAFICO = ['codigo_indicador', 'año', 'valor_nacional']
+
+def datos_grafico(df, grafico):
+    """Subconjunto de agregados que lee un gráfico, en orden estable."""
+    datos = df[df['codigo_indicador'].isin(grafico['indicadores'])]
+    if grafico['años'] is not None:
+        datos = datos[datos['año'].isin(grafico['años'])]
+
+    return datos[COLUMNAS_GRAFICO].sort_values(['codigo_indicador', 'año']).reset_index(drop=True)
+
+def hash_grafico(datos, grafico):
+    """Hash de los datos de entrada, los años pedidos y el código del gráfico."""
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(datos, index=False).values.tobytes())
+    h.update(repr(grafico['años']).encode())
+    h.update(inspect.getsource(grafico['funcion']).encode())
+    return h.hexdigest()
+
+def ruta_hash(ruta_png):
+    """Archivo con el hash de entrada, junto al PNG."""
+    return ruta_png.with_name(ruta_png.name + '.sha256')
+
+def renderizar_grafico(funcion, datos, ruta_png):
+    """
+    Dibuja un gráfico (en un proceso del pool).
+
+    Returns:
+        True si el PNG se escribió en esta llamada
+    """
+    antes = ruta_png.stat().st_mtime_ns if ruta_png.exists() else None
+    funcion(datos)
+    return ruta_png.exists() and ruta_png.stat().st_mtime_ns != antes
+
+def generar_graficos(df, forzar=False, workers=None):
+    """
+    Regenera solo los gráficos cuyos datos o código cambiaron.
+
+    Args:
+        df: Agregados nacionales (cargar_agregados)
+        forzar: Regenerar todos aunque el hash no haya cambiado
+        workers: Procesos del pool (None = núcleos disponibles)
+
+    Returns:
+        Tupla (regenerados, omitidos)
+    """
+    pendientes = []
+    omitidos = 0
+
+    for grafico in GRAFICOS:
+        ruta_png = DIR_GRAFICOS / grafico['archivo']
+        datos = datos_grafico(df, grafico)
+        clave = hash_grafico(datos, grafico)
+
+        archivo_hash = ruta_hash(ruta_png)
+        if (not forzar and ruta_png.exists() and archivo_hash.exists()
+                and archivo_hash.read_text().strip() == clave):
+            omitidos += 1
+            continue
+
+        pendientes.append((grafico, datos, clave))
+
+    print(f"\n🔎 {len(pendientes)} gráfico(s) a regenerar, {omitidos} sin cambios")
+
+    regenerados = 0
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pendientes) or 1))
+
+    def registrar(grafico, clave, escrito):
+        # El hash se guarda solo si el PNG se escribió
+        nonlocal regenerados
+        if escrito:
+            ruta_hash(DIR_GRAFICOS / grafico['archivo']).write_text(clave + "\n")
+            regenerados += 1
+
+    if workers == 1:
+        for grafico, datos, clave in pendientes:
+            try:
+                registrar(grafico, clave, renderizar_grafico(grafico['funcion'], datos, DIR_GRAFICOS / grafico['archivo']))
+            except Exception as e:
+                print(f"   ❌ Error en {grafico['archivo']}: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futuros = {
+                executor.submit(renderizar_grafico, grafico['funcion'], datos, DIR_GRAFICOS / grafico['archivo']):
+                    (grafico, clave)
+                for grafico, datos, clave in pendientes
+            }
+            for futuro in as_completed(futuros):
+                grafico, clave = futuros[futuro]
+                try:
+                    registrar(grafico, clave, futuro.result())
+                except Exception as e:
+                    print(f"   ❌ Error en {grafico['archivo']}: {e}")
+
+    return regenerados, omitidos
+
 def generar_reporte_html(df):
     """Genera un reporte HTML con todos los gráficos."""
     print(f"\n📄 Generando reporte HTML...")
@@ -718,6 +861,9 @@ def main():
     """Función principal."""
     print("\n" + "🎨 GENERACIÓN DE GRÁFICOS DEL REPORTE ".center(80, "="))
 
+    forzar = "--forzar" in sys.argv
+    workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else None
+
     # Verificar que existe la base de datos
     if not DB_CONSOLIDADA.exists():
         print(f"❌ Error: Base de datos consolidada no encontrada: {DB_CONSOLIDADA}")
@@ -739,20 +885,9 @@ def main():
         print("GENERANDO GRÁFICOS POR GRUPO")
         print(f"{'='*80}")
 
-        grafico_produccion_clinker(df)
-        grafico_produccion_cemento(df)
-        grafico_factor_clinker(df)
-        grafico_emisiones_clinker(df)
-        grafico_emisiones_cementitious(df)
-        grafico_emisiones_netas_combustibles(df)
-        grafico_emisiones_indirectas_alcance2(df)
-        grafico_especifica_bruta_cementitious(df)
-        grafico_emision_bruta_cemento_eq(df)
-        grafico_especifica_neta_cementitious(df)
-        grafico_emision_neta_cemento_eq(df)
-        grafico_eficiencia_termica(df)
-        grafico_consumo_electrico(df)
-        grafico_resumen_evolucion(df)
+        inicio = time.perf_counter()
+        regenerados, omitidos = generar_graficos(df, forzar=forzar, workers=workers)
+        segundos = time.perf_counter() - inicio
 
         # Generar reporte HTML
         generar_reporte_html(df)
@@ -762,7 +897,7 @@ def main():
         print(f"{'='*80}\n")
 
         print(f"📊 Resumen:")
-        print(f"   - Gráficos generados: 14")
+        print(f"   - Gráficos regenerados: {regenerados} ({omitidos} sin cambios) en {segundos:.1f}s")
         print(f"   - Ubicación: {DIR_GRAFICOS}")
         print(f"   - Reporte HTML: {DIR_GRAFICOS / 'reporte_completo.html'}")
         print(f"\n💡 Abre el reporte HTML en tu navegador para ver todos los gráficos")
@@ -74,6 +74,9 @@ def crear_nuevas_tablas():
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_datos_plantas_planta ON datos_plantas(id_planta)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_datos_plantas_indicador ON datos_plantas(codigo_indicador)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_datos_plantas_año ON datos_plantas(año)")
+    # Clave de upsert: en UNIQUE(..., mes) los datos anuales (mes NULL) no chocan
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_datos_plantas_clave "
+                   "ON datos_plantas(id_planta, codigo_indicador, año, COALESCE(mes, 0))")
 
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_datos_empresas_empresa ON datos_empresas(id_empresa)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_datos_empresas_indicador ON datos_empresas(codigo_indicador)")
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Carga masiva en peru_consolidado.db, compartida por los scripts 03-06.
+
+Cada carga es una sola transacción con executemany (sin iterrows ni un
+INSERT por fila):
+- Pragmas de carga: journal_mode=WAL, synchronous=OFF, temp_store=MEMORY
+- Los índices secundarios de las tablas cargadas se eliminan al empezar y
+  se recrean al final, dentro de la misma transacción (un error deja la
+  base como estaba, índices incluidos)
+
+Las restricciones UNIQUE se mantienen. Los upserts de datos_plantas se
+resuelven con un índice único sobre COALESCE(mes, 0): en UNIQUE(..., mes)
+los NULL son distintos entre sí y las filas anuales se duplicarían.
+"""
+
+import sqlite3
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+# Rutas
+DB_CONSOLIDADA = Path(__file__).parent.parent / "peru_consolidado.db"
+
+# Índices secundarios por tabla (02_crear_base_consolidada.py, 09_reestructurar_db.py)
+INDICES = {
+    'datos_plantas': [
+        ('idx_datos_plantas_planta', 'id_planta'),
+        ('idx_datos_plantas_indicador', 'codigo_indicador'),
+        ('idx_datos_plantas_año', 'año'),
+    ],
+    'datos_empresas': [
+        ('idx_datos_empresas_empresa', 'id_empresa'),
+        ('idx_datos_empresas_indicador', 'codigo_indicador'),
+        ('idx_datos_empresas_año', 'año'),
+    ],
+    'agregados_nacionales': [
+        ('idx_agregados_año', 'año'),
+    ],
+}
+
+# Clave de upsert de datos_plantas (mes NULL = dato anual)
+CLAVE_DATOS_PLANTAS = "id_planta, codigo_indicador, año, COALESCE(mes, 0)"
+
+# Pragmas de la conexión de carga
+PRAGMAS_CARGA = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",  # 64 MB
+]
+
+@contextmanager
+def carga_masiva(tablas=(), db_path=DB_CONSOLIDADA):
+    """
+    Conexión de carga masiva con una sola transacción.
+
+    Args:
+        tablas: Tablas a cargar (sus índices secundarios se recrean al final)
+        db_path: Base consolidada
+
+    Yields:
+        Conexión sqlite3 dentro de la transacción
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        for pragma in PRAGMAS_CARGA:
+            conn.execute(pragma)
+
+        conn.execute("BEGIN")
+        try:
+            for tabla in tablas:
+                for nombre, _ in INDICES.get(tabla, []):
+                    conn.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+            yield conn
+
+            for tabla in tablas:
+                for nombre, columna in INDICES.get(tabla, []):
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla}({columna})")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+def asegurar_clave_datos_plantas(conn):
+    """
+    Crea el índice único de upsert de datos_plantas.
+
+    Antes de crearlo elimina los duplicados anuales que dejaron cargas
+    anteriores (se conserva el último registro cargado).
+    """
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_datos_plantas_clave'"
+    ).fetchone()
+    if existe:
+        return
+
+    conn.execute(f"""
+        DELETE FROM datos_plantas
+        WHERE id_registro NOT IN (
+            SELECT MAX(id_registro) FROM datos_plantas GROUP BY {CLAVE_DATOS_PLANTAS}
+        )
+    """)
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_datos_plantas_clave ON datos_plantas({CLAVE_DATOS_PLANTAS})")
+
+def _enteros(serie):
+    """Enteros de Python (None para nulos)."""
+    return [int(v) if pd.notna(v) else None for v in serie]
+
+def _reales(serie):
+    """Reales de Python (None para nulos)."""
+    return [float(v) if pd.notna(v) else None for v in serie]
+
+def registrar_plantas(conn, df, id_empresa):
+    """
+    Registra las plantas en tb_plantas y retorna mapeo id_planta_origen -> id_planta.
+
+    Las plantas ya registradas (misma empresa y nombre) se reutilizan.
+    """
+    plantas = df[['id_planta', 'nombre_planta']].drop_duplicates()
+    origen = plantas['id_planta'].tolist()
+    nombres = plantas['nombre_planta'].tolist()
+
+    conn.executemany("""
+        INSERT OR IGNORE INTO tb_plantas (id_empresa, nombre_planta, codigo_planta)
+        VALUES (?, ?, ?)
+    """, [(id_empresa, nombre, str(id_origen)) for id_origen, nombre in zip(origen, nombres)])
+
+    ids = dict(conn.execute(
+        "SELECT nombre_planta, id_planta FROM tb_plantas WHERE id_empresa = ?", (id_empresa,)
+    ).fetchall())
+    return {id_origen: ids[nombre] for id_origen, nombre in zip(origen, nombres)}
+
+def guardar_datos_plantas(conn, df, mapeo_plantas):
+    """
+    Inserta o actualiza (upsert) los datos por planta.
+
+    Args:
+        conn: Conexión de carga_masiva
+        df: Columnas id_planta (origen), codigo_indicador, año, mes, valor,
+            fuente, id_dataset_origen
+        mapeo_plantas: id_planta origen -> id_planta consolidada
+
+    Returns:
+        Tupla (insertados, actualizados)
+    """
+    asegurar_clave_datos_plantas(conn)
+
+    ids_planta = sorted(set(mapeo_plantas.values()))
+    marcadores = ",".join("?" * len(ids_planta))
+    contar = f"SELECT COUNT(*) FROM datos_plantas WHERE id_planta IN ({marcadores})"
+    antes = conn.execute(contar, ids_planta).fetchone()[0] if ids_planta else 0
+
+    filas = zip(
+        df['id_planta'].map(mapeo_plantas).tolist(),
+        df['codigo_indicador'].tolist(),
+        _enteros(df['año']),
+        _enteros(df['mes']),
+        _reales(df['valor']),
+        df['fuente'].tolist(),
+        _enteros(df['id_dataset_origen'])
+    )
+    conn.executemany(f"""
+        INSERT INTO datos_plantas
+        (id_planta, codigo_indicador, año, mes, valor, fuente, id_dataset_origen)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT({CLAVE_DATOS_PLANTAS}) DO UPDATE SET
+            valor = excluded.valor,
+            fuente = excluded.fuente,
+            id_dataset_origen = excluded.id_dataset_origen,
+            fecha_carga = CURRENT_TIMESTAMP
+    """, filas)
+
+    despues = conn.execute(contar, ids_planta).fetchone()[0] if ids_planta else 0
+    insertados = despues - antes
+    return insertados, len(df) - insertados
+
+def registrar_log_carga(conn, id_empresa, registros, df, script, observaciones):
+    """Agrega una fila a log_carga."""
+    conn.execute("""
+        INSERT INTO log_carga
+        (id_empresa, registros_cargados, años_inicio, años_fin, script_utilizado, estado, observaciones)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (
+        id_empresa,
+        registros,
+        int(df['año'].min()) if len(df) > 0 else None,
+        int(df['año'].max()) if len(df) > 0 else None,
+        script,
+        'exitoso',
+        observaciones
+    ))
+
+def cargar_datos_empresa(df, id_empresa, script, db_path=DB_CONSOLIDADA):
+    """
+    Carga los datos por planta de una empresa (scripts 03-05).
+
+    Registra plantas, hace upsert en datos_plantas y escribe log_carga,
+    todo en una transacción.
+
+    Args:
+        df: Datos extraídos (ver guardar_datos_plantas)
+        id_empresa: ID de la empresa en la base consolidada
+        script: Nombre del script (para log_carga)
+        db_path: Base consolidada
+
+    Returns:
+        Tupla (insertados, actualizados, plantas)
+    """
+    with carga_masiva(['datos_plantas'], db_path) as conn:
+        mapeo_plantas = registrar_plantas(conn, df, id_empresa)
+        insertados, actualizados = guardar_datos_plantas(conn, df, mapeo_plantas)
+        registrar_log_carga(
+            conn, id_empresa, insertados + actualizados, df, script,
+            f"{insertados} nuevos, {actualizados} actualizados - {len(mapeo_plantas)} plantas"
+        )
+
+    return insertados, actualizados, len(mapeo_plantas)
+
+def reemplazar_tabla(tabla, columnas, filas, db_path=DB_CONSOLIDADA):
+    """
+    Vacía una tabla y la vuelve a llenar (script 06).
+
+    Args:
+        tabla: Tabla destino
+        columnas: Columnas a insertar
+        filas: Iterable de tuplas en el orden de columnas
+        db_path: Base consolidada
+
+    Returns:
+        Registros insertados
+    """
+    lista_columnas = ", ".join(columnas)
+    marcadores = ", ".join("?" * len(columnas))
+
+    with carga_masiva([tabla], db_path) as conn:
+        conn.execute(f"DELETE FROM {tabla}")
+        cursor = conn.executemany(f"INSERT INTO {tabla} ({lista_columnas}) VALUES ({marcadores})", filas)
+        return cursor.rowcount
+
+def verificar_carga_idempotente():
+    """
+    Carga dos veces los mismos datos (anuales y mensuales) en una base
+    temporal y comprueba que la segunda carga solo actualiza.
+
+    Returns:
+        True si el número de filas no cambia
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "verificacion.db"
+        with sqlite3.connect(db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE tb_plantas (
+                    id_planta INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id_empresa INTEGER NOT NULL,
+                    nombre_planta TEXT NOT NULL,
+                    codigo_planta TEXT,
+                    UNIQUE(id_empresa, nombre_planta)
+                );
+                CREATE TABLE datos_plantas (
+                    id_registro INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id_planta INTEGER NOT NULL,
+                    codigo_indicador TEXT NOT NULL,
+                    año INTEGER NOT NULL,
+                    mes INTEGER,
+                    valor REAL NOT NULL,
+                    fuente TEXT,
+                    id_dataset_origen INTEGER,
+                    fecha_carga TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(id_planta, codigo_indicador, año, mes)
+                );
+                CREATE TABLE log_carga (
+                    id_log INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id_empresa INTEGER,
+                    registros_cargados INTEGER,
+                    años_inicio INTEGER,
+                    años_fin INTEGER,
+                    script_utilizado TEXT,
+                    estado TEXT,
+                    observaciones TEXT
+                );
+            """)
+
+        df = pd.DataFrame({
+            'id_planta': [1, 1, 1, 2],
+            'nombre_planta': ['Planta A', 'Planta A', 'Planta A', 'Planta B'],
+            'codigo_indicador': ['8', '8', '8', '8'],
+            'año': [2023, 2023, 2024, 2024],
+            'mes': [None, 1, None, None],
+            'valor': [10.0, 1.0, 12.0, 7.0],
+            'fuente': 'verificacion',
+            'id_dataset_origen': 1
+        })
+
+        primera = cargar_datos_empresa(df, 1, 'verificacion', db_path)
+        segunda = cargar_datos_empresa(df, 1, 'verificacion', db_path)
+        with closing(sqlite3.connect(db_path)) as conn:
+            filas = conn.execute("SELECT COUNT(*) FROM datos_plantas").fetchone()[0]
+
+    ok = filas == len(df) and primera[:2] == (len(df), 0) and segunda[:2] == (0, len(df))
+    print(f"{'✅' if ok else '❌'} Carga repetida: {filas} filas (esperadas {len(df)}), "
+          f"primera {primera[:2]}, segunda {segunda[:2]} (insertados, actualizados)")
+    return ok
+
+if __name__ == "__main__":
+    verificar_carga_idempotente()
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+Registro declarativo de fórmulas FICEM para agregados nacionales.
+
+Cada entrada de FORMULAS replica una fila de docs/FORMULAS_AGREGACION.md:
+qué nodos usa (`depende`), cómo se calcula y cómo se guarda. GrafoFormulas
+compila el registro en un grafo de dependencias (DAG) y lo evalúa en orden
+topológico, vectorizado sobre todos los años a la vez.
+
+Nombres de nodos:
+- '[8]'  : valor por planta del campo 8 (entrada, viene de datos_plantas)
+- '8'    : Σ[8] nacional (campo sumable)
+- '93'   : indicador calculado
+- 'cem_eq': cemento equivalente (se guarda como '21b' cuando se calcula)
+
+Al cambiar datos de algunos campos, evaluar(cubo, campos=[...]) recalcula
+solo los nodos aguas abajo de esos campos.
+
+Referencia: data_peru/docs/FORMULAS_AGREGACION.md
+"""
+
+from graphlib import TopologicalSorter, CycleError
+
+import numpy as np
+
+# =============================================================================
+# CAMPOS SUMABLES (se agregan directamente desde datos_plantas)
+# =============================================================================
+CAMPOS_SUMABLES = [
+    # Producción
+    '8',      # Clínker producido
+    '9',      # Clínker comprado
+    '10',     # Clínker vendido
+    '10a',    # Cambio en stock clínker
+    '10b',    # Transferencia interna clínker
+    '11',     # Clínker consumido
+    '20',     # Cemento producido
+    '21a',    # Producto cementitious
+    '21b',    # Cemento equivalente (calculado por planta como [8]/[92a])
+    # Energía
+    '25',     # Consumo térmico total hornos
+    '27',     # Energía fósiles alternativos
+    '28',     # Energía biomasa
+    '33',     # Consumo eléctrico total
+    '33a',    # Consumo eléctrico autogenerado
+    '33aa',   # Consumo eléctrico autogenerado usado
+    '33c',    # Consumo eléctrico externo
+    '33e',    # Consumo eléctrico hasta clínker
+    # Emisiones absolutas
+    '39',     # Emisiones CO₂ descarbonatación
+    '40',     # Emisiones CO₂ fósiles convencionales
+    '41',     # Emisiones CO₂ fósiles alternativos
+    '43',     # Emisiones CO₂ combustibles fósiles hornos
+    '44',     # Emisiones CO₂ equipos on-site
+    '45a',    # Emisiones CO₂ vehículos on-site
+    '45b',    # Emisiones CO₂ otros fuera horno
+    '45c',    # Emisiones CO₂ generación eléctrica on-site
+    '49a',    # Emisiones CO₂ electricidad externa
+    '50',     # Emisiones CO₂ biomasa
+    '59a',    # Emisiones netas materias primas
+    '225',    # Emisiones CO₂ biomasa hornos
+]
+
+# Empresas informadas para indicadores calculados
+NUM_EMPRESAS = 3
+
+
+class CuboPlantas:
+    """
+    datos_plantas pivotado a un arreglo (año, planta, indicador).
+
+    Las celdas sin dato son NaN. Todas las fórmulas se evalúan sobre el
+    cubo completo, para todos los años a la vez.
+    """
+
+    def __init__(self, df):
+        """
+        Args:
+            df: DataFrame con año, id_planta, codigo_indicador, valor
+        """
+        # Igual que SUM(valor) en SQL si hay más de un registro por celda
+        agrupado = df.groupby(['año', 'id_planta', 'codigo_indicador'])['valor'].sum()
+
+        self.años = np.array(sorted(df['año'].unique()), dtype=int)
+        self.plantas = np.array(sorted(df['id_planta'].unique()))
+        self.codigos = {codigo: k for k, codigo in enumerate(sorted(df['codigo_indicador'].unique()))}
+
+        self.valores = np.full((len(self.años), len(self.plantas), len(self.codigos)), np.nan)
+        i = np.searchsorted(self.años, agrupado.index.get_level_values(0))
+        j = np.searchsorted(self.plantas, agrupado.index.get_level_values(1))
+        k = [self.codigos[c] for c in agrupado.index.get_level_values(2)]
+        self.valores[i, j, k] = agrupado.to_numpy(dtype=float)
+
+    def __getitem__(self, codigo):
+        """Matriz (año, planta) de un indicador (NaN si no existe)."""
+        if codigo not in self.codigos:
+            return np.full(self.valores.shape[:2], np.nan)
+        return self.valores[:, :, self.codigos[codigo]]
+
+    def suma(self, codigo):
+        """Σ por año sobre plantas (NaN si ninguna planta reporta, como SUM en SQL)."""
+        matriz = self[codigo]
+        return np.where(self.num_plantas(codigo) > 0, np.nansum(matriz, axis=1), np.nan)
+
+    def num_plantas(self, codigo):
+        """Plantas con dato por año."""
+        return np.count_nonzero(~np.isnan(self[codigo]), axis=1)
+
+    def años_con_datos(self, codigos):
+        """Años en que alguna planta reporta alguno de los campos."""
+        return np.logical_or.reduce([self.num_plantas(c) > 0 for c in codigos])
+
+
+# =============================================================================
+# HELPERS VECTORIZADOS
+# =============================================================================
+
+def _hay(x):
+    """Equivalente vectorizado de `if s.get(campo)`: existe y no es cero."""
+    return ~np.isnan(x) & (x != 0)
+
+
+def _hay_denominador(nombre, x):
+    """Denominador utilizable (cemento equivalente debe ser positivo)."""
+    if nombre == 'cem_eq':
+        return ~np.isnan(x) & (x > 0)
+    return _hay(x)
+
+
+def _dato(*matrices):
+    """Celdas donde todas las matrices tienen dato."""
+    return np.logical_and.reduce([~np.isnan(m) for m in matrices])
+
+
+def _sumar_plantas(terminos, validos):
+    """Σ por año de los términos válidos y si hubo al menos una planta válida.
+
+    Omite NaN (ej: 0/0) igual que Series.sum().
+    """
+    return np.nansum(np.where(validos, terminos, 0), axis=1), validos.any(axis=1)
+
+
+def _fuera_de_horno(v):
+    """Σ[44] + Σ[45a] + Σ[45b] (componente ausente = 0)."""
+    return np.nan_to_num(v['44']) + np.nan_to_num(v['45a']) + np.nan_to_num(v['45b'])
+
+
+# =============================================================================
+# CONSTRUCTORES DE FÓRMULAS
+# Cada fórmula es un dict con depende, calcular(v) -> (valores, emitir),
+# tipo, ponderador y opcionalmente salida (código guardado)
+# =============================================================================
+
+def suma(campo):
+    """Σ[campo]ᵢ"""
+    return {
+        'depende': [f'[{campo}]'],
+        'calcular': lambda v: (v.cubo.suma(campo), v.cubo.num_plantas(campo) > 0),
+        'tipo': 'suma',
+        'ponderador': None,
+        'num_empresas': lambda v: v.cubo.num_plantas(campo)
+    }
+
+
+def cociente(numerador, denominador, factor=1, tipo='promedio_ponderado'):
+    """(Σ[numerador]ᵢ / Σ[denominador]ᵢ) × factor"""
+    def calcular(v):
+        emitir = _hay(v[numerador]) & _hay_denominador(denominador, v[denominador])
+        return v[numerador] / v[denominador] * factor, emitir
+
+    return {
+        'depende': [numerador, denominador],
+        'calcular': calcular,
+        'tipo': tipo,
+        'ponderador': denominador
+    }
+
+
+def fuera_de_horno(denominador):
+    """(Σ[44]ᵢ + Σ[45a]ᵢ + Σ[45b]ᵢ) / Σ[denominador]ᵢ × 1000"""
+    def calcular(v):
+        total = _fuera_de_horno(v)
+        return total / v[denominador] * 1000, _hay_denominador(denominador, v[denominador]) & (total > 0)
+
+    return {
+        'depende': ['44', '45a', '45b', denominador],
+        'calcular': calcular,
+        'tipo': 'promedio_ponderado',
+        'ponderador': denominador
+    }
+
+
+def generacion_onsite(denominador):
+    """Σ([33aa]ᵢ/[33a]ᵢ × [45c]ᵢ) / Σ[denominador]ᵢ × 1000"""
+    def calcular(v):
+        c33aa, c33a, c45c = v['[33aa]'], v['[33a]'], v['[45c]']
+        validos = _dato(c33aa, c33a, c45c) & (c33a != 0)
+        numerador, hay_plantas = _sumar_plantas((c33aa / c33a) * c45c, validos)
+        den = v[denominador]
+        return (numerador / den) * 1000, hay_plantas & _hay_denominador(denominador, den)
+
+    return {
+        'depende': ['[33aa]', '[33a]', '[45c]', denominador],
+        'calcular': calcular,
+        'tipo': 'formula_compleja',
+        'ponderador': denominador
+    }
+
+
+def condicional_cemento(emision):
+    """Si Σ[8]≥Σ[11]: Σ([emision]ᵢ×[11]ᵢ/[8]ᵢ) / Σ[20]ᵢ × 1000;
+    si no: Σ[emision]ᵢ / Σ[20]ᵢ × 1000 (FICEM V1.4)"""
+    def calcular(v):
+        usa_proporcion = _hay(v['8']) & _hay(v['11']) & (v['8'] >= v['11'])
+        proporcional, hay_plantas = _proporcional(v, emision)
+        valores = np.where(usa_proporcion, proporcional / v['20'] * 1000, v[emision] / v['20'] * 1000)
+        emitir = _hay(v[emision]) & _hay(v['20']) & (~usa_proporcion | hay_plantas)
+        return valores, emitir
+
+    return {
+        'depende': [emision, '20', '8', '11', f'[{emision}]', '[11]', '[8]'],
+        'calcular': calcular,
+        'tipo': 'formula_condicional',
+        'ponderador': '20'
+    }
+
+
+def suma_componentes(componentes, ponderador, incluir_en=None):
+    """Σ de indicadores ya calculados (componente ausente = 0).
+
+    Args:
+        componentes: Indicadores a sumar
+        ponderador: Ponderador informado
+        incluir_en: Indicadores cuya emisión decide si se emite (por
+            defecto, los mismos componentes)
+    """
+    control = incluir_en or componentes
+
+    def calcular(v):
+        valores = sum(np.where(v.emitido(c), v[c], 0) for c in componentes)
+        emitir = np.logical_or.reduce([np.where(v.emitido(c), v[c], 0) != 0 for c in control])
+        return valores, emitir
+
+    return {
+        'depende': list(dict.fromkeys(componentes + control)),
+        'calcular': calcular,
+        'tipo': 'suma_componentes',
+        'ponderador': ponderador
+    }
+
+
+# =============================================================================
+# FÓRMULAS A NIVEL PLANTA
+# =============================================================================
+
+def _proporcional(v, campo_emision):
+    """Σ por año de la emisión proporcional según FICEM V1.4:
+    - Si [8] >= [11] en planta: usar [emision] × [11]/[8]
+    - Si [8] < [11] en planta: usar [emision] directamente (sin factor)
+    """
+    emision, c11, c8 = v[f'[{campo_emision}]'], v['[11]'], v['[8]']
+    validos = _dato(emision, c11, c8) & (c8 != 0)
+    return _sumar_plantas(np.where(c8 >= c11, emision * (c11 / c8), emision), validos)
+
+
+def _calcular_1012(v):
+    """1012: Σ([33d]ᵢ × [33c]ᵢ × [33e]ᵢ/[33]ᵢ) / Σ[8]ᵢ"""
+    validos = _dato(v['[33d]'], v['[33c]'], v['[33e]'], v['[33]'])
+    numerador, hay_plantas = _sumar_plantas(v['[33d]'] * v['[33c]'] * (v['[33e]'] / v['[33]']), validos)
+    return numerador / v['8'], hay_plantas & _hay(v['8'])
+
+
+def _calcular_1088(v):
+    """1088: Σ([45c]ᵢ × [33aa]ᵢ/[33a]ᵢ × [33e]ᵢ/[33]ᵢ) / Σ[8]ᵢ × 1000"""
+    # Evitar división por cero
+    validos = (_dato(v['[45c]'], v['[33aa]'], v['[33a]'], v['[33e]'], v['[33]'])
+               & (v['[33a]'] != 0) & (v['[33]'] != 0))
+    terminos = v['[45c]'] * (v['[33aa]'] / v['[33a]']) * (v['[33e]'] / v['[33]'])
+    numerador, hay_plantas = _sumar_plantas(terminos, validos)
+    return (numerador / v['8']) * 1000, hay_plantas & _hay(v['8'])
+
+
+def _calcular_1005(v):
+    """1005: Σ(Aᵢ) / Σ[20]ᵢ
+    - Plantas integradas: Aᵢ = [33d]ᵢ × [33c]ᵢ/[33]ᵢ × ([33e]ᵢ × [11]ᵢ/[8]ᵢ + [33]ᵢ - [33e]ᵢ)
+    - Moliendas (o integradas sin [33e]/[11]): Aᵢ = [33d]ᵢ × [33c]ᵢ
+    """
+    c8, c11, c33, c33c, c33d, c33e = (v[f'[{c}]'] for c in ['8', '11', '33', '33c', '33d', '33e'])
+
+    # Planta integrada (tiene [8] clínker producido) con todos los datos
+    integrada = (c8 > 0) & (c33 > 0) & _dato(c33e, c11)
+    A = np.where(integrada, c33d * (c33c / c33) * (c33e * c11 / c8 + c33 - c33e), c33d * c33c)
+    numerador, _ = _sumar_plantas(A, _dato(c33d, c33c))
+    return numerador / v['20'], _hay(v['20']) & (numerador != 0)
+
+
+def _calcular_cem_eq(v):
+    """[21b]: Σ[21b]ᵢ por planta; si no existe o es 0, Σ[8] × Σ[20] / Σ[11]"""
+    calcular = (np.isnan(v['21b']) | (v['21b'] == 0)) & _hay(v['8']) & _hay(v['11']) & _hay(v['20'])
+    return np.where(calcular, v['8'] * v['20'] / v['11'], v['21b']), calcular
+
+
+# =============================================================================
+# REGISTRO (mismo orden que FORMULAS_AGREGACION.md)
+# =============================================================================
+
+FORMULAS = {campo: suma(campo) for campo in CAMPOS_SUMABLES}
+
+FORMULAS.update({
+    # --- Eficiencia y Sustitución ---
+    '33d': cociente('49a', '33c'),
+    '92a': cociente('11', '20', tipo='ratio'),
+    '93': cociente('25', '8', 1000000),
+    '95': cociente('27', '25', 100, tipo='ratio_porcentaje'),
+    '96': cociente('28', '25', 100, tipo='ratio_porcentaje'),
+    '96a': cociente('43', '25', 1000),
+    '97': cociente('33', '20', 1000),
+    'coprocesamiento': {
+        'depende': ['27', '28', '25'],
+        'calcular': lambda v: (
+            (v['27'] + v['28']) / v['25'],
+            ~np.isnan(v['27']) & ~np.isnan(v['28']) & _hay(v['25'])
+        ),
+        'tipo': 'ratio',
+        'ponderador': '25'
+    },
+
+    # --- Emisiones Específicas - Clínker ---
+    '60a': cociente('39', '8', 1000),
+    '1008': cociente('40', '8', 1000),
+    '1009': cociente('41', '8', 1000),
+    '1010': fuera_de_horno('8'),
+    '1011': cociente('225', '8', 1000),
+    '1012': {
+        'depende': ['[33d]', '[33c]', '[33e]', '[33]', '8'],
+        'calcular': _calcular_1012,
+        'tipo': 'formula_compleja',
+        'ponderador': '8'
+    },
+    '1088': {
+        'depende': ['[45c]', '[33aa]', '[33a]', '[33e]', '[33]', '8'],
+        'calcular': _calcular_1088,
+        'tipo': 'formula_compleja',
+        'ponderador': '8'
+    },
+    '60': suma_componentes(['60a', '1010', '1008', '1009'], '8'),
+    '73': suma_componentes(['60a', '1010', '1008'], '8', incluir_en=['60a', '1010', '1008', '1009']),
+
+    # --- Emisiones Específicas - Cementitious ---
+    '62a': cociente('59a', '21a', 1000),
+    '82a': cociente('49a', '21a', 1000),
+    '1020': generacion_onsite('21a'),
+    '1021': fuera_de_horno('21a'),
+    '1022': cociente('40', '21a', 1000),
+    '1023': cociente('41', '21a', 1000),
+    '1024': cociente('50', '21a', 1000),
+    '62': suma_componentes(['62a', '1021', '1022', '1023'], '21a'),
+    '74': suma_componentes(['62a', '1021', '1022'], '21a', incluir_en=['62a', '1021', '1022', '1023']),
+
+    # --- Emisiones Específicas - Cemento ---
+    '1001': condicional_cemento('39'),
+    '1002': fuera_de_horno('20'),
+    '1003': condicional_cemento('40'),
+    '1004': condicional_cemento('41'),
+    '1005': {
+        'depende': ['[8]', '[11]', '[33]', '[33c]', '[33d]', '[33e]', '20'],
+        'calcular': _calcular_1005,
+        'tipo': 'formula_compleja',
+        'ponderador': '20'
+    },
+    '1006': {
+        'depende': ['11', '8', '20'],
+        'calcular': lambda v: (
+            865 * ((v['11'] - v['8']) / v['20']),
+            _hay(v['11']) & _hay(v['8']) & _hay(v['20'])
+        ),
+        'tipo': 'formula',
+        'ponderador': '20'
+    },
+    '1025': generacion_onsite('20'),
+    '1043': condicional_cemento('50'),
+    '1044': suma_componentes(['1001', '1002', '1003', '1004'], '20'),
+    '1045': suma_componentes(['1001', '1002', '1003'], '20', incluir_en=['1001', '1002', '1003', '1004']),
+
+    # --- Emisiones Específicas - Cemento Equivalente ---
+    'cem_eq': {
+        'depende': ['21b', '8', '11', '20'],
+        'calcular': _calcular_cem_eq,
+        'tipo': 'formula',
+        'ponderador': '8',
+        'salida': '21b'
+    },
+    '63a': cociente('59a', 'cem_eq', 1000),
+    '82c': cociente('49a', 'cem_eq', 1000),
+    '1410': cociente('40', 'cem_eq', 1000),
+    '1411': cociente('41', 'cem_eq', 1000),
+    '1412': cociente('50', 'cem_eq', 1000),
+    '1416': fuera_de_horno('cem_eq'),
+    '1417': generacion_onsite('cem_eq'),
+    '63': suma_componentes(['63a', '1416', '1410', '1411'], 'cem_eq'),
+    '75': suma_componentes(['63a', '1416', '1410'], 'cem_eq', incluir_en=['63a', '1416', '1410', '1411']),
+})
+
+
+class _Valores:
+    """Acceso a entradas por planta ('[8]') y a nodos ya evaluados ('8')."""
+
+    def __init__(self, cubo, resultados):
+        self.cubo = cubo
+        self.resultados = resultados
+
+    def __getitem__(self, nombre):
+        if nombre.startswith('['):
+            return self.cubo[nombre[1:-1]]
+        return self.resultados[nombre]['valores']
+
+    def emitido(self, nombre):
+        return self.resultados[nombre]['emitir']
+
+
+class GrafoFormulas:
+    """
+    Registro de fórmulas compilado en un grafo de dependencias.
+
+    Con `campos` solo se recalculan los nodos afectados (y los nodos de los
+    que dependen que no estén ya calculados), así que funciona igual con un
+    grafo nuevo que con uno reutilizado entre llamadas.
+    """
+
+    def __init__(self, formulas=None):
+        """
+        Args:
+            formulas: Registro de fórmulas (por defecto FORMULAS)
+
+        Raises:
+            ValueError: Si una dependencia no existe o hay ciclos
+        """
+        self.formulas = formulas or FORMULAS
+
+        for nombre, formula in self.formulas.items():
+            for dep in formula['depende']:
+                if dep not in self.formulas and not dep.startswith('['):
+                    raise ValueError(f"Fórmula '{nombre}' depende de '{dep}', que no está registrado")
+
+        try:
+            self.orden = list(TopologicalSorter({
+                nombre: [d for d in formula['depende'] if d in self.formulas]
+                for nombre, formula in self.formulas.items()
+            }).static_order())
+        except CycleError as e:
+            raise ValueError(f"Dependencias circulares entre fórmulas: {e.args[1]}")
+
+        # nodo o entrada -> nodos que lo usan directamente
+        self.dependientes = {}
+        for nombre, formula in self.formulas.items():
+            for dep in formula['depende']:
+                self.dependientes.setdefault(dep, set()).add(nombre)
+
+        self.resultados = {}
+        self._forma = None
+
+    def salida(self, nombre):
+        """Código con que se guarda un nodo en agregados_nacionales."""
+        return self.formulas[nombre].get('salida', nombre)
+
+    def aguas_abajo(self, campos):
+        """
+        Nodos afectados por cambios en campos de datos_plantas.
+
+        Incluye los nodos que se guardan con el mismo código que un nodo
+        afectado (ej: Σ[21b] y cem_eq), para reescribir ese código completo.
+
+        Args:
+            campos: Códigos de indicador modificados (ej: ['33c', '49a'])
+
+        Returns:
+            Conjunto de nodos a recalcular
+        """
+        pendientes = [f'[{c}]' for c in campos]
+        afectados = set()
+
+        while pendientes:
+            for nodo in self.dependientes.get(pendientes.pop(), ()):
+                if nodo not in afectados:
+                    afectados.add(nodo)
+                    pendientes.append(nodo)
+
+        salidas = {self.salida(n) for n in afectados}
+        return afectados | {n for n in self.formulas if self.salida(n) in salidas}
+
+    def evaluar(self, cubo, campos=None):
+        """
+        Evalúa el grafo sobre todos los años del cubo en una pasada.
+
+        Args:
+            cubo: CuboPlantas con los datos actuales
+            campos: Campos modificados desde la última evaluación (None =
+                recalcular todo)
+
+        Returns:
+            Lista de nodos afectados (aguas abajo de campos), en orden topológico
+        """
+        forma = (tuple(cubo.años), len(cubo.plantas))
+        if campos is None or forma != self._forma:
+            self.resultados = {}
+        objetivo = set(self.formulas) if campos is None else self.aguas_abajo(campos)
+
+        # Nodos no afectados que todavía no se han calculado (ej: proceso nuevo)
+        necesarios = set(objetivo)
+        for nombre in reversed(self.orden):
+            if nombre in necesarios:
+                necesarios.update(
+                    d for d in self.formulas[nombre]['depende']
+                    if d in self.formulas and d not in self.resultados
+                )
+
+        valores = _Valores(cubo, self.resultados)
+        evaluados = [n for n in self.orden if n in necesarios]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for nombre in evaluados:
+                formula = self.formulas[nombre]
+                resultado, emitir = formula['calcular'](valores)
+                self.resultados[nombre] = {
+                    'valores': np.asarray(resultado, dtype=float),
+                    'emitir': np.asarray(emitir, dtype=bool),
+                    'num_empresas': formula['num_empresas'](valores) if 'num_empresas' in formula else None
+                }
+
+        self._forma = forma
+        return [n for n in evaluados if n in objetivo]
+
+    def registros(self, cubo, nodos=None, años_activos=None):
+        """
+        Filas para agregados_nacionales a partir de nodos evaluados.
+
+        Args:
+            cubo: CuboPlantas evaluado
+            nodos: Nodos a exportar (None = todos, en orden topológico)
+            años_activos: Máscara de años a exportar (None = todos)
+
+        Returns:
+            Lista de tuplas (codigo, año, valor, tipo, ponderador, num_empresas)
+        """
+        filas = []
+        for nombre in nodos if nodos is not None else self.orden:
+            formula = self.formulas[nombre]
+            resultado = self.resultados[nombre]
+
+            emitir = resultado['emitir']
+            if años_activos is not None:
+                emitir = emitir & años_activos
+
+            for t in np.flatnonzero(emitir):
+                num = resultado['num_empresas']
+                filas.append((
+                    self.salida(nombre),
+                    int(cubo.años[t]),
+                    float(resultado['valores'][t]),
+                    formula['tipo'],
+                    formula['ponderador'],
+                    int(num[t]) if num is not None else NUM_EMPRESAS
+                ))
+        return filas
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    grafo = GrafoFormulas()
+    print(f"{len(grafo.formulas)} fórmulas en orden topológico")
+    for campo in ['33c', '8', '45c']:
+        afectados = [n for n in grafo.orden if n in grafo.aguas_abajo([campo])]
+        print(f"[{campo}] -> {len(afectados)} nodos: {', '.join(afectados)}")
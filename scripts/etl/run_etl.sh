@@ -84,6 +84,21 @@ echo "============================================================"
 python3 06_validar_datos.py
 echo ""
 
+# Paso 7: Índices por compañía normalizada (informes y SQLTool)
+echo "============================================================"
+echo "Paso 7: Creando índices por compañía..."
+echo "============================================================"
+psql -v ON_ERROR_STOP=1 -f "$SCRIPT_DIR/../../v1/sql/create_indices_compania.sql"
+echo "✓ Índices creados"
+echo ""
+
+# Paso 8: Snapshots Parquet para lecturas de la app
+echo "============================================================"
+echo "Paso 8: Generando snapshots Parquet..."
+echo "============================================================"
+(cd "$SCRIPT_DIR/../../v1" && python3 -m services.snapshots)
+echo ""
+
 echo "============================================================"
 echo "ETL COMPLETADO EXITOSAMENTE"
 echo "Fecha: $(date '+%Y-%m-%d %H:%M:%S')"
@@ -92,6 +107,7 @@ echo ""
 echo "Archivos generados:"
 echo "  - output/mapeos_dimension.json"
 echo "  - output/validacion_resultado.json"
+echo "  - v1/data/snapshots/ (tb_cubo, huella_concretos, remitos)"
 echo ""
 echo "Para refrescar las vistas materializadas:"
 echo "  psql -c \"SELECT refrescar_vistas_materializadas();\""
@@ -13,7 +13,7 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path.cwd()))
-from ai_modules.rag.sql_tool import SQLTool
+from ai_modules.rag.sql_tool import SQLTool, company_filter
 
 
 class DataAnalyzer:
@@ -140,9 +140,7 @@ class DataAnalyzer:
         posicion = next((i+1 for i, c in enumerate(ranking) if c['compania'].lower() == compania.lower()), None)
 
         # 4. Distribución por bandas de la compañía
-        where_clause = f"WHERE LOWER(origen) = LOWER('{compania}')"
-        if año:
-            where_clause += f" AND año = {año}"
+        where_clause, params = company_filter("origen", compania, año)
 
         query_bandas = f"""
         SELECT
@@ -157,7 +155,7 @@ class DataAnalyzer:
         FROM huella_concretos
         {where_clause}
         """
-        result_bandas = self.sql_tool.execute_query(query_bandas)
+        result_bandas = self.sql_tool.execute_query(query_bandas, params=params)
         bandas = result_bandas['rows'][0] if result_bandas['success'] and result_bandas['rows'] else {}
 
         # 5. Detectar productos problemáticos (banda E y F)
@@ -172,7 +170,7 @@ class DataAnalyzer:
         ORDER BY (E + F) DESC
         LIMIT 5
         """
-        result_problemas = self.sql_tool.execute_query(query_problemas)
+        result_problemas = self.sql_tool.execute_query(query_problemas, params=params)
         productos_problematicos = result_problemas['rows'] if result_problemas['success'] else []
 
         # 6. Generar insights
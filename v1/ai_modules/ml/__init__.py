@@ -6,6 +6,9 @@ Componentes:
 - predictor: Prediccion de huella CO2
 - preprocessor: Feature engineering
 - anomaly_detector: Deteccion de anomalias
+- anomaly_scoring: Scoring incremental de anomalias sobre remitos
+- model_registry: Registro de modelos versionados con cache por proceso
+- scenarios: Motor de escenarios what-if (grillas vectorizadas)
 """
 
 __version__ = "0.1.0"
@@ -6,11 +6,12 @@ Detecta remitos con huellas de carbono anormales usando Isolation Forest
 y análisis estadístico.
 """
 
+import time
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import joblib
 from pathlib import Path
 
@@ -37,6 +38,8 @@ class AnomalyDetector:
         self.isolation_forest = None
         self.scaler = StandardScaler()
         self.feature_stats = {}
+        # Rango (min, max) de isolation_score en entrenamiento
+        self.isolation_score_range = None
         self.is_fitted = False
 
     def fit(self, df: pd.DataFrame, features: List[str] = None):
@@ -83,18 +86,35 @@ class AnomalyDetector:
         )
         self.isolation_forest.fit(X_scaled)
 
+        scores = self.isolation_forest.score_samples(X_scaled)
+        self.isolation_score_range = (float(scores.min()), float(scores.max()))
+
         self.is_fitted = True
         print(f"✅ Detector de anomalías entrenado con {len(df_clean):,} registros")
         print(f"   Features: {', '.join(features)}")
         print(f"   Contaminación esperada: {self.contamination*100:.2f}%")
 
-    def detect(self, df: pd.DataFrame, method='both') -> pd.DataFrame:
+    def detect(
+        self,
+        df: pd.DataFrame,
+        method='both',
+        score_range: Optional[Tuple[float, float]] = None,
+        fill_values: Optional[Dict[str, float]] = None
+    ) -> pd.DataFrame:
         """
         Detecta anomalías en nuevos datos.
 
         Args:
             df: DataFrame con datos a analizar
             method: Método de detección ('isolation', 'zscore', 'both')
+            score_range: (min, max) fijo para normalizar isolation_score. Si
+                None se usa el rango del propio lote; para puntuar por
+                bloques usar self.isolation_score_range y que los scores
+                sean comparables entre bloques
+            fill_values: Valor de relleno de nulos por feature. Si None se
+                usa la mediana del propio lote; para puntuar por bloques
+                usar self.training_medians() (una columna toda nula en un
+                bloque no tiene mediana y el relleno no depende del bloque)
 
         Returns:
             DataFrame con columnas adicionales:
@@ -115,7 +135,8 @@ class AnomalyDetector:
         # Método 1: Isolation Forest
         if method in ['isolation', 'both']:
             # Escalar
-            X_scaled = self.scaler.transform(df_features.fillna(df_features.median()))
+            fill = df_features.median() if fill_values is None else pd.Series(fill_values)
+            X_scaled = self.scaler.transform(df_features.fillna(fill))
 
             # Predecir (-1 = anomalía, 1 = normal)
             predictions_if = self.isolation_forest.predict(X_scaled)
@@ -126,33 +147,11 @@ class AnomalyDetector:
 
         # Método 2: Z-score
         if method in ['zscore', 'both']:
-            anomalies_zscore = []
-            zscore_max = []
-
-            for idx in df_features.index:
-                max_z = 0
-                is_anomaly = False
-
-                for feature in self.features:
-                    value = df_features.loc[idx, feature]
-                    if pd.isna(value):
-                        continue
-
-                    mean = self.feature_stats[feature]['mean']
-                    std = self.feature_stats[feature]['std']
-
-                    if std > 0:
-                        z_score = abs((value - mean) / std)
-                        max_z = max(max_z, z_score)
-
-                        if z_score > self.z_threshold:
-                            is_anomaly = True
+            z_scores = self._zscores(df_features)
 
-                anomalies_zscore.append(is_anomaly)
-                zscore_max.append(max_z)
-
-            df_result['is_anomaly_zscore'] = anomalies_zscore
-            df_result['max_zscore'] = zscore_max
+            # NaN (valor nulo o std = 0) no cuenta: el máximo parte de 0
+            df_result['is_anomaly_zscore'] = (z_scores > self.z_threshold).any(axis=1)
+            df_result['max_zscore'] = np.nanmax(z_scores, axis=1, initial=0.0)
 
         # Combinar métodos
         if method == 'both':
@@ -162,48 +161,107 @@ class AnomalyDetector:
             )
             # Score combinado (normalizado 0-1, 1 = más anómalo)
             df_result['anomaly_score'] = (
-                (1 - (df_result['isolation_score'] - df_result['isolation_score'].min()) /
-                 (df_result['isolation_score'].max() - df_result['isolation_score'].min())) * 0.5 +
+                self._isolation_anomaly_score(df_result['isolation_score'], score_range) * 0.5 +
                 (df_result['max_zscore'] / 10).clip(0, 1) * 0.5
             )
         elif method == 'isolation':
             df_result['is_anomaly'] = df_result['is_anomaly_isolation']
-            df_result['anomaly_score'] = 1 - (df_result['isolation_score'] - df_result['isolation_score'].min()) / (df_result['isolation_score'].max() - df_result['isolation_score'].min())
+            df_result['anomaly_score'] = self._isolation_anomaly_score(df_result['isolation_score'], score_range)
         else:  # zscore
             df_result['is_anomaly'] = df_result['is_anomaly_zscore']
             df_result['anomaly_score'] = (df_result['max_zscore'] / 10).clip(0, 1)
 
         # Identificar razones de anomalía
-        df_result['anomaly_reason'] = df_result.apply(
-            lambda row: self._get_anomaly_reason(row, df_features.loc[row.name])
-            if row['is_anomaly'] else '',
-            axis=1
+        df_result['anomaly_reason'] = self._anomaly_reasons(
+            df_features, df_result['is_anomaly'].to_numpy(dtype=bool)
         )
 
         return df_result
 
-    def _get_anomaly_reason(self, row, features_row) -> str:
-        """Identifica la razón de la anomalía"""
-        reasons = []
+    def training_medians(self) -> Dict[str, float]:
+        """
+        Medianas de entrenamiento por feature (relleno de nulos en detect).
 
-        for feature in self.features:
-            value = features_row[feature]
-            if pd.isna(value):
-                continue
+        Returns:
+            Diccionario feature → mediana
+        """
+        return {f: float(self.feature_stats[f]['median']) for f in self.features}
+
+    @staticmethod
+    def _isolation_anomaly_score(scores: pd.Series, score_range: Optional[Tuple[float, float]]) -> pd.Series:
+        """Normaliza isolation_score a 0-1 (1 = más anómalo)."""
+        if score_range is None:
+            low, high = scores.min(), scores.max()
+            return 1 - (scores - low) / (high - low)
+
+        low, high = score_range
+        return (1 - (scores - low) / (high - low)).clip(0, 1)
+
+    def _zscores(self, df_features: pd.DataFrame) -> np.ndarray:
+        """
+        Z-scores absolutos de todas las filas y features.
+
+        Args:
+            df_features: DataFrame con las columnas de self.features
+
+        Returns:
+            Array (n_filas, n_features); NaN donde el valor es nulo o std <= 0
+        """
+        values = df_features[self.features].to_numpy(dtype=float, na_value=np.nan)
+        means = np.array([self.feature_stats[f]['mean'] for f in self.features], dtype=float)
+        stds = np.array([self.feature_stats[f]['std'] for f in self.features], dtype=float)
+
+        valid_std = np.where(stds > 0, stds, np.nan)
+        with np.errstate(invalid='ignore'):
+            return np.abs((values - means) / valid_std)
+
+    def _anomaly_reasons(self, df_features: pd.DataFrame, is_anomaly: np.ndarray) -> np.ndarray:
+        """
+        Texto con la razón de cada anomalía (vacío si la fila es normal).
 
-            stats = self.feature_stats[feature]
-            z_score = abs((value - stats['mean']) / stats['std']) if stats['std'] > 0 else 0
+        Lista las features con z-score sobre el umbral (máximo 3, en el
+        orden de self.features); si ninguna lo supera, la anomalía viene
+        de Isolation Forest.
 
-            if z_score > self.z_threshold:
-                if value > stats['mean']:
-                    reasons.append(f"{feature} muy alto ({value:.1f} vs {stats['mean']:.1f})")
-                else:
-                    reasons.append(f"{feature} muy bajo ({value:.1f} vs {stats['mean']:.1f})")
+        Args:
+            df_features: DataFrame con las columnas de self.features
+            is_anomaly: Máscara booleana de filas anómalas
+
+        Returns:
+            Array de strings alineado con df_features
+        """
+        reasons = np.full(len(df_features), '', dtype=object)
+        rows = np.flatnonzero(is_anomaly)
+        if len(rows) == 0:
+            return reasons
+
+        subset = df_features.iloc[rows]
+        values = subset[self.features].to_numpy(dtype=float, na_value=np.nan)
+        exceeded = self._zscores(subset) > self.z_threshold
+
+        texts = np.full(len(rows), '', dtype=object)
+        count = np.zeros(len(rows), dtype=int)
 
-        if not reasons:
-            reasons.append("Patrón inusual detectado por Isolation Forest")
+        for j, feature in enumerate(self.features):
+            mask = exceeded[:, j] & (count < 3)
+            if not mask.any():
+                continue
+
+            mean = self.feature_stats[feature]['mean']
+            column = values[mask, j]
+            direction = np.where(column > mean, 'muy alto', 'muy bajo')
+            parts = [
+                f"{feature} {d} ({v:.1f} vs {mean:.1f})"
+                for d, v in zip(direction, column)
+            ]
 
-        return "; ".join(reasons[:3])  # Máximo 3 razones
+            separator = np.where(count[mask] > 0, '; ', '')
+            texts[mask] = texts[mask] + separator + np.array(parts, dtype=object)
+            count[mask] += 1
+
+        texts[count == 0] = "Patrón inusual detectado por Isolation Forest"
+        reasons[rows] = texts
+        return reasons
 
     def get_anomalies_summary(self, df_detected: pd.DataFrame) -> Dict:
         """
@@ -242,6 +300,7 @@ class AnomalyDetector:
             'feature_stats': self.feature_stats,
             'isolation_forest': self.isolation_forest,
             'scaler': self.scaler,
+            'isolation_score_range': self.isolation_score_range,
             'is_fitted': self.is_fitted
         }
 
@@ -249,9 +308,9 @@ class AnomalyDetector:
         print(f"✅ Detector guardado: {path}")
 
     @classmethod
-    def load(cls, path: str):
-        """Carga un detector entrenado"""
-        state = joblib.load(path)
+    def load(cls, path: str, mmap_mode: Optional[str] = None):
+        """Carga un detector entrenado (mmap_mode='r' mapea los arrays NumPy)"""
+        state = joblib.load(path, mmap_mode=mmap_mode)
 
         detector = cls(
             contamination=state['contamination'],
@@ -262,12 +321,107 @@ class AnomalyDetector:
         detector.feature_stats = state['feature_stats']
         detector.isolation_forest = state['isolation_forest']
         detector.scaler = state['scaler']
+        detector.isolation_score_range = state.get('isolation_score_range')
         detector.is_fitted = state['is_fitted']
 
         print(f"✅ Detector cargado: {path}")
         return detector
 
 
+def benchmark_detect(n_rows: int = 1_000_000, method: str = 'zscore') -> Dict:
+    """
+    Mide el throughput de detect() sobre datos sintéticos.
+
+    Args:
+        n_rows: Filas a analizar
+        method: Método de detección ('isolation', 'zscore', 'both')
+
+    Returns:
+        Diccionario con segundos, filas/s y anomalías detectadas
+    """
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        'resistencia': rng.normal(28, 8, n_rows),
+        'huella_co2': rng.normal(280, 60, n_rows),
+        'contenido_cemento': rng.normal(330, 70, n_rows),
+        'a1_intensidad': rng.normal(240, 50, n_rows),
+        'a2_intensidad': rng.normal(12, 5, n_rows),
+        'a3_intensidad': rng.normal(1.2, 0.4, n_rows)
+    })
+    # Nulos y atípicos para ejercitar todas las ramas
+    df.loc[df.sample(frac=0.01, random_state=1).index, 'a2_intensidad'] = np.nan
+    df.loc[df.sample(frac=0.005, random_state=2).index, 'huella_co2'] *= 3
+
+    detector = AnomalyDetector()
+    detector.fit(df.sample(n=min(n_rows, 100_000), random_state=0))
+
+    inicio = time.perf_counter()
+    result = detector.detect(df, method=method)
+    seconds = time.perf_counter() - inicio
+
+    stats = {
+        'rows': n_rows,
+        'method': method,
+        'seconds': round(seconds, 2),
+        'rows_per_s': n_rows / seconds,
+        'anomalies': int(result['is_anomaly'].sum())
+    }
+    print(f"⏱️  detect({method}) {n_rows:,} filas: {seconds:.2f}s "
+          f"({stats['rows_per_s']:,.0f} filas/s, {stats['anomalies']:,} anomalías)")
+    return stats
+
+
+def check_chunked_detect(n_rows: int = 20_000, chunksize: int = 5_000) -> bool:
+    """
+    Verifica que puntuar por bloques da el mismo resultado que en un lote.
+
+    Un bloque tiene una feature completamente nula: con las medianas de
+    entrenamiento no falla y cada remito recibe el mismo score que al
+    puntuar todo junto.
+
+    Args:
+        n_rows: Filas sintéticas
+        chunksize: Filas por bloque
+
+    Returns:
+        True si los resultados coinciden
+    """
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        'resistencia': rng.normal(28, 8, n_rows),
+        'huella_co2': rng.normal(280, 60, n_rows),
+        'contenido_cemento': rng.normal(330, 70, n_rows),
+        'a1_intensidad': rng.normal(240, 50, n_rows),
+        'a2_intensidad': rng.normal(12, 5, n_rows),
+        'a3_intensidad': rng.normal(1.2, 0.4, n_rows)
+    })
+
+    detector = AnomalyDetector()
+    detector.fit(df)
+
+    # Segundo bloque sin a2_intensidad
+    df.loc[chunksize:2 * chunksize - 1, 'a2_intensidad'] = np.nan
+
+    kwargs = {
+        'method': 'both',
+        'score_range': detector.isolation_score_range,
+        'fill_values': detector.training_medians()
+    }
+    completo = detector.detect(df, **kwargs)
+    bloques = pd.concat([
+        detector.detect(df.iloc[i:i + chunksize], **kwargs)
+        for i in range(0, n_rows, chunksize)
+    ])
+
+    iguales = bool(
+        np.allclose(completo['anomaly_score'], bloques['anomaly_score'])
+        and (completo['is_anomaly'] == bloques['is_anomaly']).all()
+    )
+    print(f"{'✅' if iguales else '❌'} detect por bloques de {chunksize:,} "
+          f"(uno con a2_intensidad nula) {'coincide' if iguales else 'NO coincide'} con el lote completo")
+    return iguales
+
+
 # Ejemplo de uso
 if __name__ == "__main__":
     print("Módulo de detección de anomalías para Piloto IA - FICEM BD")
@@ -276,3 +430,9 @@ if __name__ == "__main__":
     print("  detector = AnomalyDetector(contamination=0.01)")
     print("  detector.fit(df_historico)")
     print("  df_con_anomalias = detector.detect(df_nuevos)")
+
+    print("\nVerificación por bloques:")
+    check_chunked_detect()
+
+    print("\nBenchmark:")
+    benchmark_detect(1_000_000, method='zscore')
@@ -0,0 +1,246 @@
+"""
+Scoring de Anomalías por Lotes sobre Remitos
+Piloto IA - FICEM BD
+
+Recorre la tabla unificada `remitos` por bloques, la puntúa con un
+AnomalyDetector entrenado y guarda anomaly_score / is_anomaly /
+anomaly_reason en `remitos_anomalias` con un upsert masivo.
+
+Solo se puntúan los remitos con id mayor al último ya puntuado, de modo
+que los dashboards de calidad de datos consultan resultados precalculados.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional
+
+import pandas as pd
+from sqlalchemy import text
+
+from ai_modules.ml.anomaly_detector import AnomalyDetector
+
+
+# Mismos nombres de features que usa AnomalyDetector.fit por defecto
+REMITOS_SCORING_QUERY = """
+SELECT
+    id AS remito_id,
+    resistencia_mpa AS resistencia,
+    co2_kg_m3 AS huella_co2,
+    contenido_cemento,
+    a1_total / volumen AS a1_intensidad,
+    a2_total / volumen AS a2_intensidad,
+    a3_total / volumen AS a3_intensidad
+FROM remitos
+WHERE id > :last_id
+ORDER BY id
+"""
+
+UPSERT_ANOMALIAS = """
+INSERT INTO remitos_anomalias (
+    remito_id, anomaly_score, is_anomaly, anomaly_reason,
+    isolation_score, max_zscore, detector_version, fecha_scoring
+)
+VALUES (
+    :remito_id, :anomaly_score, :is_anomaly, :anomaly_reason,
+    :isolation_score, :max_zscore, :detector_version, CURRENT_TIMESTAMP
+)
+ON CONFLICT (remito_id) DO UPDATE SET
+    anomaly_score = EXCLUDED.anomaly_score,
+    is_anomaly = EXCLUDED.is_anomaly,
+    anomaly_reason = EXCLUDED.anomaly_reason,
+    isolation_score = EXCLUDED.isolation_score,
+    max_zscore = EXCLUDED.max_zscore,
+    detector_version = EXCLUDED.detector_version,
+    fecha_scoring = EXCLUDED.fecha_scoring
+"""
+
+class AnomalyScoringJob:
+    """
+    Job de scoring incremental de remitos.
+
+    - Lectura por bloques con cursor del lado del servidor
+    - `n_jobs` bloques puntuándose en paralelo mientras se lee el siguiente
+    - Escritura en orden de id, un upsert masivo y un commit por bloque
+      (si el job se interrumpe, la próxima corrida retoma desde el último
+      bloque guardado)
+    """
+
+    def __init__(
+        self,
+        detector: AnomalyDetector,
+        db_engine=None,
+        chunksize: int = 50_000,
+        n_jobs: int = 2,
+        method: str = 'both',
+        detector_version: Optional[str] = None
+    ):
+        """
+        Inicializa el job.
+
+        Args:
+            detector: AnomalyDetector entrenado
+            db_engine: Engine SQLAlchemy (None = database.models.get_engine())
+            chunksize: Remitos por bloque
+            n_jobs: Bloques puntuados en paralelo
+            method: Método de detección ('isolation', 'zscore', 'both')
+            detector_version: Identificador del detector guardado con cada score
+        """
+        if not detector.is_fitted:
+            raise ValueError("Detector no entrenado. Ejecutar fit() primero.")
+
+        if db_engine is None:
+            from database.models import get_engine
+            db_engine = get_engine()
+
+        self.detector = detector
+        self.engine = db_engine
+        self.chunksize = chunksize
+        self.n_jobs = max(1, n_jobs)
+        self.method = method
+        self.detector_version = detector_version
+
+        # Rango fijo y medianas de entrenamiento para que anomaly_score sea
+        # comparable entre bloques (no depende de dónde cae cada remito)
+        self.score_range = detector.isolation_score_range
+        self.fill_values = detector.training_medians()
+        if self.score_range is None and method != 'zscore':
+            print("⚠️  Detector sin isolation_score_range (guardado con una versión anterior): "
+                  "anomaly_score se normalizará por bloque")
+
+    def last_scored_id(self) -> int:
+        """
+        Último remito puntuado.
+
+        Returns:
+            Mayor remito_id en remitos_anomalias (0 si está vacía)
+        """
+        with self.engine.connect() as conn:
+            last_id = conn.execute(text("SELECT MAX(remito_id) FROM remitos_anomalias")).scalar()
+        return int(last_id or 0)
+
+    def run(self, full: bool = False) -> Dict:
+        """
+        Puntúa los remitos nuevos y guarda los resultados.
+
+        Args:
+            full: Si True, vuelve a puntuar todos los remitos (ej: tras
+                reentrenar el detector)
+
+        Returns:
+            Estadísticas de la corrida
+        """
+        start = time.perf_counter()
+        last_id = 0 if full else self.last_scored_id()
+
+        stats = {
+            'desde_id': last_id,
+            'hasta_id': last_id,
+            'remitos': 0,
+            'anomalias': 0,
+            'bloques': 0,
+            'score_seconds': 0.0,
+            'write_seconds': 0.0
+        }
+
+        print(f"📂 Puntuando remitos con id > {last_id:,} "
+              f"(bloques de {self.chunksize:,}, {self.n_jobs} en paralelo)...")
+
+        with ThreadPoolExecutor(max_workers=self.n_jobs, thread_name_prefix="anomaly-scoring") as executor:
+            pending = []
+
+            for chunk in self._read_chunks(last_id):
+                if chunk.empty:
+                    continue
+                pending.append(executor.submit(self._score, chunk))
+
+                # Se escribe en orden para que el avance quede consistente
+                while len(pending) > self.n_jobs:
+                    self._write(pending.pop(0).result(), stats)
+
+            for future in pending:
+                self._write(future.result(), stats)
+
+        stats['total_seconds'] = round(time.perf_counter() - start, 2)
+        stats['score_seconds'] = round(stats['score_seconds'], 2)
+        stats['write_seconds'] = round(stats['write_seconds'], 2)
+        stats['remitos_por_segundo'] = (
+            round(stats['remitos'] / stats['total_seconds']) if stats['total_seconds'] > 0 else None
+        )
+
+        print(f"✅ {stats['remitos']:,} remitos puntuados ({stats['anomalias']:,} anomalías) "
+              f"en {stats['total_seconds']:.1f}s")
+        return stats
+
+    def _read_chunks(self, last_id: int) -> Iterator[pd.DataFrame]:
+        """Lee los remitos nuevos por bloques con cursor del lado del servidor."""
+        with self.engine.connect().execution_options(stream_results=True) as conn:
+            yield from pd.read_sql_query(
+                text(REMITOS_SCORING_QUERY), conn,
+                params={'last_id': last_id}, chunksize=self.chunksize
+            )
+
+    def _score(self, chunk: pd.DataFrame) -> Dict:
+        """
+        Puntúa un bloque (se ejecuta en un hilo del pool).
+
+        Args:
+            chunk: Bloque de remitos con las features del detector
+
+        Returns:
+            Diccionario con el DataFrame puntuado y el tiempo de scoring
+        """
+        start = time.perf_counter()
+        result = self.detector.detect(
+            chunk, method=self.method, score_range=self.score_range, fill_values=self.fill_values
+        )
+        return {'result': result, 'seconds': time.perf_counter() - start}
+
+    def _write(self, scored: Dict, stats: Dict) -> None:
+        """
+        Guarda un bloque puntuado con un upsert masivo.
+
+        Args:
+            scored: Resultado de _score
+            stats: Estadísticas de la corrida (se actualizan)
+        """
+        result = scored['result']
+        columns = pd.DataFrame({
+            'remito_id': result['remito_id'].astype(int),
+            'anomaly_score': result['anomaly_score'].astype(float),
+            'is_anomaly': result['is_anomaly'].astype(bool),
+            'anomaly_reason': result['anomaly_reason'].replace('', None),
+            'isolation_score': result['isolation_score'] if 'isolation_score' in result else None,
+            'max_zscore': result['max_zscore'] if 'max_zscore' in result else None,
+            'detector_version': self.detector_version
+        })
+        records = columns.astype(object).where(columns.notna(), None).to_dict('records')
+
+        start = time.perf_counter()
+        with self.engine.begin() as conn:
+            conn.execute(text(UPSERT_ANOMALIAS), records)
+
+        stats['write_seconds'] += time.perf_counter() - start
+        stats['score_seconds'] += scored['seconds']
+        stats['remitos'] += len(records)
+        stats['anomalias'] += int(columns['is_anomaly'].sum())
+        stats['hasta_id'] = int(columns['remito_id'].iloc[-1])
+        stats['bloques'] += 1
+
+        print(f"  Bloque {stats['bloques']}: hasta id {stats['hasta_id']:,} "
+              f"({stats['remitos']:,} remitos)")
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    import sys
+    from ai_modules.ml.model_registry import get_registry
+
+    registry = get_registry()
+    detector = registry.get("anomaly_detector")
+    job = AnomalyScoringJob(
+        detector,
+        chunksize=50_000,
+        n_jobs=2,
+        detector_version=registry.current_version("anomaly_detector") or "legacy"
+    )
+    job.run(full="--full" in sys.argv)
@@ -0,0 +1,356 @@
+"""
+Registro de Modelos ML
+Piloto IA - FICEM BD
+
+Guarda versiones de los modelos (predictor de huella, detector de
+anomalías) con sus metadatos y mantiene una caché por proceso para que
+las páginas de Streamlit no paguen la carga en frío.
+
+Estructura en disco:
+
+    saved_models/registry/
+        huella_predictor/
+            CURRENT              -> "v0003"
+            v0003/
+                model.joblib
+                metadata.json    (métricas, versión de datos, fecha)
+
+Reentrenar registra una versión nueva y la promueve con un cambio
+atómico del puntero CURRENT; la versión anterior sigue disponible.
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ai_modules.ml.predictor import HuellaPredictor
+from ai_modules.ml.anomaly_detector import AnomalyDetector
+
+
+REGISTRY_ROOT = "ai_modules/ml/saved_models/registry"
+
+# Modelos guardados antes del registro (se usan si no hay versiones)
+LEGACY_PATHS = {
+    "huella_predictor": "ai_modules/ml/saved_models/huella_predictor.pkl",
+    "anomaly_detector": "ai_modules/ml/saved_models/anomaly_detector.pkl"
+}
+
+
+# Cómo guardar y cargar cada tipo de modelo
+MODEL_KINDS: Dict[str, Dict[str, Callable]] = {
+    "huella_predictor": {
+        "save": lambda model, path: model.save_model(path),
+        "load": lambda path, mmap_mode: HuellaPredictor(path, mmap_mode=mmap_mode),
+        "stats": lambda model: model.stats
+    },
+    "anomaly_detector": {
+        "save": lambda model, path: model.save(path),
+        "load": lambda path, mmap_mode: AnomalyDetector.load(path, mmap_mode=mmap_mode),
+        "stats": lambda model: {"contamination": model.contamination, "z_threshold": model.z_threshold}
+    }
+}
+
+
+class ModelRegistry:
+    """
+    Registro de modelos versionados con caché perezosa por proceso.
+
+    Una sola instancia por directorio (ver get_registry) se comparte entre
+    todas las sesiones de Streamlit del proceso.
+    """
+
+    def __init__(self, root: str = REGISTRY_ROOT, mmap_mode: Optional[str] = "r"):
+        """
+        Inicializa el registro.
+
+        Args:
+            root: Directorio del registro
+            mmap_mode: Modo de memory-map al cargar artefactos ('r' o None)
+        """
+        self.root = Path(root)
+        self.mmap_mode = mmap_mode
+
+        # (nombre, versión) → modelo cargado
+        self._models: Dict[Tuple[str, str], Any] = {}
+        # nombre → versión activa en este proceso
+        self._active: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self.load_seconds: Dict[Tuple[str, str], float] = {}
+
+    def register(
+        self,
+        name: str,
+        model: Any,
+        metrics: Optional[Dict] = None,
+        data_version: Optional[str] = None,
+        promote: bool = True,
+        notes: str = ""
+    ) -> str:
+        """
+        Guarda una nueva versión de un modelo.
+
+        Args:
+            name: Tipo de modelo (clave de MODEL_KINDS)
+            model: Modelo entrenado
+            metrics: Métricas a guardar (None = las del propio modelo)
+            data_version: Versión de los datos de entrenamiento
+            promote: Si True, la nueva versión pasa a ser la activa
+            notes: Comentario libre
+
+        Returns:
+            Versión creada (ej: "v0004")
+        """
+        kind = self._kind(name)
+        model_dir = self.root / name
+        model_dir.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            version = self._next_version(name)
+            tmp_dir = model_dir / f".{version}.tmp"
+            tmp_dir.mkdir()
+
+            kind["save"](model, str(tmp_dir / "model.joblib"))
+
+            metadata = {
+                "name": name,
+                "version": version,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "metrics": _json_safe(metrics if metrics is not None else kind["stats"](model)),
+                "data_version": data_version,
+                "notes": notes
+            }
+            (tmp_dir / "metadata.json").write_text(json.dumps(metadata, ensure_ascii=False, indent=2))
+
+            # El directorio de la versión aparece completo o no aparece
+            os.replace(tmp_dir, model_dir / version)
+            self._models[(name, version)] = model
+
+        print(f"✅ {name} {version} registrado")
+
+        if promote:
+            self.promote(name, version)
+        return version
+
+    def promote(self, name: str, version: str) -> None:
+        """
+        Activa una versión: la carga (si hace falta) y cambia el puntero
+        CURRENT de forma atómica. Las consultas en curso terminan con la
+        versión anterior; las siguientes usan la nueva.
+
+        Args:
+            name: Tipo de modelo
+            version: Versión a activar
+        """
+        if not (self.root / name / version / "model.joblib").exists():
+            raise FileNotFoundError(f"No existe {name} {version} en {self.root}")
+
+        # Cargar antes de cambiar el puntero: la primera predicción no espera
+        self._load(name, version)
+
+        with self._lock:
+            current = self.root / name / "CURRENT"
+            tmp = current.with_name("CURRENT.tmp")
+            tmp.write_text(version)
+            os.replace(tmp, current)
+            self._active[name] = version
+
+        print(f"✅ {name}: versión activa {version}")
+
+    def get(self, name: str, version: Optional[str] = None) -> Any:
+        """
+        Devuelve un modelo, cargándolo solo la primera vez en el proceso.
+
+        Args:
+            name: Tipo de modelo
+            version: Versión concreta (None = la activa)
+
+        Returns:
+            Modelo listo para usar
+        """
+        if version is None:
+            version = self.current_version(name)
+
+        if version is None:
+            return self._get_legacy(name)
+
+        return self._load(name, version)
+
+    def current_version(self, name: str) -> Optional[str]:
+        """
+        Versión activa según el puntero CURRENT en disco.
+
+        Otro proceso (ej: el script de entrenamiento) puede promover una
+        versión; se detecta al leer el puntero.
+
+        Args:
+            name: Tipo de modelo
+
+        Returns:
+            Versión activa o None si el modelo no tiene versiones
+        """
+        current = self.root / name / "CURRENT"
+        if current.exists():
+            return current.read_text().strip()
+        return self._active.get(name)
+
+    def preload(self, names: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+        """
+        Carga por adelantado las versiones activas (al iniciar la app).
+
+        Args:
+            names: Modelos a precargar (None = todos los conocidos)
+
+        Returns:
+            Diccionario nombre → versión cargada (None si no se pudo)
+        """
+        loaded = {}
+        for name in names or list(MODEL_KINDS):
+            try:
+                self.get(name)
+                loaded[name] = self.current_version(name) or "legacy"
+            except Exception as e:
+                print(f"⚠️  No se pudo precargar {name}: {e}")
+                loaded[name] = None
+        return loaded
+
+    def list_versions(self, name: str) -> List[Dict]:
+        """
+        Metadatos de todas las versiones de un modelo.
+
+        Args:
+            name: Tipo de modelo
+
+        Returns:
+            Lista de metadatos (más reciente primero), con `active` marcado
+        """
+        model_dir = self.root / name
+        if not model_dir.exists():
+            return []
+
+        active = self.current_version(name)
+        versions = []
+        for path in sorted(model_dir.glob("v*/metadata.json"), reverse=True):
+            metadata = json.loads(path.read_text())
+            metadata["active"] = metadata["version"] == active
+            versions.append(metadata)
+        return versions
+
+    def get_metadata(self, name: str, version: Optional[str] = None) -> Optional[Dict]:
+        """Metadatos de una versión (None = la activa)."""
+        version = version or self.current_version(name)
+        if version is None:
+            return None
+        path = self.root / name / version / "metadata.json"
+        return json.loads(path.read_text()) if path.exists() else None
+
+    def evict(self, name: str, keep_active: bool = True) -> None:
+        """
+        Libera de memoria las versiones cargadas de un modelo.
+
+        Args:
+            name: Tipo de modelo
+            keep_active: Mantener la versión activa
+        """
+        active = self.current_version(name)
+        with self._lock:
+            for key in [k for k in self._models if k[0] == name]:
+                if keep_active and key[1] == active:
+                    continue
+                del self._models[key]
+
+    def _load(self, name: str, version: str) -> Any:
+        key = (name, version)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            # Otro hilo pudo cargarlo mientras se esperaba el lock
+            if key in self._models:
+                return self._models[key]
+
+            path = self.root / name / version / "model.joblib"
+            start = time.perf_counter()
+            model = self._kind(name)["load"](str(path), self.mmap_mode)
+            self.load_seconds[key] = round(time.perf_counter() - start, 3)
+            self._models[key] = model
+
+        print(f"⏱️  {name} {version} cargado en {self.load_seconds[key]:.2f}s")
+        return model
+
+    def _get_legacy(self, name: str) -> Any:
+        path = LEGACY_PATHS.get(name)
+        if not path or not Path(path).exists():
+            raise FileNotFoundError(
+                f"No hay versiones registradas de {name}. Entrena el modelo primero."
+            )
+        return self._load_path(name, "legacy", path)
+
+    def _load_path(self, name: str, version: str, path: str) -> Any:
+        key = (name, version)
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = self._kind(name)["load"](path, None)
+            return self._models[key]
+
+    def _next_version(self, name: str) -> str:
+        existing = [
+            int(p.name[1:]) for p in (self.root / name).glob("v*")
+            if p.is_dir() and p.name[1:].isdigit()
+        ]
+        return f"v{max(existing, default=0) + 1:04d}"
+
+    @staticmethod
+    def _kind(name: str) -> Dict[str, Callable]:
+        if name not in MODEL_KINDS:
+            raise ValueError(f"Modelo no soportado: {name}. Opciones: {list(MODEL_KINDS)}")
+        return MODEL_KINDS[name]
+
+
+def _json_safe(value: Any) -> Any:
+    """Convierte tipos NumPy a tipos JSON."""
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+# Un registro por directorio en todo el proceso
+_registries: Dict[str, ModelRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(root: str = REGISTRY_ROOT) -> ModelRegistry:
+    """
+    Registro compartido por todo el proceso.
+
+    Args:
+        root: Directorio del registro
+
+    Returns:
+        Instancia única de ModelRegistry para ese directorio
+    """
+    key = str(Path(root).resolve())
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = ModelRegistry(root)
+        return _registries[key]
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    registry = get_registry()
+
+    for name in MODEL_KINDS:
+        print(f"\n{name}:")
+        for meta in registry.list_versions(name):
+            marca = " (activa)" if meta["active"] else ""
+            print(f"  {meta['version']}{marca} - {meta['created']} - "
+                  f"datos {meta['data_version']} - métricas {meta['metrics']}")
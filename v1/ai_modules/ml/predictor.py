@@ -6,34 +6,132 @@ Entrena y usa modelos ML para predecir huella de carbono en concretos.
 """
 
 import os
+import sys
+import json
+import time
+import hashlib
 import sqlite3
 import pandas as pd
 import numpy as np
 import joblib
+from contextlib import contextmanager
 from pathlib import Path
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 
 
+# Columnas numéricas de entrada (en este orden para predict_batch con arrays)
+INPUT_COLUMNS = [
+    'año',
+    'resistencia',
+    'contenido_cemento',
+    'a1_intensidad',
+    'a2_intensidad',
+    'a3_intensidad',
+    'a4_intensidad'
+]
+
+# Features desde la tabla unificada `remitos` (PostgreSQL). Las emisiones
+# por etapa vienen en kg totales: se llevan a intensidad por m³. Se leen
+# las filas hasta el max_id de REMITOS_VERSION_QUERY, en orden de id.
+REMITOS_FEATURES_QUERY = """
+SELECT
+    origen AS compania,
+    año,
+    resistencia_mpa AS resistencia,
+    contenido_cemento,
+    a1_total / volumen AS a1_intensidad,
+    a2_total / volumen AS a2_intensidad,
+    a3_total / volumen AS a3_intensidad,
+    a4_total / volumen AS a4_intensidad,
+    co2_kg_m3 AS huella_co2
+FROM remitos
+WHERE co2_kg_m3 > 0 AND resistencia_mpa > 0 AND id <= :max_id
+ORDER BY id
+"""
+
+REMITOS_VERSION_QUERY = """
+SELECT COUNT(*) AS n, MAX(id) AS max_id, MAX(fecha_migracion) AS ultima_migracion
+FROM remitos
+WHERE co2_kg_m3 > 0 AND resistencia_mpa > 0
+"""
+
+FEATURE_CACHE_DIR = "ai_modules/ml/cache"
+
+
+# Código de remitos.origen → nombre que muestra la app
+NOMBRES_COMPANIA = {
+    'pacas': 'Pacasmayo',
+    'mzma': 'MZMA',
+    'melon': 'Melón',
+    'lomax': 'Lomax'
+}
+
+# Otros nombres con que la app o remitos_concretos identifican a cada compañía
+ALIAS_COMPANIA = {
+    **{nombre.lower(): codigo for codigo, nombre in NOMBRES_COMPANIA.items()},
+    'cementos pacasmayo': 'pacas',
+    'mi zona': 'mzma',
+    'mi zona / mzma': 'mzma',
+    'melon': 'melon',
+    'melón_main_old': 'melon',
+    'melon_main_old': 'melon'
+}
+
+
+def normalizar_compania(valor) -> str:
+    """
+    Forma canónica de una compañía: el código de remitos.origen.
+
+    Se aplica igual al entrenar y al predecir, así "MZMA", "Mi Zona / MZMA"
+    y "mzma" son la misma categoría, y "Pacasmayo" es "pacas". Un nombre sin
+    alias queda en minúsculas (el modelo lo rechaza si no lo conoce).
+    """
+    clave = str(valor).strip().lower()
+    return ALIAS_COMPANIA.get(clave, clave)
+
+
+def nombre_compania(codigo: str) -> str:
+    """Nombre de una compañía para mostrar en la app (código en mayúsculas si no tiene)."""
+    return NOMBRES_COMPANIA.get(normalizar_compania(codigo), str(codigo).upper())
+
+
+def _peak_memory_mb():
+    """Pico de memoria residente del proceso en MB (None si no disponible)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    divisor = 1024 * 1024 if os.uname().sysname == "Darwin" else 1024
+    return round(peak / divisor, 1)
+
+
 class HuellaPredictor:
     """
     Predictor de huella de carbono usando Gradient Boosting.
     """
 
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, mmap_mode: str = None):
         """
         Inicializa el predictor.
 
         Args:
             model_path: Ruta al modelo guardado. Si no existe, se entrena uno nuevo.
+            mmap_mode: Modo de memory-map de joblib al cargar ('r' o None)
         """
         self.model = None
         self.feature_names = None
         self.stats = {}
+        # Codificador fijo categoría → columna (se guarda con el modelo)
+        self.encoder = {}
+        self.data_version = None
 
         if model_path and Path(model_path).exists():
-            self.load_model(model_path)
+            self.load_model(model_path, mmap_mode=mmap_mode)
         else:
             print("No se encontro modelo guardado. Se entrenara uno nuevo.")
 
@@ -59,19 +157,22 @@ class HuellaPredictor:
         df['ratio_a3_total'] = df['a3_intensidad'] / (df['intensidad_total_a1_a3'] + 1e-6)
         df['cemento_por_resistencia'] = df['contenido_cemento'] / (df['resistencia'] + 1)
 
-        # One-hot encoding para compania
+        # One-hot encoding para compania (categorías normalizadas)
+        df['compania'] = df['compania'].map(normalizar_compania)
         df = pd.get_dummies(df, columns=['compania'], prefix='comp', drop_first=True)
 
         return df
 
-    def train(self, db_path: str, save_path: str = None):
+    def train(self, db_path: str, save_path: str = None, engine: str = "gbr"):
         """
         Entrena el modelo con datos de la base de datos.
 
         Args:
             db_path: Ruta a la base de datos SQLite
             save_path: Ruta donde guardar el modelo entrenado
+            engine: "gbr" (GradientBoosting) o "hist" (HistGradientBoosting)
         """
+        start = time.perf_counter()
         print("Cargando datos...")
         conn = sqlite3.connect(db_path)
 
@@ -95,10 +196,12 @@ class HuellaPredictor:
         print(f"Datos cargados: {len(df):,} registros")
 
         # Preparar features
+        companias = df['compania'].fillna(0).map(normalizar_compania).unique()
         df = self.prepare_features(df)
 
         # Definir features
         self.feature_names = [col for col in df.columns if col not in ['huella_co2']]
+        self.encoder = self._build_encoder(self.feature_names, companias)
 
         X = df[self.feature_names]
         y = df['huella_co2']
@@ -108,15 +211,237 @@ class HuellaPredictor:
             X, y, test_size=0.2, random_state=42
         )
 
-        print(f"Entrenando modelo Gradient Boosting...")
-        self.model = GradientBoostingRegressor(
-            n_estimators=200,
-            learning_rate=0.05,
-            max_depth=5,
-            random_state=42
+        prepare_seconds = time.perf_counter() - start
+        self._fit_and_evaluate(X_train, y_train, X_test, y_test, engine)
+        self.stats['prepare_seconds'] = round(prepare_seconds, 2)
+
+        # Guardar
+        if save_path:
+            self.save_model(save_path)
+
+    def train_from_remitos(
+        self,
+        db_engine=None,
+        save_path: str = None,
+        engine: str = "hist",
+        chunksize: int = 100_000,
+        cache_dir: str = FEATURE_CACHE_DIR,
+        test_size: float = 0.2
+    ):
+        """
+        Entrena el modelo desde la tabla unificada `remitos` sin cargarla entera.
+
+        Las filas se leen por bloques (cursor del lado del servidor), se
+        codifican con el codificador fijo y se escriben en una matriz
+        float32 memory-mapped. La matriz queda en caché por versión de
+        datos: si `remitos` no cambió, el reentrenamiento no vuelve a leer
+        la BD.
+
+        Args:
+            db_engine: Engine SQLAlchemy (None = database.models.get_engine())
+            save_path: Ruta donde guardar el modelo entrenado
+            engine: "hist" (HistGradientBoosting, multinúcleo) o "gbr"
+            chunksize: Filas por bloque de lectura
+            cache_dir: Directorio de la caché de features
+            test_size: Fracción de filas para evaluación
+        """
+        if db_engine is None:
+            from database.models import get_engine
+            db_engine = get_engine()
+
+        start = time.perf_counter()
+        X, y = self.load_feature_matrix(db_engine, chunksize=chunksize, cache_dir=cache_dir)
+
+        # Split por índices; cada partición se copia recorriendo el memmap por
+        # bloques (X[indices] sobre el memmap entero lo lleva completo a RAM)
+        rng = np.random.default_rng(42)
+        order = rng.permutation(len(y))
+        n_test = int(len(y) * test_size)
+        test_idx = np.sort(order[:n_test])
+        train_idx = np.sort(order[n_test:])
+
+        X_train = _take_rows(X, train_idx, chunksize)
+        X_test = _take_rows(X, test_idx, chunksize)
+        prepare_seconds = time.perf_counter() - start
+
+        self._fit_and_evaluate(X_train, np.asarray(y)[train_idx], X_test, np.asarray(y)[test_idx], engine)
+        self.stats['prepare_seconds'] = round(prepare_seconds, 2)
+        self.stats['source'] = 'remitos'
+        self.stats['data_version'] = self.data_version
+
+        if save_path:
+            self.save_model(save_path)
+
+    def load_feature_matrix(
+        self,
+        db_engine,
+        chunksize: int = 100_000,
+        cache_dir: str = FEATURE_CACHE_DIR
+    ):
+        """
+        Devuelve la matriz de features de `remitos` como memmap (X, y).
+
+        Define feature_names y encoder con las compañías presentes. Si ya
+        existe una matriz para la versión de datos actual se reutiliza.
+
+        La versión, las compañías y las filas se leen en la misma
+        transacción (REPEATABLE READ en PostgreSQL) y hasta el mismo max_id,
+        así la matriz guardada corresponde exactamente a su versión.
+
+        Args:
+            db_engine: Engine SQLAlchemy (o conexión aceptada por pandas)
+            chunksize: Filas por bloque de lectura
+            cache_dir: Directorio de la caché de features
+
+        Returns:
+            Tupla (X, y) de arrays float32 memory-mapped en solo lectura
+        """
+        with self._snapshot(db_engine) as conn:
+            return self._load_feature_matrix(conn, chunksize, cache_dir)
+
+    def _load_feature_matrix(self, conn, chunksize: int, cache_dir: str):
+        """load_feature_matrix dentro de la transacción de _snapshot."""
+        version = _read_sql(conn, REMITOS_VERSION_QUERY).iloc[0]
+        n_rows = int(version['n'])
+        max_id = int(version['max_id']) if pd.notna(version['max_id']) else 0
+        companias = sorted(set(_read_sql(
+            conn,
+            "SELECT DISTINCT origen FROM remitos "
+            "WHERE co2_kg_m3 > 0 AND resistencia_mpa > 0 AND id <= :max_id",
+            {'max_id': max_id}
+        )['origen'].dropna().map(normalizar_compania)))
+
+        # Mismo orden de columnas que prepare_features + get_dummies(drop_first=True)
+        self.feature_names = INPUT_COLUMNS + [
+            'intensidad_total_a1_a3',
+            'ratio_a1_total',
+            'ratio_a2_total',
+            'ratio_a3_total',
+            'cemento_por_resistencia'
+        ] + [f"comp_{c}" for c in companias[1:]]
+        self.encoder = self._build_encoder(self.feature_names, companias)
+
+        data_version = f"{n_rows}|{max_id}|{version['ultima_migracion']}"
+        self.data_version = data_version
+        key = hashlib.sha256(
+            json.dumps([data_version, self.feature_names, REMITOS_FEATURES_QUERY]).encode("utf-8")
+        ).hexdigest()[:16]
+
+        cache = Path(cache_dir)
+        x_path = cache / f"remitos_{key}_X.npy"
+        y_path = cache / f"remitos_{key}_y.npy"
+        meta_path = cache / f"remitos_{key}.json"
+
+        if meta_path.exists() and x_path.exists() and y_path.exists():
+            meta = json.loads(meta_path.read_text())
+            print(f"📂 Usando features en caché ({meta['n_rows']:,} filas, versión {data_version})")
+            return self._open_cached(x_path, y_path, meta['n_rows'])
+
+        cache.mkdir(parents=True, exist_ok=True)
+        x_tmp = x_path.with_suffix(".tmp.npy")
+        y_tmp = y_path.with_suffix(".tmp.npy")
+
+        X = np.lib.format.open_memmap(
+            x_tmp, mode="w+", dtype=np.float32, shape=(n_rows, len(self.feature_names))
         )
+        y = np.lib.format.open_memmap(y_tmp, mode="w+", dtype=np.float32, shape=(n_rows,))
+
+        print(f"Leyendo {n_rows:,} remitos en bloques de {chunksize:,}...")
+        written = 0
+        for chunk in _read_sql(conn, REMITOS_FEATURES_QUERY, {'max_id': max_id}, chunksize=chunksize):
+            n = len(chunk)
+            if written + n > n_rows:
+                # Sin snapshot (conexión sin transacción) remitos cambió a mitad de lectura
+                raise RuntimeError(
+                    f"remitos cambió durante la lectura ({written + n:,} filas > {n_rows:,}); "
+                    "reintentar el entrenamiento"
+                )
+
+            columns = {col: chunk[col].to_numpy() for col in chunk.columns}
+            X[written:written + n] = self.encode(columns, n)
+            y[written:written + n] = np.nan_to_num(chunk['huella_co2'].to_numpy(dtype=float))
+            written += n
+
+        X.flush()
+        y.flush()
+        del X, y
+
+        os.replace(x_tmp, x_path)
+        os.replace(y_tmp, y_path)
+        meta_path.write_text(json.dumps({
+            'n_rows': written,
+            'data_version': data_version,
+            'feature_names': self.feature_names
+        }, ensure_ascii=False))
+
+        print(f"✅ Features guardadas en {x_path} ({written:,} filas)")
+        return self._open_cached(x_path, y_path, written)
+
+    @staticmethod
+    def _open_cached(x_path: Path, y_path: Path, n_rows: int):
+        X = np.load(x_path, mmap_mode="r")[:n_rows]
+        y = np.load(y_path, mmap_mode="r")[:n_rows]
+        return X, y
+
+    @staticmethod
+    @contextmanager
+    def _snapshot(db_engine):
+        """
+        Conexión con una sola transacción para leer versión y filas.
+
+        Con un Engine SQLAlchemy se abre una conexión con cursor del lado
+        del servidor (REPEATABLE READ en PostgreSQL); una conexión ya
+        abierta se usa tal cual.
+        """
+        if not (hasattr(db_engine, "connect") and hasattr(db_engine, "dispose")):
+            yield db_engine
+            return
 
+        options = {'stream_results': True}
+        if db_engine.dialect.name == "postgresql":
+            options['isolation_level'] = "REPEATABLE READ"
+
+        with db_engine.connect().execution_options(**options) as conn:
+            with conn.begin():
+                yield conn
+
+    def _fit_and_evaluate(self, X_train, y_train, X_test, y_test, engine: str = "gbr"):
+        """
+        Entrena el modelo elegido y calcula métricas sobre el set de prueba.
+
+        Args:
+            X_train, y_train: Datos de entrenamiento
+            X_test, y_test: Datos de evaluación
+            engine: "gbr" (GradientBoosting) o "hist" (HistGradientBoosting)
+        """
+        if engine == "hist":
+            print(f"Entrenando modelo Histogram Gradient Boosting...")
+            self.model = HistGradientBoostingRegressor(
+                max_iter=200,
+                learning_rate=0.05,
+                max_depth=5,
+                early_stopping=False,
+                random_state=42
+            )
+        elif engine == "gbr":
+            print(f"Entrenando modelo Gradient Boosting...")
+            self.model = GradientBoostingRegressor(
+                n_estimators=200,
+                learning_rate=0.05,
+                max_depth=5,
+                random_state=42
+            )
+        else:
+            raise ValueError(f"Motor no soportado: {engine}. Usa 'gbr' o 'hist'.")
+
+        # Mismos nombres de columnas que usa predict_batch
+        if not isinstance(X_train, pd.DataFrame):
+            X_train = pd.DataFrame(X_train, columns=self.feature_names, copy=False)
+            X_test = pd.DataFrame(X_test, columns=self.feature_names, copy=False)
+
+        fit_start = time.perf_counter()
         self.model.fit(X_train, y_train)
+        train_seconds = time.perf_counter() - fit_start
 
         # Evaluar
         y_pred = self.model.predict(X_test)
@@ -125,17 +450,17 @@ class HuellaPredictor:
             'mae': mean_absolute_error(y_test, y_pred),
             'r2': r2_score(y_test, y_pred),
             'n_train': len(X_train),
-            'n_test': len(X_test)
+            'n_test': len(X_test),
+            'engine': engine,
+            'train_seconds': round(train_seconds, 2),
+            'peak_memory_mb': _peak_memory_mb()
         }
 
         print(f"Modelo entrenado!")
         print(f"  R²: {self.stats['r2']:.4f}")
         print(f"  RMSE: {self.stats['rmse']:.2f} kg CO₂/m³")
         print(f"  MAE: {self.stats['mae']:.2f} kg CO₂/m³")
-
-        # Guardar
-        if save_path:
-            self.save_model(save_path)
+        print(f"  ⏱️  Entrenamiento: {train_seconds:.1f}s, pico de memoria: {self.stats['peak_memory_mb']} MB")
 
     def predict(self, features: dict) -> dict:
         """
@@ -156,66 +481,280 @@ class HuellaPredictor:
         Returns:
             Diccionario con predicción e intervalo de confianza
         """
+        resultado = self.predict_batch(pd.DataFrame([features])).iloc[0]
+
+        return {
+            'prediccion': round(float(resultado['prediccion']), 2),
+            'ci_lower': round(float(resultado['ci_lower']), 2),
+            'ci_upper': round(float(resultado['ci_upper']), 2),
+            'r2': self.stats.get('r2', 0),
+            'rmse': self.stats.get('rmse', 0)
+        }
+
+    def predict_batch(self, data, compania=None) -> pd.DataFrame:
+        """
+        Predice la huella de muchas filas en una sola llamada al modelo.
+
+        Args:
+            data: DataFrame con las columnas de predict() (una fila por caso),
+                o array NumPy (n, 7) con las columnas de INPUT_COLUMNS
+            compania: Solo para arrays: compañía común (str) o una por fila
+
+        Returns:
+            DataFrame con columnas prediccion, ci_lower, ci_upper
+            (mismo índice que `data` si es DataFrame)
+        """
         if not self.model:
             raise ValueError("Modelo no inicializado. Entrena o carga un modelo primero.")
 
-        # Crear DataFrame
-        df = pd.DataFrame([features])
+        if isinstance(data, pd.DataFrame):
+            index = data.index
+            columns = {col: data[col].to_numpy() for col in data.columns}
+        else:
+            array = np.asarray(data, dtype=float)
+            if array.ndim != 2 or array.shape[1] != len(INPUT_COLUMNS):
+                raise ValueError(f"Se esperaba un array (n, {len(INPUT_COLUMNS)}) con columnas {INPUT_COLUMNS}")
+            index = pd.RangeIndex(len(array))
+            columns = {col: array[:, i] for i, col in enumerate(INPUT_COLUMNS)}
+            if compania is not None:
+                columns['compania'] = np.broadcast_to(np.asarray(compania, dtype=object), (len(array),))
 
-        # Preparar features
-        df = self.prepare_features(df)
+        X = self.encode(columns, len(index))
+        prediccion = self.model.predict(pd.DataFrame(X, columns=self.feature_names, copy=False))
 
-        # Asegurar que todas las columnas existen
-        for col in self.feature_names:
-            if col not in df.columns:
-                df[col] = 0
+        # Intervalo de confianza aproximado (± 1.96 * MAE)
+        margen = 1.96 * self.stats.get('mae', 20)
 
-        # Ordenar columnas
-        df = df[self.feature_names]
+        return pd.DataFrame({
+            'prediccion': prediccion,
+            'ci_lower': np.maximum(0, prediccion - margen),
+            'ci_upper': prediccion + margen
+        }, index=index)
 
-        # Predecir
-        prediccion = self.model.predict(df)[0]
+    def encode(self, columns: dict, n_rows: int) -> np.ndarray:
+        """
+        Construye la matriz de features con el codificador fijo del modelo.
 
-        # Intervalo de confianza aproximado (± 1.96 * MAE)
-        ci_lower = max(0, prediccion - 1.96 * self.stats.get('mae', 20))
-        ci_upper = prediccion + 1.96 * self.stats.get('mae', 20)
+        Equivale a prepare_features + get_dummies + relleno de columnas, pero
+        vectorizado y sin depender de las categorías presentes en el lote.
 
-        return {
-            'prediccion': round(prediccion, 2),
-            'ci_lower': round(ci_lower, 2),
-            'ci_upper': round(ci_upper, 2),
-            'r2': self.stats.get('r2', 0),
-            'rmse': self.stats.get('rmse', 0)
+        Args:
+            columns: Diccionario columna → array (columnas de entrada)
+            n_rows: Número de filas
+
+        Returns:
+            Array (n_rows, len(feature_names)) en el orden de feature_names
+
+        Raises:
+            ValueError: Si hay compañías que el modelo no conoce
+        """
+        def numeric(col):
+            if col not in columns:
+                return np.zeros(n_rows)
+            values = pd.to_numeric(pd.Series(columns[col]), errors='coerce').to_numpy(dtype=float)
+            return np.nan_to_num(values, nan=0.0)
+
+        base = {col: numeric(col) for col in INPUT_COLUMNS}
+
+        # Features derivadas (mismas fórmulas que prepare_features)
+        total = base['a1_intensidad'] + base['a2_intensidad'] + base['a3_intensidad']
+        derived = {
+            'intensidad_total_a1_a3': total,
+            'ratio_a1_total': base['a1_intensidad'] / (total + 1e-6),
+            'ratio_a2_total': base['a2_intensidad'] / (total + 1e-6),
+            'ratio_a3_total': base['a3_intensidad'] / (total + 1e-6),
+            'cemento_por_resistencia': base['contenido_cemento'] / (base['resistencia'] + 1)
+        }
+
+        X = np.zeros((n_rows, len(self.feature_names)))
+        position = {name: i for i, name in enumerate(self.feature_names)}
+
+        for name, values in {**base, **derived}.items():
+            if name in position:
+                X[:, position[name]] = values
+
+        # One-hot de compañía: categoría → columna (categoría base = ceros)
+        for col, mapping in self.encoder.items():
+            if col not in columns or not mapping:
+                continue
+            categories = list(mapping)
+            values = pd.Series(np.asarray(columns[col], dtype=object)).map(normalizar_compania)
+            codes = pd.Categorical(values, categories=categories).codes
+
+            # Modelos antiguos no guardan la categoría base (None): no se puede validar
+            if None in mapping.values() and (codes < 0).any():
+                desconocidas = sorted(set(values[codes < 0]))
+                raise ValueError(
+                    f"Compañía(s) desconocida(s) para el modelo: {desconocidas}. "
+                    f"Conocidas: {sorted(categories)}"
+                )
+
+            targets = np.array([-1 if mapping[c] is None else mapping[c] for c in categories])
+            rows = np.flatnonzero(codes >= 0)
+            rows = rows[targets[codes[rows]] >= 0]
+            X[rows, targets[codes[rows]]] = 1.0
+
+        return X
+
+    def companias(self) -> list:
+        """Compañías conocidas por el modelo (normalizadas)."""
+        return sorted(self.encoder.get('compania', {}))
+
+    @staticmethod
+    def _build_encoder(feature_names: list, categorias=None) -> dict:
+        """
+        Codificador categoría → índice de columna a partir de las features.
+
+        Args:
+            feature_names: Features del modelo (incluye columnas comp_*)
+            categorias: Todas las compañías de entrenamiento; las que no tienen
+                columna (base de drop_first) se guardan con índice None
+
+        Returns:
+            {'compania': {categoria: indice_columna | None}}
+        """
+        mapping = {
+            normalizar_compania(name[len('comp_'):]): i
+            for i, name in enumerate(feature_names)
+            if name.startswith('comp_')
         }
+        for categoria in categorias if categorias is not None else []:
+            mapping.setdefault(normalizar_compania(categoria), None)
+        return {'compania': mapping}
 
     def save_model(self, path: str):
         """Guarda el modelo entrenado."""
         model_data = {
             'model': self.model,
             'feature_names': self.feature_names,
+            'encoder': self.encoder,
             'stats': self.stats
         }
         joblib.dump(model_data, path)
         print(f"Modelo guardado en: {path}")
 
-    def load_model(self, path: str):
-        """Carga un modelo guardado."""
-        model_data = joblib.load(path)
+    def load_model(self, path: str, mmap_mode: str = None):
+        """
+        Carga un modelo guardado.
+
+        Args:
+            path: Ruta del modelo
+            mmap_mode: Modo de memory-map de joblib para los arrays NumPy ('r' o None)
+        """
+        model_data = joblib.load(path, mmap_mode=mmap_mode)
         self.model = model_data['model']
         self.feature_names = model_data['feature_names']
         self.stats = model_data['stats']
+        # Modelos guardados antes del codificador: se reconstruye desde las features
+        encoder = model_data.get('encoder') or self._build_encoder(self.feature_names)
+        self.encoder = {
+            col: {normalizar_compania(c): i for c, i in mapping.items()}
+            for col, mapping in encoder.items()
+        }
         print(f"Modelo cargado desde: {path}")
         print(f"  R²: {self.stats.get('r2', 0):.4f}")
         print(f"  RMSE: {self.stats.get('rmse', 0):.2f} kg CO₂/m³")
 
 
+def _read_sql(conn, query: str, params: dict = None, chunksize: int = None):
+    """pd.read_sql_query con parámetros :nombre (SQLAlchemy o sqlite3)."""
+    if hasattr(conn, "dialect"):
+        from sqlalchemy import text
+        query = text(query)
+    return pd.read_sql_query(query, conn, params=params, chunksize=chunksize)
+
+
+def _take_rows(X, indices: np.ndarray, chunk_rows: int) -> np.ndarray:
+    """
+    Copia las filas `indices` (ordenados) de un memmap recorriéndolo por bloques.
+
+    Args:
+        X: Array o memmap (n, m)
+        indices: Índices de fila ordenados de menor a mayor
+        chunk_rows: Filas del memmap leídas por bloque
+
+    Returns:
+        Array en memoria (len(indices), m) con el dtype de X
+    """
+    out = np.empty((len(indices),) + X.shape[1:], dtype=X.dtype)
+    starts = np.arange(0, len(X) + chunk_rows, chunk_rows)
+    bounds = np.searchsorted(indices, starts)
+
+    for i, start in enumerate(starts[:-1]):
+        lo, hi = bounds[i], bounds[i + 1]
+        if lo < hi:
+            out[lo:hi] = X[start:start + chunk_rows][indices[lo:hi] - start]
+
+    return out
+
+
+def benchmark_prediccion(predictor: HuellaPredictor, n_rows: int = 50_000, n_single: int = 500) -> dict:
+    """
+    Compara el throughput de predict_batch contra predict fila a fila.
+
+    Args:
+        predictor: Predictor con modelo cargado
+        n_rows: Filas sintéticas para predict_batch
+        n_single: Filas evaluadas con predict (se extrapola)
+
+    Returns:
+        Diccionario con filas/s de cada camino y speedup
+    """
+    rng = np.random.default_rng(42)
+    companias = predictor.companias() or ['mzma']
+
+    df = pd.DataFrame({
+        'compania': rng.choice(companias, n_rows),
+        'año': rng.integers(2020, 2025, n_rows),
+        'resistencia': rng.uniform(15, 50, n_rows),
+        'contenido_cemento': rng.uniform(200, 500, n_rows),
+        'a1_intensidad': rng.uniform(180, 300, n_rows),
+        'a2_intensidad': rng.uniform(2, 30, n_rows),
+        'a3_intensidad': rng.uniform(0.4, 2, n_rows),
+        'a4_intensidad': rng.uniform(5, 25, n_rows)
+    })
+
+    inicio = time.perf_counter()
+    predictor.predict_batch(df)
+    batch_s = time.perf_counter() - inicio
+
+    registros = df.head(n_single).to_dict('records')
+    inicio = time.perf_counter()
+    for features in registros:
+        predictor.predict(features)
+    single_s = time.perf_counter() - inicio
+
+    resultado = {
+        'batch_rows_per_s': n_rows / batch_s,
+        'single_rows_per_s': len(registros) / single_s,
+    }
+    resultado['speedup'] = resultado['batch_rows_per_s'] / resultado['single_rows_per_s']
+
+    print(f"predict_batch: {resultado['batch_rows_per_s']:,.0f} filas/s ({n_rows:,} filas)")
+    print(f"predict:       {resultado['single_rows_per_s']:,.0f} filas/s ({len(registros):,} filas)")
+    print(f"Speedup:       {resultado['speedup']:,.0f}x")
+    return resultado
+
+
 # Script para entrenar y guardar modelo
 if __name__ == "__main__":
     DB_PATH = "/home/cpinilla/databases/ficem_bd/data/ficem_bd.db"
-    MODEL_PATH = "ai_modules/ml/saved_models/huella_predictor.pkl"
+
+    from ai_modules.ml.model_registry import get_registry
 
     predictor = HuellaPredictor()
-    predictor.train(DB_PATH, MODEL_PATH)
+    if "--remitos" in sys.argv:
+        # Tabla unificada en PostgreSQL, lectura por bloques + HistGradientBoosting
+        predictor.train_from_remitos(engine="hist")
+    else:
+        predictor.train(DB_PATH)
+
+    # Nueva versión en el registro (la anterior se conserva)
+    get_registry().register(
+        "huella_predictor",
+        predictor,
+        data_version=predictor.stats.get('data_version')
+    )
 
     # Test
     test_features = {
@@ -233,3 +772,6 @@ if __name__ == "__main__":
     print(f"\nTest de prediccion:")
     print(f"  Prediccion: {resultado['prediccion']} kg CO₂/m³")
     print(f"  IC 95%: [{resultado['ci_lower']}, {resultado['ci_upper']}]")
+
+    print(f"\nBenchmark de prediccion:")
+    benchmark_prediccion(predictor)
@@ -0,0 +1,234 @@
+"""
+Motor de Escenarios What-If
+Piloto IA - FICEM BD
+
+Evalúa grillas de parámetros (resistencia × contenido de cemento ×
+intensidades A1-A4 × compañía) en un solo lote vectorizado con
+HuellaPredictor.predict_batch y resume el resultado como superficie de
+respuesta y tabla de sensibilidad.
+"""
+
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ai_modules.ml.predictor import HuellaPredictor, INPUT_COLUMNS
+
+
+# Parámetros que acepta una grilla
+GRID_PARAMETERS = ['compania'] + INPUT_COLUMNS
+
+# Nombres para tablas y gráficos
+PARAMETER_LABELS = {
+    'compania': 'Compañía',
+    'año': 'Año',
+    'resistencia': 'Resistencia (MPa)',
+    'contenido_cemento': 'Contenido de cemento (kg/m³)',
+    'a1_intensidad': 'A1 (kg CO₂/m³)',
+    'a2_intensidad': 'A2 (kg CO₂/m³)',
+    'a3_intensidad': 'A3 (kg CO₂/m³)',
+    'a4_intensidad': 'A4 (kg CO₂/m³)'
+}
+
+
+def build_grid(grid: Dict[str, object]) -> pd.DataFrame:
+    """
+    Producto cartesiano de los valores de cada parámetro.
+
+    Args:
+        grid: Parámetro → lista de valores (o un valor fijo)
+
+    Returns:
+        DataFrame con una fila por combinación
+    """
+    unknown = set(grid) - set(GRID_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Parámetros no soportados: {sorted(unknown)}")
+
+    names = [p for p in GRID_PARAMETERS if p in grid]
+    values = [np.atleast_1d(np.asarray(grid[p], dtype=object if p == 'compania' else float)) for p in names]
+
+    # Índices de todas las combinaciones sin bucles de Python
+    mesh = np.meshgrid(*[np.arange(len(v)) for v in values], indexing='ij')
+    return pd.DataFrame({
+        name: v[idx.ravel()] for name, v, idx in zip(names, values, mesh)
+    })
+
+
+class ScenarioEngine:
+    """
+    Evalúa escenarios what-if con el predictor de huella.
+
+    Los resultados se guardan por grilla (LRU) para que explorar la misma
+    combinación de palancas sea instantáneo.
+    """
+
+    def __init__(self, predictor: HuellaPredictor, cache_size: int = 32, max_rows: int = 500_000):
+        """
+        Inicializa el motor.
+
+        Args:
+            predictor: Predictor con modelo cargado
+            cache_size: Grillas guardadas en caché
+            max_rows: Máximo de combinaciones por grilla
+        """
+        self.predictor = predictor
+        self.cache_size = cache_size
+        self.max_rows = max_rows
+
+        self._cache: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def evaluate(self, grid: Dict[str, object]) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Predice la huella de todas las combinaciones de la grilla.
+
+        El motor se comparte entre sesiones, así que las estadísticas de la
+        evaluación se devuelven junto al resultado en vez de guardarse.
+
+        Args:
+            grid: Parámetro → lista de valores (o un valor fijo)
+
+        Returns:
+            Tupla (DataFrame con los parámetros y prediccion, ci_lower,
+            ci_upper; estadísticas: rows, cached, seconds, rows_per_s)
+        """
+        key = self._grid_key(grid)
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                results = self._cache[key]
+                return results, {'rows': len(results), 'cached': True, 'seconds': 0.0}
+
+        n_rows = int(np.prod([len(np.atleast_1d(v)) for v in grid.values()]))
+        if n_rows > self.max_rows:
+            raise ValueError(f"La grilla tiene {n_rows:,} combinaciones (máximo {self.max_rows:,})")
+
+        start = time.perf_counter()
+        scenarios = build_grid(grid)
+        predictions = self.predictor.predict_batch(scenarios)
+        results = pd.concat([scenarios, predictions], axis=1)
+        seconds = time.perf_counter() - start
+
+        with self._lock:
+            self._cache[key] = results
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        stats = {
+            'rows': len(results),
+            'cached': False,
+            'seconds': round(seconds, 3),
+            'rows_per_s': round(len(results) / seconds) if seconds > 0 else None
+        }
+        return results, stats
+
+    @staticmethod
+    def response_surface(
+        results: pd.DataFrame,
+        x: str,
+        y: Optional[str] = None,
+        value: str = 'prediccion',
+        aggfunc: str = 'mean'
+    ) -> Union[pd.DataFrame, pd.Series]:
+        """
+        Superficie de respuesta: huella promedio por par de parámetros.
+
+        Con un solo parámetro variable (y=None) se obtiene la curva de
+        respuesta sobre x.
+
+        Args:
+            results: Resultado de evaluate
+            x: Parámetro en columnas
+            y: Parámetro en filas (None = curva sobre x)
+            value: Columna a agregar
+            aggfunc: Agregación sobre los demás parámetros
+
+        Returns:
+            DataFrame pivoteado (filas = valores de y, columnas = valores de x),
+            o Series indexada por x si y es None
+        """
+        if y is None:
+            return results.groupby(x, sort=True)[value].agg(aggfunc)
+        return results.pivot_table(index=y, columns=x, values=value, aggfunc=aggfunc)
+
+    @staticmethod
+    def sensitivity(results: pd.DataFrame, value: str = 'prediccion') -> pd.DataFrame:
+        """
+        Tabla de sensibilidad: efecto de cada parámetro sobre la huella.
+
+        Para cada parámetro con más de un valor se promedia la huella en
+        cada nivel (sobre el resto de la grilla) y se mide el rango entre
+        el nivel más bajo y el más alto.
+
+        Args:
+            results: Resultado de evaluate
+            value: Columna a analizar
+
+        Returns:
+            DataFrame ordenado por impacto (rango en kg CO₂/m³)
+        """
+        base = results[value].mean()
+        rows = []
+
+        for param in GRID_PARAMETERS:
+            if param not in results or results[param].nunique() < 2:
+                continue
+
+            levels = results.groupby(param, sort=True)[value].mean()
+            rows.append({
+                'parametro': PARAMETER_LABELS.get(param, param),
+                'valor_min': levels.index[0],
+                'valor_max': levels.index[-1],
+                'huella_en_min': round(levels.iloc[0], 1),
+                'huella_en_max': round(levels.iloc[-1], 1),
+                'rango_kg': round(levels.max() - levels.min(), 1),
+                'rango_pct': round((levels.max() - levels.min()) / base * 100, 1) if base else None,
+                'nivel_menor_huella': levels.idxmin()
+            })
+
+        columns = ['parametro', 'valor_min', 'valor_max', 'huella_en_min', 'huella_en_max',
+                   'rango_kg', 'rango_pct', 'nivel_menor_huella']
+        return pd.DataFrame(rows, columns=columns).sort_values('rango_kg', ascending=False, ignore_index=True)
+
+    def clear_cache(self) -> None:
+        """Vacía la caché de grillas."""
+        with self._lock:
+            self._cache.clear()
+
+    def _grid_key(self, grid: Dict[str, object]) -> str:
+        """Clave de caché: modelo + grilla canónica."""
+        canonical = {
+            p: [v if isinstance(v, str) else float(v) for v in np.atleast_1d(grid[p]).tolist()]
+            for p in sorted(grid)
+        }
+        return f"{id(self.predictor.model)}|{json.dumps(canonical, ensure_ascii=False)}"
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    from ai_modules.ml.model_registry import get_registry
+
+    engine = ScenarioEngine(get_registry().get("huella_predictor"))
+
+    grid = {
+        'compania': engine.predictor.companias(),
+        'año': 2024,
+        'resistencia': np.arange(15, 51, 5),
+        'contenido_cemento': np.arange(250, 451, 25),
+        'a1_intensidad': np.linspace(180, 300, 7),
+        'a2_intensidad': [5, 15, 25],
+        'a3_intensidad': 1.0,
+        'a4_intensidad': [5, 10, 20]
+    }
+
+    resultados, stats = engine.evaluate(grid)
+    print(f"{stats['rows']:,} escenarios en {stats['seconds']}s")
+    print(engine.sensitivity(resultados).to_string())
+    print(engine.response_surface(resultados, 'contenido_cemento', 'resistencia').round(1).to_string())
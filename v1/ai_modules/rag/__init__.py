@@ -4,9 +4,12 @@ Piloto IA - FICEM BD
 
 Componentes:
 - document_processor: Procesa PDFs y extrae texto
+- ingestion_pipeline: Ingesta paralela (pool de procesos + cola acotada)
 - embeddings_manager: Genera y gestiona embeddings
 - vector_store: Gestion de ChromaDB
 - rag_chain: Chains de LangChain para consultas
+- answer_cache: Caché LRU/TTL de respuestas (exacta + semántica)
+- batching: Pool acotado + limitador de tasa para llamadas al LLM
 """
 
 __version__ = "0.1.0"
@@ -0,0 +1,248 @@
+"""
+Caché de Respuestas para RAG
+Piloto IA - FICEM BD
+
+Guarda las respuestas del LLM para no repetir la generación cuando
+distintos usuarios hacen la misma pregunta de benchmarking.
+
+La clave combina pregunta normalizada, modelo, top_k, ids de los chunks
+recuperados y versión de datos. Opcionalmente busca preguntas casi
+idénticas por similitud de embeddings.
+"""
+
+import re
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normaliza una pregunta para usarla como clave de caché.
+
+    Minúsculas, sin tildes, sin signos de interrogación/exclamación y con
+    espacios colapsados.
+
+    Args:
+        question: Pregunta original
+
+    Returns:
+        Pregunta normalizada
+    """
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[¿?¡!]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class AnswerCache:
+    """
+    Caché LRU con expiración (TTL) para respuestas de RAGChain.
+
+    Es thread-safe: una misma instancia se comparte entre sesiones de
+    Streamlit vía st.cache_resource.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: Optional[float] = 24 * 3600,
+        similarity_threshold: Optional[float] = None
+    ):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_entries: Máximo de respuestas guardadas (LRU)
+            ttl_seconds: Vigencia de cada respuesta (None = sin expiración)
+            similarity_threshold: Similitud coseno mínima para reutilizar la
+                respuesta de una pregunta casi idéntica (None = desactivado)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(
+        question: str,
+        model: str,
+        top_k: int,
+        chunk_ids: List[str],
+        data_version: str
+    ) -> str:
+        """
+        Construye la clave exacta de una respuesta.
+
+        Args:
+            question: Pregunta (se normaliza)
+            model: Modelo LLM
+            top_k: Documentos recuperados
+            chunk_ids: Ids de los chunks recuperados
+            data_version: Versión de los datos (vector store / BD)
+
+        Returns:
+            Hash SHA-256 de la clave
+        """
+        payload = json.dumps(
+            [normalize_question(question), model, top_k, sorted(chunk_ids), data_version],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(
+        self,
+        key: str,
+        namespace: str,
+        embedding: Optional[List[float]] = None
+    ) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Busca una respuesta: primero por clave exacta y, si está activada,
+        por similitud con preguntas casi idénticas del mismo namespace.
+
+        Args:
+            key: Clave generada con make_key
+            namespace: Namespace de la consulta (ver make_namespace)
+            embedding: Embedding de la pregunta (para búsqueda semántica)
+
+        Returns:
+            Tupla (respuesta, tipo de acierto "exact"/"semantic") o (None, None)
+        """
+        with self._lock:
+            response = self._get_exact(key)
+            if response is not None:
+                self.hits += 1
+                return response, "exact"
+
+            response = self._get_similar(embedding, namespace)
+            if response is not None:
+                self.semantic_hits += 1
+                return response, "semantic"
+
+            self.misses += 1
+            return None, None
+
+    def _get_exact(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if self._is_expired(entry):
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return entry["response"]
+
+    def _get_similar(self, embedding: Optional[List[float]], namespace: str) -> Optional[Dict]:
+        if self.similarity_threshold is None or embedding is None:
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = float(np.linalg.norm(query))
+        if query_norm == 0:
+            return None
+
+        best_key, best_sim = None, self.similarity_threshold
+
+        for key, entry in self._entries.items():
+            if entry["namespace"] != namespace or entry["embedding"] is None:
+                continue
+            if self._is_expired(entry):
+                continue
+
+            sim = float(np.dot(query, entry["embedding"]) / (query_norm * entry["embedding_norm"]))
+            if sim >= best_sim:
+                best_key, best_sim = key, sim
+
+        if best_key is None:
+            return None
+
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key]["response"]
+
+    def set(
+        self,
+        key: str,
+        response: Dict,
+        namespace: str,
+        embedding: Optional[List[float]] = None
+    ) -> None:
+        """
+        Guarda una respuesta.
+
+        Args:
+            key: Clave generada con make_key
+            response: Respuesta de RAGChain
+            namespace: Namespace de la consulta
+            embedding: Embedding de la pregunta (para búsqueda semántica)
+        """
+        vector = None
+        vector_norm = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            vector_norm = float(np.linalg.norm(vector)) or None
+            if vector_norm is None:
+                vector = None
+
+        with self._lock:
+            self._entries[key] = {
+                "response": response,
+                "namespace": namespace,
+                "embedding": vector,
+                "embedding_norm": vector_norm,
+                "created": time.time()
+            }
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def make_namespace(model: str, top_k: int, data_version: str) -> str:
+        """Namespace para comparar solo respuestas compatibles."""
+        return f"{model}|{top_k}|{data_version}"
+
+    def clear(self) -> None:
+        """Vacía la caché (las métricas se conservan)."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        """
+        Métricas de uso de la caché.
+
+        Returns:
+            Diccionario con entradas, aciertos, fallos y tasa de acierto
+        """
+        with self._lock:
+            total_hits = self.hits + self.semantic_hits
+            total = total_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": total_hits / total if total > 0 else 0.0
+            }
+
+    def _is_expired(self, entry: Dict) -> bool:
+        if self.ttl_seconds is None:
+            return False
+        return time.time() - entry["created"] > self.ttl_seconds
@@ -0,0 +1,81 @@
+"""
+Utilidades de Concurrencia para Llamadas al LLM
+Piloto IA - FICEM BD
+
+Pool de workers acotado + limitador de tasa para despachar muchas
+consultas (portafolios, informes por compañía) sin saturar Ollama ni
+exceder los límites de la API de Claude.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+
+class RateLimiter:
+    """
+    Limitador de tasa simple (intervalo mínimo entre llamadas), thread-safe.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None):
+        """
+        Args:
+            requests_per_minute: Máximo de llamadas por minuto (None = sin límite)
+        """
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloquea hasta que haya un turno disponible."""
+        if self.interval <= 0:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def map_concurrent(
+    fn: Callable[[Any], Any],
+    items: Sequence[Any],
+    max_concurrency: int = 4,
+    rate_limiter: Optional[RateLimiter] = None,
+    return_exceptions: bool = False
+) -> List[Any]:
+    """
+    Aplica `fn` a cada item con concurrencia acotada y limitador de tasa.
+
+    Args:
+        fn: Función a aplicar
+        items: Items a procesar
+        max_concurrency: Máximo de llamadas simultáneas
+        rate_limiter: Limitador de tasa compartido (opcional)
+        return_exceptions: Devolver la excepción de un item fallido en su
+            posición en lugar de propagarla (el resto del lote continúa)
+
+    Returns:
+        Resultados (o excepción) en el mismo orden que `items`
+    """
+    def run(item):
+        if rate_limiter:
+            rate_limiter.acquire()
+        try:
+            return fn(item)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            print(f"⚠️  Error en lote: {e}")
+            return e
+
+    if not items:
+        return []
+
+    workers = max(1, min(max_concurrency, len(items)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-batch") as executor:
+        return list(executor.map(run, items))
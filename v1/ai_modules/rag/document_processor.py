@@ -6,7 +6,7 @@ Extrae texto de PDFs y PowerPoint y los divide en chunks para embeddings.
 """
 
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 import PyPDF2
 from pptx import Presentation
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -44,6 +44,28 @@ class DocumentProcessor:
         Returns:
             Texto completo del PDF
         """
+        return self.extract_pages_from_pdf(pdf_path)
+
+    def extract_pages_from_pdf(
+        self,
+        pdf_path: str,
+        start_page: int = 0,
+        end_page: Optional[int] = None
+    ) -> str:
+        """
+        Extrae el texto de un rango de páginas de un PDF.
+
+        Permite repartir PDFs muy grandes en shards de páginas que se
+        procesan en paralelo (ver ingestion_pipeline).
+
+        Args:
+            pdf_path: Ruta al archivo PDF
+            start_page: Primera página (base 0, inclusiva)
+            end_page: Última página (base 0, exclusiva). None = hasta el final
+
+        Returns:
+            Texto del rango de páginas con marcadores de página
+        """
         pdf_path = Path(pdf_path)
 
         if not pdf_path.exists():
@@ -54,9 +76,11 @@ class DocumentProcessor:
         try:
             with open(pdf_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
+                num_pages = len(pdf_reader.pages)
+                end = num_pages if end_page is None else min(end_page, num_pages)
 
-                for page_num, page in enumerate(pdf_reader.pages):
-                    page_text = page.extract_text()
+                for page_num in range(start_page, end):
+                    page_text = pdf_reader.pages[page_num].extract_text()
                     if page_text:
                         text += f"\n--- Página {page_num + 1} ---\n{page_text}"
 
@@ -66,6 +90,23 @@ class DocumentProcessor:
 
         return text
 
+    def count_pdf_pages(self, pdf_path: str) -> int:
+        """
+        Cuenta las páginas de un PDF sin extraer texto.
+
+        Args:
+            pdf_path: Ruta al archivo PDF
+
+        Returns:
+            Número de páginas (0 si no se puede leer)
+        """
+        try:
+            with open(pdf_path, 'rb') as file:
+                return len(PyPDF2.PdfReader(file).pages)
+        except Exception as e:
+            print(f"Error leyendo PDF {Path(pdf_path).name}: {e}")
+            return 0
+
     def extract_text_from_pptx(self, pptx_path: str) -> str:
         """
         Extrae todo el texto de un PowerPoint.
@@ -130,11 +171,34 @@ class DocumentProcessor:
 
         # Dividir en chunks
         chunks = self.text_splitter.split_text(text)
+        documents = self.build_documents(chunks, pdf_path, metadata)
+
+        print(f"✅ Procesado {pdf_path.name}: {len(chunks)} chunks")
+        return documents
+
+    def build_documents(
+        self,
+        chunks: List[str],
+        file_path: Path,
+        metadata: Dict = None
+    ) -> List[Dict]:
+        """
+        Convierte chunks de texto en documentos con metadatos.
+
+        Args:
+            chunks: Chunks de texto en orden
+            file_path: Ruta del archivo de origen
+            metadata: Metadatos adicionales para agregar a cada chunk
+
+        Returns:
+            Lista de chunks con texto y metadatos
+        """
+        file_path = Path(file_path)
 
         # Agregar metadatos
         base_metadata = {
-            "source": pdf_path.name,
-            "source_path": str(pdf_path),
+            "source": file_path.name,
+            "source_path": str(file_path),
             "total_chunks": len(chunks)
         }
 
@@ -152,7 +216,6 @@ class DocumentProcessor:
                 "metadata": doc_metadata
             })
 
-        print(f"✅ Procesado {pdf_path.name}: {len(chunks)} chunks")
         return documents
 
     def process_pptx(self, pptx_path: str, metadata: Dict = None) -> List[Dict]:
@@ -177,27 +240,7 @@ class DocumentProcessor:
 
         # Dividir en chunks
         chunks = self.text_splitter.split_text(text)
-
-        # Agregar metadatos
-        base_metadata = {
-            "source": pptx_path.name,
-            "source_path": str(pptx_path),
-            "total_chunks": len(chunks)
-        }
-
-        if metadata:
-            base_metadata.update(metadata)
-
-        # Crear documentos con metadatos
-        documents = []
-        for i, chunk in enumerate(chunks):
-            doc_metadata = base_metadata.copy()
-            doc_metadata["chunk_id"] = i
-
-            documents.append({
-                "text": chunk,
-                "metadata": doc_metadata
-            })
+        documents = self.build_documents(chunks, pptx_path, metadata)
 
         print(f"✅ Procesado {pptx_path.name}: {len(chunks)} chunks")
         return documents
@@ -225,10 +268,7 @@ class DocumentProcessor:
 
         for file in files:
             # Metadatos específicos por documento
-            metadata = {
-                "document_type": self._classify_document(file.name),
-                "file_size_mb": file.stat().st_size / (1024 * 1024)
-            }
+            metadata = self.get_file_metadata(file)
 
             # Procesar según extensión
             if file.suffix.lower() == '.pdf':
@@ -244,6 +284,22 @@ class DocumentProcessor:
         print(f"✅ Total: {len(all_documents)} chunks de {len(files)} documentos")
         return all_documents
 
+    def get_file_metadata(self, file: Path) -> Dict:
+        """
+        Metadatos específicos por documento (tipo y tamaño).
+
+        Args:
+            file: Ruta del archivo
+
+        Returns:
+            Diccionario con metadatos
+        """
+        file = Path(file)
+        return {
+            "document_type": self._classify_document(file.name),
+            "file_size_mb": file.stat().st_size / (1024 * 1024)
+        }
+
     def _classify_document(self, filename: str) -> str:
         """
         Clasifica el tipo de documento según el nombre.
@@ -0,0 +1,384 @@
+"""
+Pipeline de Ingesta Paralela para RAG
+Piloto IA - FICEM BD
+
+Extrae y divide en chunks PDFs y PowerPoint en un pool de procesos y
+entrega los documentos al vector store a través de una cola acotada,
+de modo que la extracción y los embeddings avanzan en paralelo.
+
+PDFs muy grandes (ej: ECRA_Technology_Papers_2022.pdf) se reparten en
+shards de páginas para que no dominen el tiempo total de ingesta.
+"""
+
+import os
+import time
+import queue
+import threading
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from ai_modules.rag.document_processor import DocumentProcessor
+
+
+# Procesador por proceso hijo (se crea una sola vez en el initializer)
+_worker_processor: Optional[DocumentProcessor] = None
+
+# Marcador de fin de la cola productor → embedder
+_FIN = object()
+
+# Espera máxima de cada intento de put en la cola (para revisar la cancelación)
+_PUT_TIMEOUT = 0.5
+
+
+def _init_worker(chunk_size: int, chunk_overlap: int) -> None:
+    """Inicializa el DocumentProcessor de cada proceso del pool."""
+    global _worker_processor
+    _worker_processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def _extract_shard(task: Dict) -> Dict:
+    """
+    Extrae y divide en chunks un shard (rango de páginas o archivo completo).
+
+    Se ejecuta en un proceso hijo; debe ser una función de módulo para
+    poder serializarse.
+
+    Args:
+        task: Diccionario con path, tipo, shard y rango de páginas
+
+    Returns:
+        Diccionario con los chunks del shard y tiempos de extracción
+    """
+    start = time.perf_counter()
+
+    if task["kind"] == "pdf":
+        text = _worker_processor.extract_pages_from_pdf(
+            task["path"], task["start_page"], task["end_page"]
+        )
+        pages = task["end_page"] - task["start_page"]
+    else:
+        text = _worker_processor.extract_text_from_pptx(task["path"])
+        pages = text.count("--- Diapositiva ")
+
+    chunks = _worker_processor.text_splitter.split_text(text) if text else []
+
+    return {
+        "path": task["path"],
+        "shard": task["shard"],
+        "pages": pages,
+        "chars": len(text),
+        "chunks": chunks,
+        "seconds": time.perf_counter() - start
+    }
+
+
+class IngestionPipeline:
+    """
+    Ingesta paralela de documentos técnicos al vector store.
+
+    - Extracción + chunking en un ProcessPoolExecutor
+    - PDFs grandes divididos en shards de `pages_per_shard` páginas
+    - Cola acotada (`queue_size` documentos) entre extracción y embeddings
+    - Throughput por documento en `self.stats` (de la última ejecución)
+    """
+
+    def __init__(
+        self,
+        processor: Optional[DocumentProcessor] = None,
+        max_workers: Optional[int] = None,
+        pages_per_shard: int = 50,
+        queue_size: int = 4
+    ):
+        """
+        Inicializa el pipeline.
+
+        Args:
+            processor: DocumentProcessor con la configuración de chunks
+            max_workers: Procesos de extracción (None = núcleos disponibles)
+            pages_per_shard: Páginas por shard en PDFs grandes (0 = sin shards)
+            queue_size: Documentos en espera máximos antes de frenar la extracción
+        """
+        self.processor = processor or DocumentProcessor()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_shard = pages_per_shard
+        self.queue_size = queue_size
+        self.stats: Dict[str, Dict] = {}
+
+    def plan_tasks(self, files: List[Path]) -> List[Dict]:
+        """
+        Divide los archivos en tareas de extracción.
+
+        Los PDFs con más de `pages_per_shard` páginas se reparten en rangos
+        de páginas; PPTX y PDFs pequeños son una sola tarea.
+
+        Args:
+            files: Archivos a procesar
+
+        Returns:
+            Lista de tareas (los archivos más grandes primero)
+        """
+        tasks = []
+
+        # Los más grandes primero para no dejarlos como cola final del pool
+        for file in sorted(files, key=lambda f: f.stat().st_size, reverse=True):
+            suffix = file.suffix.lower()
+
+            if suffix == ".pdf":
+                num_pages = self.processor.count_pdf_pages(str(file))
+                if num_pages == 0:
+                    print(f"⚠️  No se pudo leer {file.name}")
+                    continue
+
+                step = self.pages_per_shard if self.pages_per_shard > 0 else num_pages
+                ranges = [(p, min(p + step, num_pages)) for p in range(0, num_pages, step)]
+
+                for shard, (start_page, end_page) in enumerate(ranges):
+                    tasks.append({
+                        "path": str(file),
+                        "kind": "pdf",
+                        "shard": shard,
+                        "num_shards": len(ranges),
+                        "start_page": start_page,
+                        "end_page": end_page
+                    })
+
+            elif suffix == ".pptx":
+                tasks.append({
+                    "path": str(file),
+                    "kind": "pptx",
+                    "shard": 0,
+                    "num_shards": 1
+                })
+
+            else:
+                print(f"⚠️  Tipo de archivo no soportado: {file.name}")
+
+        return tasks
+
+    def iter_documents(
+        self,
+        directory_path: str,
+        file_pattern: str = "*.pdf"
+    ) -> Iterator[List[Dict]]:
+        """
+        Extrae los documentos de un directorio en paralelo.
+
+        Entrega los chunks de cada documento en cuanto terminan todos sus
+        shards, sin esperar al resto del directorio. Si se cierra el
+        generador antes de terminar, los shards pendientes se cancelan.
+
+        Args:
+            directory_path: Ruta al directorio
+            file_pattern: Patrón de archivos a procesar (*.pdf, *.pptx, o *.*)
+
+        Yields:
+            Lista de chunks (mismo formato que DocumentProcessor) por documento
+        """
+        directory = Path(directory_path)
+
+        if not directory.exists():
+            raise FileNotFoundError(f"Directorio no encontrado: {directory}")
+
+        self.stats = {}
+        files = list(directory.glob(file_pattern))
+        tasks = self.plan_tasks(files)
+
+        print(f"📂 Procesando {len(files)} archivo(s) en {len(tasks)} shard(s) "
+              f"con {self.max_workers} proceso(s)...")
+
+        # Resultados parciales por archivo hasta completar todos sus shards
+        pending: Dict[str, Dict] = {}
+        for task in tasks:
+            pending.setdefault(task["path"], {
+                "num_shards": task["num_shards"],
+                "shards": {},
+                "start": time.perf_counter()
+            })
+
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(self.processor.chunk_size, self.processor.chunk_overlap)
+        )
+        try:
+            futures = [executor.submit(_extract_shard, task) for task in tasks]
+
+            for future in as_completed(futures):
+                result = future.result()
+                entry = pending[result["path"]]
+                entry["shards"][result["shard"]] = result
+
+                if len(entry["shards"]) < entry["num_shards"]:
+                    continue
+
+                del pending[result["path"]]
+                yield self._assemble_document(Path(result["path"]), entry)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _assemble_document(self, file: Path, entry: Dict) -> List[Dict]:
+        """
+        Une los shards de un documento en orden y registra su throughput.
+
+        Args:
+            file: Archivo de origen
+            entry: Shards completados y tiempo de inicio
+
+        Returns:
+            Lista de chunks con metadatos
+        """
+        shards = [entry["shards"][i] for i in range(entry["num_shards"])]
+        chunks = [chunk for shard in shards for chunk in shard["chunks"]]
+
+        documents = self.processor.build_documents(
+            chunks, file, self.processor.get_file_metadata(file)
+        )
+
+        pages = sum(shard["pages"] for shard in shards)
+        extract_seconds = sum(shard["seconds"] for shard in shards)
+        wall_seconds = time.perf_counter() - entry["start"]
+
+        self.stats[file.name] = {
+            "pages": pages,
+            "chunks": len(chunks),
+            "chars": sum(shard["chars"] for shard in shards),
+            "shards": entry["num_shards"],
+            "extract_seconds": round(extract_seconds, 3),
+            "wall_seconds": round(wall_seconds, 3),
+            "pages_per_second": round(pages / extract_seconds, 1) if extract_seconds > 0 else None,
+            "embed_seconds": None
+        }
+
+        if chunks:
+            print(f"✅ Procesado {file.name}: {len(chunks)} chunks, {pages} páginas "
+                  f"({entry['num_shards']} shard(s), {wall_seconds:.1f}s)")
+        else:
+            print(f"⚠️  No se pudo extraer texto de {file.name}")
+
+        return documents
+
+    def process_directory(self, directory_path: str, file_pattern: str = "*.pdf") -> List[Dict]:
+        """
+        Versión paralela de DocumentProcessor.process_directory.
+
+        Args:
+            directory_path: Ruta al directorio
+            file_pattern: Patrón de archivos a procesar (*.pdf, *.pptx, o *.*)
+
+        Returns:
+            Lista de todos los chunks de todos los documentos
+        """
+        all_documents = []
+        for documents in self.iter_documents(directory_path, file_pattern):
+            all_documents.extend(documents)
+
+        print(f"✅ Total: {len(all_documents)} chunks de {len(self.stats)} documentos")
+        return all_documents
+
+    def ingest_directory(
+        self,
+        directory_path: str,
+        vector_store,
+        file_pattern: str = "*.pdf"
+    ) -> Dict[str, Dict]:
+        """
+        Extrae un directorio y lo carga al vector store en streaming.
+
+        Un hilo productor consume el pool de extracción y deja cada
+        documento en una cola acotada; el hilo actual genera los embeddings
+        (VectorStoreManager.add_documents) a medida que llegan. Si los
+        embeddings van más lentos, la cola llena frena la extracción. Si
+        falla la carga al vector store, se cancela la extracción pendiente
+        antes de propagar el error.
+
+        Args:
+            directory_path: Ruta al directorio
+            vector_store: VectorStoreManager destino
+            file_pattern: Patrón de archivos a procesar (*.pdf, *.pptx, o *.*)
+
+        Returns:
+            Estadísticas de throughput por documento
+        """
+        doc_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        cancel = threading.Event()
+        errors: List[BaseException] = []
+
+        def put(item) -> bool:
+            """Encola sin bloquear para siempre; False si se canceló."""
+            while not cancel.is_set():
+                try:
+                    doc_queue.put(item, timeout=_PUT_TIMEOUT)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def producer():
+            try:
+                # closing: al cancelar, el generador apaga el pool de extracción
+                with contextlib.closing(self.iter_documents(directory_path, file_pattern)) as docs:
+                    for documents in docs:
+                        if not put(documents):
+                            break
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                put(_FIN)
+
+        start = time.perf_counter()
+        thread = threading.Thread(target=producer, name="ingesta-extraccion", daemon=True)
+        thread.start()
+
+        total_chunks = 0
+        try:
+            while True:
+                documents = doc_queue.get()
+                if documents is _FIN:
+                    break
+                if not documents:
+                    continue
+
+                embed_start = time.perf_counter()
+                vector_store.add_documents(documents)
+                source = documents[0]["metadata"]["source"]
+                self.stats[source]["embed_seconds"] = round(time.perf_counter() - embed_start, 3)
+                total_chunks += len(documents)
+        finally:
+            cancel.set()
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+        total_seconds = time.perf_counter() - start
+        print(f"✅ Ingesta completa: {total_chunks} chunks de {len(self.stats)} documentos "
+              f"en {total_seconds:.1f}s")
+        self.print_stats()
+
+        return self.stats
+
+    def print_stats(self) -> None:
+        """Imprime el throughput por documento."""
+        print("\n📊 Throughput por documento:")
+        for source, s in sorted(self.stats.items(), key=lambda kv: -kv[1]["wall_seconds"]):
+            pps = f"{s['pages_per_second']:.1f} pág/s" if s["pages_per_second"] else "-"
+            embed = f", embeddings {s['embed_seconds']:.1f}s" if s["embed_seconds"] is not None else ""
+            print(f"  {source}: {s['pages']} págs, {s['chunks']} chunks, "
+                  f"extracción {s['extract_seconds']:.1f}s ({pps}){embed}")
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    from ai_modules.rag.vector_store import VectorStoreManager
+
+    pipeline = IngestionPipeline(
+        processor=DocumentProcessor(chunk_size=1000, chunk_overlap=200),
+        pages_per_shard=50
+    )
+
+    vsm = VectorStoreManager()
+    vsm.load_or_create_vectorstore()
+
+    pipeline.ingest_directory("docs/tech_docs", vsm, file_pattern="*.*")
@@ -7,7 +7,10 @@ Usa el enfoque moderno de LangChain con create_retrieval_chain.
 """
 
 import os
-from typing import Dict, List, Optional
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
 from dotenv import load_dotenv
 from langchain_ollama import OllamaLLM
 from langchain_anthropic import ChatAnthropic
@@ -17,10 +20,17 @@ from langchain_core.prompts import ChatPromptTemplate
 
 from ai_modules.rag.vector_store import VectorStoreManager
 from ai_modules.rag.sql_tool import SQLTool
+from ai_modules.rag.answer_cache import AnswerCache
+from ai_modules.rag.batching import RateLimiter, map_concurrent
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Pool compartido por todas las instancias para ejecutar retrieval y SQL en
+# paralelo (query_hybrid). Una rama descartada por presupuesto termina en
+# segundo plano sin dejar un pool sin cerrar por instancia o por llamada
+_HYBRID_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-hybrid")
+
 
 class RAGChain:
     """
@@ -28,12 +38,23 @@ class RAGChain:
     Usa create_retrieval_chain (enfoque moderno de LangChain).
     """
 
+    # Palabras clave que indican necesidad de SQL (query_hybrid)
+    SQL_KEYWORDS = [
+        "cuál es", "cuántos", "promedio", "total", "suma",
+        "mzma", "cemex", "2024", "2023", "2022",
+        "huella promedio", "top", "mayor", "menor",
+        "estadísticas", "datos de", "volumen"
+    ]
+
     def __init__(
         self,
         llm_model: str = "qwen2.5:7b",
         temperature: float = 0.1,
         top_k: int = 5,
-        use_claude: bool = False
+        use_claude: bool = False,
+        use_cache: bool = True,
+        cache: Optional[AnswerCache] = None,
+        data_version: Optional[str] = None
     ):
         """
         Inicializa el chain de RAG.
@@ -43,11 +64,19 @@ class RAGChain:
             temperature: Temperatura para generación (0-1)
             top_k: Número de documentos a recuperar
             use_claude: Si True, usa Claude API en lugar de Ollama
+            use_cache: Si True, reutiliza respuestas de preguntas repetidas
+            cache: Caché a usar (None = AnswerCache por defecto)
+            data_version: Versión de datos para la clave de caché
+                (None = versión de la colección del vector store)
         """
         self.llm_model = llm_model
         self.temperature = temperature
         self.top_k = top_k
         self.use_claude = use_claude
+        self.data_version = data_version
+
+        # Caché de respuestas (compartida entre usuarios vía st.cache_resource)
+        self.cache = (cache or AnswerCache()) if use_cache else None
 
         # Inicializar LLM según el proveedor
         if use_claude:
@@ -107,20 +136,27 @@ Contexto:
             ("human", "{input}")
         ])
 
-        # Crear document chain
-        question_answer_chain = create_stuff_documents_chain(self.llm, prompt)
+        # Crear document chain (se usa directo cuando el retrieval va aparte)
+        self.qa_chain = create_stuff_documents_chain(self.llm, prompt)
 
         # Crear retrieval chain
-        self.chain = create_retrieval_chain(self.retriever, question_answer_chain)
+        self.chain = create_retrieval_chain(self.retriever, self.qa_chain)
 
         print("✅ Chain de RAG creado")
 
-    def query(self, question: str) -> Dict:
+    def query(self, question: str, semantic: bool = True) -> Dict:
         """
         Realiza una consulta al sistema RAG.
 
+        Recupera los documentos y, si la caché está activa, busca una
+        respuesta guardada para la misma pregunta, modelo, top_k, chunks y
+        versión de datos; solo invoca al LLM si no la encuentra.
+
         Args:
             question: Pregunta del usuario
+            semantic: Permitir búsqueda semántica en caché. False para
+                preguntas con datos de una compañía: dos prompts que solo
+                difieren en los números serían "casi idénticos"
 
         Returns:
             Diccionario con respuesta y fuentes
@@ -131,29 +167,311 @@ Contexto:
         print(f"\n❓ Pregunta: {question}")
         print("⏳ Procesando...")
 
-        # Ejecutar query (create_retrieval_chain usa "input" en lugar de "query")
-        result = self.chain.invoke({"input": question})
+        start = time.perf_counter()
+        docs, embedding = self._retrieve(question)
+
+        return self._answer(question, docs, embedding if semantic else None, start)
+
+    def _answer(
+        self,
+        question: str,
+        docs: List,
+        embedding: Optional[List[float]],
+        start: float
+    ) -> Dict:
+        """
+        Genera (o recupera de caché) la respuesta con documentos ya recuperados.
+
+        Args:
+            question: Pregunta final enviada al LLM (puede incluir contexto)
+            docs: Documentos recuperados
+            embedding: Embedding para búsqueda semántica en caché (o None)
+            start: Instante de inicio de la consulta (time.perf_counter)
+
+        Returns:
+            Diccionario con respuesta y fuentes
+        """
+        if self.cache:
+            key, namespace = self._cache_key(question, docs)
+            cached, hit_type = self.cache.lookup(key, namespace, embedding)
+            if cached is not None:
+                print(f"⚡ Respuesta desde caché ({hit_type})")
+                response = dict(cached, question=question, cached=hit_type)
+                response["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                return response
+
+        # Generar respuesta con los documentos recuperados
+        answer = self.qa_chain.invoke({"input": question, "context": docs})
+        response = self._format_response(question, answer, docs)
+
+        if self.cache:
+            self.cache.set(key, response, namespace, embedding)
+
+        response = dict(response, cached=None)
+        response["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return response
+
+    def _retrieve(self, question: str) -> Tuple[List, Optional[List[float]]]:
+        """
+        Recupera los documentos de una pregunta.
+
+        Con búsqueda semántica en la caché, el embedding de la pregunta se
+        calcula una sola vez y se reutiliza para el retrieval.
+
+        Returns:
+            Tupla (documentos, embedding de la pregunta o None)
+        """
+        if self.cache and self.cache.similarity_threshold is not None:
+            embedding = self.vsm.embeddings.embed_query(question)
+            docs = self.vsm.vectorstore.similarity_search_by_vector(embedding, k=self.top_k)
+            return docs, embedding
+
+        return self.retriever.invoke(question), None
+
+    def _cache_key(self, question: str, docs: List) -> Tuple[str, str]:
+        """Clave y namespace de caché para una pregunta y sus documentos."""
+        data_version = self.data_version or self.vsm.get_data_version()
+        namespace = AnswerCache.make_namespace(self.llm_model, self.top_k, data_version)
+        key = AnswerCache.make_key(
+            question, self.llm_model, self.top_k, self._chunk_ids(docs), data_version
+        )
+        return key, namespace
+
+    @staticmethod
+    def _chunk_ids(docs: List) -> List[str]:
+        """Ids estables de los chunks recuperados (fuente#chunk)."""
+        return [
+            f"{doc.metadata.get('source', 'Unknown')}#{doc.metadata.get('chunk_id', 0)}"
+            for doc in docs
+        ]
+
+    @staticmethod
+    def _format_response(question: str, answer: str, docs: List) -> Dict:
+        """
+        Formatea la respuesta con sus fuentes.
 
-        # Formatear respuesta
+        Args:
+            question: Pregunta del usuario
+            answer: Respuesta del LLM
+            docs: Documentos usados como contexto
+
+        Returns:
+            Diccionario con respuesta y fuentes
+        """
         response = {
             "question": question,
-            "answer": result["answer"],
+            "answer": answer,
             "sources": []
         }
 
-        # Agregar fuentes (create_retrieval_chain retorna "context" con los docs)
-        if "context" in result:
-            for doc in result["context"]:
-                source_info = {
-                    "source": doc.metadata.get("source", "Unknown"),
-                    "document_type": doc.metadata.get("document_type", "Unknown"),
-                    "chunk_id": doc.metadata.get("chunk_id", 0),
-                    "text_preview": doc.page_content[:200]
-                }
-                response["sources"].append(source_info)
+        for doc in docs:
+            source_info = {
+                "source": doc.metadata.get("source", "Unknown"),
+                "document_type": doc.metadata.get("document_type", "Unknown"),
+                "chunk_id": doc.metadata.get("chunk_id", 0),
+                "text_preview": doc.page_content[:200]
+            }
+            response["sources"].append(source_info)
 
         return response
 
+    def get_cache_stats(self) -> Dict:
+        """
+        Métricas de la caché de respuestas.
+
+        Returns:
+            Diccionario con aciertos, fallos y tasa de acierto (vacío si no hay caché)
+        """
+        return self.cache.get_stats() if self.cache else {}
+
+    def stream(self, question: str, semantic: bool = True) -> Iterator[Dict]:
+        """
+        Versión en streaming de query().
+
+        Entrega primero las fuentes recuperadas y luego la respuesta token a
+        token, de modo que la latencia percibida es el tiempo al primer token.
+
+        Eventos:
+            {"type": "sources", "sources": [...], "retrieval_ms": float}
+            {"type": "token", "text": str}
+            {"type": "done", "answer": str, "sources": [...], "cached": ...,
+             "ttft_ms": float, "latency_ms": float}
+
+        Args:
+            question: Pregunta del usuario
+            semantic: Permitir búsqueda semántica en caché (ver query)
+
+        Yields:
+            Eventos de la respuesta en orden
+        """
+        if not self.chain:
+            raise ValueError("Chain no inicializado")
+
+        print(f"\n❓ Pregunta (streaming): {question}")
+
+        start = time.perf_counter()
+        docs, embedding = self._retrieve(question)
+        if not semantic:
+            embedding = None
+        sources = self._format_response(question, "", docs)["sources"]
+
+        yield {
+            "type": "sources",
+            "sources": sources,
+            "retrieval_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+        if self.cache:
+            key, namespace = self._cache_key(question, docs)
+            cached, hit_type = self.cache.lookup(key, namespace, embedding)
+            if cached is not None:
+                elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+                yield {"type": "token", "text": cached["answer"]}
+                yield self._done_event(cached["answer"], sources, hit_type, elapsed_ms, elapsed_ms)
+                return
+
+        parts = []
+        ttft_ms = None
+        for token in self.qa_chain.stream({"input": question, "context": docs}):
+            text = self._token_text(token)
+            if not text:
+                continue
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+            parts.append(text)
+            yield {"type": "token", "text": text}
+
+        answer = "".join(parts)
+        latency_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        if self.cache:
+            self.cache.set(key, self._format_response(question, answer, docs), namespace, embedding)
+
+        print(f"⏱️  Primer token: {ttft_ms} ms | total: {latency_ms} ms")
+        yield self._done_event(answer, sources, None, ttft_ms, latency_ms)
+
+    async def astream(self, question: str, semantic: bool = True) -> AsyncIterator[Dict]:
+        """
+        Versión asíncrona de stream() (mismos eventos).
+
+        Args:
+            question: Pregunta del usuario
+            semantic: Permitir búsqueda semántica en caché (ver query)
+
+        Yields:
+            Eventos de la respuesta en orden
+        """
+        if not self.chain:
+            raise ValueError("Chain no inicializado")
+
+        start = time.perf_counter()
+
+        if self.cache and self.cache.similarity_threshold is not None:
+            embedding = await self.vsm.embeddings.aembed_query(question)
+            docs = await self.vsm.vectorstore.asimilarity_search_by_vector(embedding, k=self.top_k)
+        else:
+            embedding = None
+            docs = await self.retriever.ainvoke(question)
+
+        if not semantic:
+            embedding = None
+
+        sources = self._format_response(question, "", docs)["sources"]
+
+        yield {
+            "type": "sources",
+            "sources": sources,
+            "retrieval_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+        if self.cache:
+            key, namespace = self._cache_key(question, docs)
+            cached, hit_type = self.cache.lookup(key, namespace, embedding)
+            if cached is not None:
+                elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+                yield {"type": "token", "text": cached["answer"]}
+                yield self._done_event(cached["answer"], sources, hit_type, elapsed_ms, elapsed_ms)
+                return
+
+        parts = []
+        ttft_ms = None
+        async for token in self.qa_chain.astream({"input": question, "context": docs}):
+            text = self._token_text(token)
+            if not text:
+                continue
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+            parts.append(text)
+            yield {"type": "token", "text": text}
+
+        answer = "".join(parts)
+        latency_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        if self.cache:
+            self.cache.set(key, self._format_response(question, answer, docs), namespace, embedding)
+
+        yield self._done_event(answer, sources, None, ttft_ms, latency_ms)
+
+    def stream_with_context(
+        self,
+        question: str,
+        additional_context: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """
+        Versión en streaming de query_with_context().
+
+        Args:
+            question: Pregunta del usuario
+            additional_context: Contexto adicional (ej: datos de BD)
+
+        Yields:
+            Eventos de la respuesta (ver stream)
+        """
+        return self.stream(self._enhance_question(question, additional_context), semantic=not additional_context)
+
+    def astream_with_context(
+        self,
+        question: str,
+        additional_context: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Versión asíncrona de stream_with_context().
+
+        Args:
+            question: Pregunta del usuario
+            additional_context: Contexto adicional (ej: datos de BD)
+
+        Yields:
+            Eventos de la respuesta (ver stream)
+        """
+        return self.astream(self._enhance_question(question, additional_context), semantic=not additional_context)
+
+    @staticmethod
+    def _token_text(token) -> str:
+        """Texto de un chunk de streaming (str de Ollama o AIMessageChunk de Claude)."""
+        if isinstance(token, str):
+            return token
+        content = getattr(token, "content", "")
+        return content if isinstance(content, str) else ""
+
+    @staticmethod
+    def _done_event(
+        answer: str,
+        sources: List[Dict],
+        cached: Optional[str],
+        ttft_ms: Optional[float],
+        latency_ms: float
+    ) -> Dict:
+        """Evento final de stream()/astream() con métricas de latencia."""
+        return {
+            "type": "done",
+            "answer": answer,
+            "sources": sources,
+            "cached": cached,
+            "ttft_ms": ttft_ms,
+            "latency_ms": latency_ms
+        }
+
     def query_simple(self, question: str) -> str:
         """
         Realiza una consulta y devuelve solo la respuesta.
@@ -175,6 +493,9 @@ Contexto:
         """
         Realiza una consulta con contexto adicional.
 
+        Con contexto, la caché solo acepta aciertos exactos (la búsqueda
+        semántica podría devolver la respuesta de otra compañía).
+
         Args:
             question: Pregunta del usuario
             additional_context: Contexto adicional (ej: datos de BD)
@@ -182,20 +503,22 @@ Contexto:
         Returns:
             Diccionario con respuesta y fuentes
         """
-        # Si hay contexto adicional, agregarlo a la pregunta
-        if additional_context:
-            enhanced_question = f"""
+        return self.query(self._enhance_question(question, additional_context), semantic=not additional_context)
+
+    @staticmethod
+    def _enhance_question(question: str, additional_context: Optional[str] = None) -> str:
+        """Agrega el contexto adicional (ej: datos de BD) a la pregunta."""
+        if not additional_context:
+            return question
+
+        return f"""
 Contexto adicional de la base de datos:
 {additional_context}
 
 Pregunta: {question}
 """
-        else:
-            enhanced_question = question
-
-        return self.query(enhanced_question)
 
-    def query_hybrid(self, question: str) -> Dict:
+    def query_hybrid(self, question: str, latency_budget: Optional[float] = None) -> Dict:
         """
         Consulta híbrida que combina RAG con SQL según la pregunta.
 
@@ -204,58 +527,122 @@ Pregunta: {question}
         - Conocimiento técnico/conceptual → RAG
         - Ambos → Combina SQL + RAG
 
+        Cuando se necesita SQL, el retrieval vectorial y la consulta SQL se
+        ejecutan en paralelo, por lo que la latencia se acerca a
+        max(retrieval, sql) + generación en vez de la suma.
+
         Args:
             question: Pregunta del usuario
+            latency_budget: Segundos máximos de espera para el contexto. La rama
+                que no termine a tiempo se descarta (si ninguna termina, se
+                espera al retrieval y se descarta el SQL). None = sin límite
 
         Returns:
-            Diccionario con respuesta y fuentes
+            Diccionario con respuesta, fuentes y tiempos por rama ("timings")
         """
-        # Palabras clave que indican necesidad de SQL
-        sql_keywords = [
-            "cuál es", "cuántos", "promedio", "total", "suma",
-            "mzma", "cemex", "2024", "2023", "2022",
-            "huella promedio", "top", "mayor", "menor",
-            "estadísticas", "datos de", "volumen"
-        ]
+        question_lower = question.lower()
+        needs_sql = any(keyword in question_lower for keyword in self.SQL_KEYWORDS)
+
+        if not needs_sql:
+            # Pregunta conceptual/técnica → solo RAG
+            print("📚 Consulta conceptual → usando RAG")
+            return self.query(question)
 
+        print("🔍 Detectada consulta que requiere datos → SQL + RAG en paralelo")
+
+        start = time.perf_counter()
+        timings = {"dropped": []}
+
+        def timed(fn, *args):
+            # El tiempo viaja con el resultado: una rama descartada que
+            # termine después no escribe en los timings ya devueltos
+            branch_start = time.perf_counter()
+            result = fn(*args)
+            return result, round((time.perf_counter() - branch_start) * 1000, 1)
+
+        future_retrieval = _HYBRID_EXECUTOR.submit(timed, self._retrieve, question)
+        future_sql = _HYBRID_EXECUTOR.submit(timed, self._get_sql_context, question)
+
+        wait([future_retrieval, future_sql], timeout=latency_budget)
+
+        # Contexto SQL: se descarta si no terminó dentro del presupuesto
+        sql_context = None
+        if future_sql.done():
+            try:
+                sql_context, timings["sql_ms"] = future_sql.result()
+            except Exception as e:
+                print(f"⚠️  Consulta SQL falló: {e}")
+        else:
+            print("⏱️  SQL fuera de presupuesto → se descarta")
+            timings["dropped"].append("sql")
+
+        # Documentos: si solo hay SQL, se responde sin esperar al retrieval
+        docs, embedding = [], None
+        if future_retrieval.done() or not sql_context:
+            try:
+                (docs, embedding), timings["retrieval_ms"] = future_retrieval.result()
+            except Exception as e:
+                if not sql_context:
+                    raise
+                # Se responde solo con los datos SQL
+                print(f"⚠️  Retrieval falló: {e} → se usa solo SQL")
+                timings["dropped"].append("retrieval")
+        else:
+            print("⏱️  Retrieval fuera de presupuesto → se descarta")
+            timings["dropped"].append("retrieval")
+
+        if sql_context:
+            # El embedding describe solo la pregunta, no los datos SQL: no se
+            # usa para búsqueda semántica en caché (evita mezclar compañías/años)
+            response = self._answer(self._enhance_question(question, sql_context), docs, None, start)
+        else:
+            # Si no se pudo extraer info, usar solo RAG
+            response = self._answer(question, docs, embedding, start)
+
+        response["timings"] = timings
+        return response
+
+    def _get_sql_context(self, question: str) -> Optional[str]:
+        """
+        Extrae compañía/año de la pregunta y obtiene el contexto SQL.
+
+        Args:
+            question: Pregunta del usuario
+
+        Returns:
+            Contexto formateado con datos de la BD, o None si no aplica
+        """
         question_lower = question.lower()
-        needs_sql = any(keyword in question_lower for keyword in sql_keywords)
-
-        if needs_sql:
-            print("🔍 Detectada consulta que requiere datos → usando SQL")
-
-            # Intentar extraer parámetros de la pregunta
-            sql_context = None
-
-            # Detectar compañía y año
-            if "mzma" in question_lower:
-                compania = "MZMA"
-            elif "cemex" in question_lower:
-                compania = "CEMEX"
-            elif "melón" in question_lower or "melon" in question_lower:
-                compania = "melón_main_old"
-            else:
-                compania = None
-
-            # Detectar año
-            import re
-            year_match = re.search(r'\b(202[0-9])\b', question)
-            año = int(year_match.group(1)) if year_match else None
-
-            # Consultar SQL según el tipo de pregunta
-            if compania and ("huella" in question_lower or "promedio" in question_lower or "dosis" in question_lower or "cemento" in question_lower):
-                result = self.sql_tool.get_huella_promedio_compania(compania, año)
-                if result["success"] and result["rows"]:
-                    data = result["rows"][0]
-
-                    # Manejar None values de forma segura
-                    num_remitos = data.get('num_remitos', 0) or 0
-                    huella = data.get('huella_promedio') or 0
-                    resistencia = data.get('resistencia_promedio') or 0
-                    cemento = data.get('cemento_promedio') or 0
-                    volumen = data.get('volumen_total') or 0
-
-                    sql_context = f"""
+        sql_context = None
+
+        # Detectar compañía y año
+        if "mzma" in question_lower:
+            compania = "MZMA"
+        elif "cemex" in question_lower:
+            compania = "CEMEX"
+        elif "melón" in question_lower or "melon" in question_lower:
+            compania = "melón_main_old"
+        else:
+            compania = None
+
+        # Detectar año
+        year_match = re.search(r'\b(202[0-9])\b', question)
+        año = int(year_match.group(1)) if year_match else None
+
+        # Consultar SQL según el tipo de pregunta
+        if compania and ("huella" in question_lower or "promedio" in question_lower or "dosis" in question_lower or "cemento" in question_lower):
+            result = self.sql_tool.get_huella_promedio_compania(compania, año)
+            if result["success"] and result["rows"]:
+                data = result["rows"][0]
+
+                # Manejar None values de forma segura
+                num_remitos = data.get('num_remitos', 0) or 0
+                huella = data.get('huella_promedio') or 0
+                resistencia = data.get('resistencia_promedio') or 0
+                cemento = data.get('cemento_promedio') or 0
+                volumen = data.get('volumen_total') or 0
+
+                sql_context = f"""
 Datos de {compania} {f'en {año}' if año else 'en todos los años'}:
 - Número de remitos: {num_remitos:,}
 - Huella promedio: {huella:.2f} kg CO₂/m³
@@ -263,23 +650,14 @@ Datos de {compania} {f'en {año}' if año else 'en todos los años'}:
 - Contenido cemento promedio: {cemento:.0f} kg/m³
 - Volumen total: {volumen:,.0f} m³
 """
-            elif "top" in question_lower or "mayor" in question_lower:
-                result = self.sql_tool.get_top_productos_huella(limit=5)
-                if result["success"] and result["rows"]:
-                    sql_context = "Top 5 productos con mayor huella:\n"
-                    for i, row in enumerate(result["rows"], 1):
-                        sql_context += f"{i}. {row['compania']} - {row['resistencia']} MPa: {row['huella_promedio']:.2f} kg CO₂/m³ ({row['volumen_total']:,.0f} m³)\n"
-
-            # Combinar SQL context con RAG
-            if sql_context:
-                return self.query_with_context(question, sql_context)
-            else:
-                # Si no se pudo extraer info, usar solo RAG
-                return self.query(question)
-        else:
-            # Pregunta conceptual/técnica → solo RAG
-            print("📚 Consulta conceptual → usando RAG")
-            return self.query(question)
+        elif "top" in question_lower or "mayor" in question_lower:
+            result = self.sql_tool.get_top_productos_huella(limit=5)
+            if result["success"] and result["rows"]:
+                sql_context = "Top 5 productos con mayor huella:\n"
+                for i, row in enumerate(result["rows"], 1):
+                    sql_context += f"{i}. {row['compania']} - {row['resistencia']} MPa: {row['huella_promedio']:.2f} kg CO₂/m³ ({row['volumen_total']:,.0f} m³)\n"
+
+        return sql_context
 
 
 class BenchmarkingChain(RAGChain):
@@ -287,6 +665,9 @@ class BenchmarkingChain(RAGChain):
     Chain especializado para benchmarking.
     """
 
+    # Clases de resistencia estándar (MPa), igual que en las páginas de bandas
+    RESISTENCIAS_ESTANDAR = [20, 25, 30, 35, 40, 45, 50]
+
     def compare_with_benchmark(
         self,
         company_data: Dict,
@@ -302,6 +683,38 @@ class BenchmarkingChain(RAGChain):
         Returns:
             Análisis comparativo
         """
+        question, context = self._benchmark_prompt(company_data, benchmark_type)
+        return self.query_with_context(question, context)
+
+    def stream_compare_with_benchmark(
+        self,
+        company_data: Dict,
+        benchmark_type: str = "gcca"
+    ) -> Iterator[Dict]:
+        """
+        Versión en streaming de compare_with_benchmark() (eventos de stream()).
+        """
+        question, context = self._benchmark_prompt(company_data, benchmark_type)
+        return self.stream_with_context(question, context)
+
+    def astream_compare_with_benchmark(
+        self,
+        company_data: Dict,
+        benchmark_type: str = "gcca"
+    ) -> AsyncIterator[Dict]:
+        """
+        Versión asíncrona de stream_compare_with_benchmark().
+        """
+        question, context = self._benchmark_prompt(company_data, benchmark_type)
+        return self.astream_with_context(question, context)
+
+    def _benchmark_prompt(self, company_data: Dict, benchmark_type: str) -> Tuple[str, str]:
+        """
+        Construye pregunta y contexto para comparar una empresa con benchmarks.
+
+        Returns:
+            Tupla (pregunta, contexto)
+        """
         # Construir contexto desde datos
         context = f"""
 Datos de la compañía:
@@ -323,7 +736,181 @@ Basándote en los datos de la compañía y los documentos técnicos disponibles:
 Proporciona una respuesta estructurada con números específicos cuando sea posible.
 """
 
-        return self.query_with_context(question, context)
+        return question, context
+
+    def compare_with_benchmark_batch(
+        self,
+        companies_data: List[Dict],
+        benchmark_type: str = "gcca",
+        max_concurrency: int = 4,
+        requests_per_minute: Optional[float] = None,
+        return_exceptions: bool = False
+    ) -> List[Union[Dict, Exception]]:
+        """
+        Compara varias empresas con benchmarks en paralelo.
+
+        Como compare_with_benchmark, cada empresa recupera documentos con su
+        propia pregunta (pregunta + datos de la empresa). Empresas con datos
+        idénticos, o que producen el mismo prompt, se analizan una sola vez.
+
+        Args:
+            companies_data: Lista de diccionarios con datos de cada empresa
+            benchmark_type: Tipo de benchmark (gcca, gnr, regional)
+            max_concurrency: Llamadas simultáneas al LLM
+            requests_per_minute: Límite de llamadas por minuto (None = sin límite)
+            return_exceptions: Devolver la excepción de una empresa fallida en
+                su posición en lugar de propagarla (el resto del lote continúa)
+
+        Returns:
+            Análisis comparativos (o excepción) en el mismo orden que `companies_data`
+        """
+        start = time.perf_counter()
+
+        prompts = [
+            self._enhance_question(*self._benchmark_prompt(data, benchmark_type))
+            for data in companies_data
+        ]
+        unique = list(dict.fromkeys(prompts))
+
+        def analyze(prompt):
+            # Solo caché exacta: el prompt lleva los datos de la empresa
+            docs, _ = self._retrieve(prompt)
+            return self._answer(prompt, docs, None, time.perf_counter())
+
+        results = dict(zip(unique, map_concurrent(
+            analyze, unique, max_concurrency, RateLimiter(requests_per_minute), return_exceptions
+        )))
+
+        print(f"✅ {len(companies_data)} empresas ({len(unique)} únicas) analizadas "
+              f"en {time.perf_counter() - start:.1f}s")
+        return [results[prompt] for prompt in prompts]
+
+    def analyze_portfolio_batch(
+        self,
+        products_data: List[Dict],
+        products_per_prompt: int = 8,
+        max_concurrency: int = 4,
+        requests_per_minute: Optional[float] = None
+    ) -> Dict:
+        """
+        Analiza un portafolio grande en lotes paralelos.
+
+        - Elimina productos duplicados
+        - Agrupa por clase de resistencia estándar (20-50 MPa)
+        - Hace un retrieval por clase y lo reutiliza en todos sus prompts
+        - Cada prompt analiza hasta `products_per_prompt` productos
+        - Los prompts se despachan con concurrencia y tasa acotadas
+
+        Args:
+            products_data: Lista de productos con huella y volumen
+            products_per_prompt: Productos por prompt compartido
+            max_concurrency: Llamadas simultáneas al LLM
+            requests_per_minute: Límite de llamadas por minuto (None = sin límite)
+
+        Returns:
+            Diccionario con:
+                - analyses: un análisis por prompt (clase, productos, respuesta, fuentes;
+                  'error' en lugar de respuesta si el prompt falló)
+                - by_product: índice en `analyses` de cada producto de entrada
+                - stats: productos, únicos, prompts, retrievals y segundos
+        """
+        start = time.perf_counter()
+
+        unique, index = self._deduplicate(products_data)
+
+        # Agrupar productos únicos por clase de resistencia
+        by_class: Dict[Optional[int], List[int]] = {}
+        for i, product in enumerate(unique):
+            clase = self._resistance_class(product.get('resistencia'))
+            by_class.setdefault(clase, []).append(i)
+
+        # Un retrieval por clase (en paralelo)
+        clases = list(by_class)
+        docs_by_class = dict(zip(
+            clases,
+            map_concurrent(
+                lambda c: self._retrieve(self._class_query(c))[0], clases, max_concurrency,
+                return_exceptions=True
+            )
+        ))
+
+        # Prompts compartidos de hasta products_per_prompt productos
+        batches = []
+        for clase, members in by_class.items():
+            for j in range(0, len(members), products_per_prompt):
+                batches.append((clase, members[j:j + products_per_prompt]))
+
+        def analyze(batch):
+            clase, members = batch
+            question, context = self._portfolio_prompt([unique[i] for i in members])
+            docs = docs_by_class[clase]
+            if isinstance(docs, Exception):  # falló el retrieval de la clase
+                docs = []
+            return self._answer(self._enhance_question(question, context), docs, None, time.perf_counter())
+
+        responses = map_concurrent(
+            analyze, batches, max_concurrency, RateLimiter(requests_per_minute), return_exceptions=True
+        )
+
+        analyses = []
+        batch_of_unique = {}
+        for n, ((clase, members), response) in enumerate(zip(batches, responses)):
+            analyses.append({
+                "resistance_class": clase,
+                "products": [unique[i].get('nombre', f'Producto {i + 1}') for i in members],
+                **({"error": str(response)} if isinstance(response, Exception) else response)
+            })
+            for i in members:
+                batch_of_unique[i] = n
+
+        seconds = time.perf_counter() - start
+        print(f"✅ Portafolio: {len(products_data)} productos ({len(unique)} únicos) "
+              f"en {len(batches)} prompts, {seconds:.1f}s")
+
+        return {
+            "analyses": analyses,
+            "by_product": [batch_of_unique[i] for i in index],
+            "stats": {
+                "products": len(products_data),
+                "unique_products": len(unique),
+                "prompts": len(batches),
+                "retrievals": len(clases),
+                "seconds": round(seconds, 2)
+            }
+        }
+
+    @staticmethod
+    def _deduplicate(items: List[Dict]) -> Tuple[List[Dict], List[int]]:
+        """
+        Elimina diccionarios idénticos conservando el orden.
+
+        Returns:
+            Tupla (items únicos, índice del único de cada item original)
+        """
+        unique, index, seen = [], [], {}
+        for item in items:
+            key = repr(sorted(item.items(), key=lambda kv: kv[0]))
+            if key not in seen:
+                seen[key] = len(unique)
+                unique.append(item)
+            index.append(seen[key])
+        return unique, index
+
+    @classmethod
+    def _resistance_class(cls, resistencia) -> Optional[int]:
+        """Clase de resistencia estándar más cercana (None si no hay dato)."""
+        try:
+            valor = float(resistencia)
+        except (TypeError, ValueError):
+            return None
+        return min(cls.RESISTENCIAS_ESTANDAR, key=lambda r: abs(r - valor))
+
+    @staticmethod
+    def _class_query(clase: Optional[int]) -> str:
+        """Consulta de retrieval compartida por una clase de resistencia."""
+        resistencia = f"de {clase} MPa" if clase else ""
+        return (f"Estrategias y tecnologías para reducir la huella de carbono del "
+                f"concreto {resistencia}: contenido de cemento, adiciones y benchmarks")
 
     def analyze_portfolio(self, products_data: List[Dict]) -> Dict:
         """
@@ -335,6 +922,30 @@ Proporciona una respuesta estructurada con números específicos cuando sea posi
         Returns:
             Análisis de portafolio
         """
+        question, context = self._portfolio_prompt(products_data)
+        return self.query_with_context(question, context)
+
+    def stream_analyze_portfolio(self, products_data: List[Dict]) -> Iterator[Dict]:
+        """
+        Versión en streaming de analyze_portfolio() (eventos de stream()).
+        """
+        question, context = self._portfolio_prompt(products_data)
+        return self.stream_with_context(question, context)
+
+    def astream_analyze_portfolio(self, products_data: List[Dict]) -> AsyncIterator[Dict]:
+        """
+        Versión asíncrona de stream_analyze_portfolio().
+        """
+        question, context = self._portfolio_prompt(products_data)
+        return self.astream_with_context(question, context)
+
+    def _portfolio_prompt(self, products_data: List[Dict]) -> Tuple[str, str]:
+        """
+        Construye pregunta y contexto para analizar un portafolio.
+
+        Returns:
+            Tupla (pregunta, contexto)
+        """
         # Construir contexto
         context = "Portafolio de productos:\n"
         for i, product in enumerate(products_data, 1):
@@ -356,7 +967,7 @@ Analiza este portafolio de productos y recomienda:
 Prioriza por impacto (volumen × huella) y factibilidad.
 """
 
-        return self.query_with_context(question, context)
+        return question, context
 
 
 # Ejemplo de uso
@@ -8,7 +8,7 @@ Permite al LLM consultar la base de datos PostgreSQL.
 import os
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from dotenv import load_dotenv
 
 # Agregar path para imports
@@ -19,6 +19,31 @@ from database.connection import get_connection
 load_dotenv()
 
 
+def company_filter(column: str, compania: str, año: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Cláusula WHERE parametrizada para filtrar por compañía (y año).
+
+    Compara LOWER(columna) con LOWER(parámetro), lo que usa los índices de
+    expresión LOWER(origen)/LOWER(compania) creados por el ETL
+    (sql/create_indices_compania.sql) en lugar de un scan secuencial. La
+    compañía y el año van como parámetros, nunca interpolados en el SQL.
+
+    Args:
+        column: Columna con el nombre de la compañía (origen o compania)
+        compania: Nombre de la compañía
+        año: Año (opcional)
+
+    Returns:
+        Tupla (cláusula WHERE, parámetros)
+    """
+    where_clause = f"WHERE LOWER({column}) = LOWER(:compania)"
+    params: Dict[str, Any] = {"compania": compania}
+    if año:
+        where_clause += " AND año = :anio"
+        params["anio"] = año
+    return where_clause, params
+
+
 class SQLTool:
     """
     Herramienta para consultar la base de datos desde el RAG.
@@ -106,13 +131,19 @@ Base de datos FICEM BD - Schema disponible:
 - plantas_latam: Plantas geolocalizadas en LATAM
 """
 
-    def execute_query(self, query: str, max_rows: int = 100) -> Dict[str, Any]:
+    def execute_query(
+        self,
+        query: str,
+        max_rows: int = 100,
+        params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Ejecuta una consulta SQL y retorna resultados.
 
         Args:
             query: Query SQL a ejecutar
             max_rows: Máximo número de filas a retornar
+            params: Parámetros de la consulta (:nombre), ej: de company_filter
 
         Returns:
             Diccionario con resultados y metadata
@@ -130,7 +161,11 @@ Base de datos FICEM BD - Schema disponible:
                 }
 
             # Ejecutar query con pandas (compatible con PostgreSQL engine)
-            df = pd.read_sql_query(query, self.conn)
+            if params:
+                from sqlalchemy import text
+                df = pd.read_sql_query(text(query), self.conn, params=params)
+            else:
+                df = pd.read_sql_query(query, self.conn)
 
             # Limitar filas si es necesario
             if len(df) > max_rows:
@@ -198,9 +233,7 @@ Base de datos FICEM BD - Schema disponible:
         Returns:
             Diccionario con estadísticas
         """
-        where_clause = f"WHERE LOWER(origen) = LOWER('{compania}')"
-        if año:
-            where_clause += f" AND año = {año}"
+        where_clause, params = company_filter("origen", compania, año)
 
         query = f"""
         SELECT
@@ -217,7 +250,7 @@ Base de datos FICEM BD - Schema disponible:
         ORDER BY año DESC
         """
 
-        return self.execute_query(query)
+        return self.execute_query(query, params=params)
 
     def get_top_productos_huella(self, limit: int = 10) -> Dict[str, Any]:
         """
@@ -5,6 +5,9 @@ Piloto IA - FICEM BD
 Maneja la base de datos vectorial para RAG.
 """
 
+import os
+import time
+import uuid
 from pathlib import Path
 from typing import List, Dict, Optional
 import chromadb
@@ -113,6 +116,7 @@ class VectorStoreManager:
 
             print(f"  ✓ Lote {i // batch_size + 1}: {len(batch_texts)} docs")
 
+        self._bump_data_version()
         print(f"✅ {len(documents)} documentos agregados exitosamente")
 
     def search(
@@ -218,12 +222,45 @@ class VectorStoreManager:
             print(f"Error obteniendo stats: {e}")
             return {"error": str(e)}
 
+    def get_data_version(self) -> str:
+        """
+        Versión de los datos de la colección.
+
+        Es un token que add_documents y clear_collection renuevan en cada
+        escritura y que se guarda junto a ChromaDB, así que la ven también
+        otros procesos (ingesta). El número de documentos no sirve: agregar
+        uno y borrar otro, o reingestar un texto cambiado, lo deja igual.
+
+        Returns:
+            String "colección:token"
+        """
+        path = self._data_version_path()
+        try:
+            token = path.read_text().strip()
+        except FileNotFoundError:
+            token = self._bump_data_version()
+
+        return f"{self.collection_name}:{token}"
+
+    def _data_version_path(self) -> Path:
+        return self.persist_directory / f"{self.collection_name}.version"
+
+    def _bump_data_version(self) -> str:
+        """Renueva el token de versión de la colección (escritura atómica)."""
+        token = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        path = self._data_version_path()
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(token)
+        os.replace(tmp, path)
+        return token
+
     def clear_collection(self) -> None:
         """
         Elimina todos los documentos de la colección.
         """
         try:
             self.client.delete_collection(name=self.collection_name)
+            self._bump_data_version()
             print(f"✅ Colección '{self.collection_name}' eliminada")
             self.vectorstore = None
         except Exception as e:
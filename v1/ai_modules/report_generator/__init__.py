@@ -3,12 +3,25 @@ Módulo de generación de informes
 Piloto IA - FICEM BD
 
 Generadores de informes PDF y Excel con análisis de IA.
+
+Las clases se importan al primer uso: los workers del pool de gráficos
+(charts) no cargan rag_chain, dotenv ni LangChain al importar el paquete.
 """
 
-from .pdf_generator import BenchmarkingReportPDF
-from .excel_generator import BenchmarkingReportExcel
+import importlib
+
+_EXPORTS = {
+    'BenchmarkingReportPDF': '.pdf_generator',
+    'BenchmarkingReportExcel': '.excel_generator',
+    'BatchReportJob': '.batch'
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    'BenchmarkingReportPDF',
-    'BenchmarkingReportExcel'
-]
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,339 @@
+"""
+Generación de Informes de Benchmarking en Lote
+Piloto IA - FICEM BD
+
+Genera los informes PDF/Excel de muchas compañías (y años) en una sola
+corrida:
+
+1. Datos: una consulta agrupada a huella_concretos y otra a
+   remitos_concretos para todas las compañías (en lugar de 2-3 por informe)
+2. IA: análisis comparativos concurrentes con limitador de tasa
+   (compare_with_benchmark_batch, un retrieval por compañía)
+3. Gráficos: matplotlib en memoria, en un pool de procesos
+4. Archivos: construcción de cada PDF/XLSX con los datos ya obtenidos
+
+Al final se imprime un resumen de tiempos por etapa.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from ai_modules.rag.rag_chain import BenchmarkingChain
+from ai_modules.rag.sql_tool import SQLTool
+from ai_modules.report_generator.charts import render_charts_parallel
+from ai_modules.report_generator.pdf_generator import BenchmarkingReportPDF
+from ai_modules.report_generator.excel_generator import BenchmarkingReportExcel
+
+
+# Mismas métricas que SQLTool.get_huella_promedio_compania, para todas las compañías
+COMPANY_AGGREGATES_QUERY = """
+SELECT
+    origen as compania,
+    LOWER(origen) as clave,
+    año,
+    SUM(num_remitos) as num_remitos,
+    AVG(huella_co2) as huella_promedio,
+    AVG("REST") as resistencia_promedio,
+    AVG(volumen) as cemento_promedio,
+    SUM(volumen) as volumen_total
+FROM huella_concretos
+WHERE LOWER(origen) IN :claves
+GROUP BY origen, año
+"""
+
+# Sumas y conteos por compañía × año × resistencia: de aquí salen los
+# productos (con o sin año) y la evolución temporal de cada informe
+PRODUCT_AGGREGATES_QUERY = """
+SELECT
+    LOWER(compania) as clave,
+    año,
+    resistencia,
+    COUNT(*) as num_remitos,
+    SUM(huella_co2) as suma_huella,
+    COUNT(huella_co2) as n_huella,
+    SUM(contenido_cemento) as suma_cemento,
+    COUNT(contenido_cemento) as n_cemento,
+    SUM(volumen) as volumen_total
+FROM remitos_concretos
+WHERE LOWER(compania) IN :claves
+GROUP BY LOWER(compania), año, resistencia
+"""
+
+# Filas máximas que devolvía SQLTool.execute_query por consulta
+MAX_ROWS = 100
+
+# Productos en el informe PDF
+PDF_TOP_PRODUCTOS = 10
+
+FORMATOS = ('pdf', 'xlsx')
+
+
+def prefetch_company_data(engine, requests: Sequence[Tuple[str, Optional[int]]]) -> Dict[Tuple[str, Optional[int]], Dict]:
+    """
+    Obtiene los datos de todos los informes con dos consultas agrupadas.
+
+    Args:
+        engine: Engine SQLAlchemy
+        requests: Pares (compañía, año) (año None = histórico)
+
+    Returns:
+        (compañía, año) → {company_data, productos_pdf, productos_xlsx, temporal}
+        (company_data None si la compañía no tiene datos)
+    """
+    claves = sorted({compania.lower() for compania, _ in requests})
+    if not claves:
+        return {}
+
+    companias = pd.read_sql_query(
+        text(COMPANY_AGGREGATES_QUERY).bindparams(bindparam('claves', expanding=True)),
+        engine, params={'claves': claves}
+    )
+    productos = pd.read_sql_query(
+        text(PRODUCT_AGGREGATES_QUERY).bindparams(bindparam('claves', expanding=True)),
+        engine, params={'claves': claves}
+    )
+
+    # Mismo orden que ORDER BY año DESC (NULL primero en PostgreSQL)
+    companias = companias.sort_values('año', ascending=False, na_position='first', kind='stable')
+
+    data = {}
+    for compania, año in requests:
+        clave = compania.lower()
+
+        filas = companias[companias['clave'] == clave]
+        remitos = productos[productos['clave'] == clave]
+        if año:
+            filas = filas[filas['año'] == año]
+            remitos = remitos[remitos['año'] == año]
+
+        productos_df = _productos(remitos)
+        data[(compania, año)] = {
+            'company_data': filas.drop(columns='clave').iloc[0].to_dict() if not filas.empty else None,
+            'productos_pdf': _records(productos_df.drop(columns='cemento_promedio').head(PDF_TOP_PRODUCTOS)),
+            'productos_xlsx': _records(productos_df.head(MAX_ROWS)),
+            'temporal': _records(_temporal(remitos).head(MAX_ROWS)) if not año else []
+        }
+
+    return data
+
+
+def _productos(remitos: pd.DataFrame) -> pd.DataFrame:
+    """Productos por resistencia ordenados por volumen (como la consulta por compañía)."""
+    g = remitos.groupby('resistencia', dropna=False)
+    df = pd.DataFrame({
+        'num_remitos': g['num_remitos'].sum(),
+        'huella_promedio': g['suma_huella'].sum() / g['n_huella'].sum().replace(0, float('nan')),
+        'cemento_promedio': g['suma_cemento'].sum() / g['n_cemento'].sum().replace(0, float('nan')),
+        'volumen_total': g['volumen_total'].sum(min_count=1)
+    }).reset_index()
+
+    # ORDER BY volumen_total DESC (NULL primero en PostgreSQL)
+    return df.sort_values('volumen_total', ascending=False, na_position='first', kind='stable')
+
+
+def _temporal(remitos: pd.DataFrame) -> pd.DataFrame:
+    """Evolución por año a partir de los agregados por resistencia."""
+    con_resistencia = remitos['resistencia'].notna()
+    df = remitos.assign(
+        suma_resistencia=(remitos['resistencia'] * remitos['num_remitos']).where(con_resistencia),
+        n_resistencia=remitos['num_remitos'].where(con_resistencia, 0)
+    )
+
+    g = df.groupby('año', dropna=False)
+    return pd.DataFrame({
+        'num_remitos': g['num_remitos'].sum(),
+        'huella_promedio': g['suma_huella'].sum() / g['n_huella'].sum().replace(0, float('nan')),
+        'resistencia_promedio': g['suma_resistencia'].sum() / g['n_resistencia'].sum().replace(0, float('nan')),
+        'volumen_total': g['volumen_total'].sum(min_count=1)
+    }).reset_index().sort_values('año', na_position='last', kind='stable')
+
+
+def _records(df: pd.DataFrame) -> List[Dict]:
+    """Filas como diccionarios (NaN → None, como devuelve la BD)."""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+class BatchReportJob:
+    """
+    Informes de benchmarking para muchas compañías en una corrida.
+    """
+
+    def __init__(
+        self,
+        llm_model: str = "qwen2.5:3b",
+        use_claude: bool = False,
+        output_dir: str = "./reports",
+        max_concurrency: int = 4,
+        requests_per_minute: Optional[float] = None,
+        chart_workers: Optional[int] = None
+    ):
+        """
+        Inicializa el trabajo (una chain y una conexión compartidas).
+
+        Args:
+            llm_model: Modelo LLM a usar
+            use_claude: Si True, usa Claude API
+            output_dir: Directorio de salida
+            max_concurrency: Llamadas simultáneas al LLM
+            requests_per_minute: Límite de llamadas por minuto (None = sin límite)
+            chart_workers: Procesos para gráficos (None = núcleos disponibles)
+        """
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.chart_workers = chart_workers or os.cpu_count() or 1
+
+        rag = BenchmarkingChain(llm_model=llm_model, temperature=0.1, top_k=5, use_claude=use_claude)
+        self.sql_tool = SQLTool()
+
+        self.generators = {
+            'pdf': BenchmarkingReportPDF(llm_model, use_claude, output_dir, rag=rag, sql_tool=self.sql_tool),
+            'xlsx': BenchmarkingReportExcel(llm_model, use_claude, output_dir, rag=rag, sql_tool=self.sql_tool)
+        }
+        self.rag = rag
+        self.timings: Dict[str, float] = {}
+
+    def run(
+        self,
+        companias: Sequence[str],
+        años: Optional[Sequence[Optional[int]]] = None,
+        formatos: Sequence[str] = FORMATOS,
+        benchmark_type: str = "gcca"
+    ) -> Dict:
+        """
+        Genera los informes de todas las combinaciones compañía × año.
+
+        Args:
+            companias: Compañías (origen)
+            años: Años a generar (None = solo histórico)
+            formatos: 'pdf' y/o 'xlsx'
+            benchmark_type: Tipo de benchmark (gcca, gnr, regional)
+
+        Returns:
+            Diccionario con:
+                - reports: por solicitud, compania, año, rutas por formato y error
+                - timings: segundos por etapa (datos, ia, graficos, pdf, xlsx, total)
+        """
+        unknown = set(formatos) - set(FORMATOS)
+        if unknown:
+            raise ValueError(f"Formatos no soportados: {sorted(unknown)}")
+
+        start = time.perf_counter()
+        self.timings = {}
+        requests = [(c, a) for c in companias for a in (años or [None])]
+        reports = [{'compania': c, 'año': a, 'error': None} for c, a in requests]
+        print(f"\n📊 Lote de informes: {len(requests)} solicitud(es), formatos {', '.join(formatos)}")
+
+        # 1. Datos de todas las compañías
+        with self._stage('datos'):
+            data = prefetch_company_data(self.sql_tool.conn, requests)
+
+        pending = []
+        for i, request in enumerate(requests):
+            if data[request]['company_data'] is None:
+                reports[i]['error'] = f"No se encontraron datos para {request[0]}"
+            else:
+                pending.append(i)
+
+        # 2. Análisis de IA concurrentes (un análisis fallido llega como excepción)
+        with self._stage('ia'):
+            analyses = self.rag.compare_with_benchmark_batch(
+                [data[requests[i]]['company_data'] for i in pending],
+                benchmark_type=benchmark_type,
+                max_concurrency=self.max_concurrency,
+                requests_per_minute=self.requests_per_minute,
+                return_exceptions=True
+            ) if pending else []
+
+        analyses = dict(zip(pending, analyses))
+        for i in list(pending):
+            if isinstance(analyses[i], Exception):
+                reports[i]['error'] = f"Análisis IA: {analyses[i]}"
+                pending.remove(i)
+
+        # 3. Gráficos en paralelo (solo PDF; un error afecta solo al PDF de su informe)
+        charts = {i: None for i in pending}
+        sin_graficos = set()
+        if 'pdf' in formatos and pending:
+            with self._stage('graficos'):
+                tasks = [(data[requests[i]]['company_data'], data[requests[i]]['productos_pdf']) for i in pending]
+                workers = max(1, min(self.chart_workers, len(tasks)))
+                resultados = render_charts_parallel(tasks, max_workers=workers, return_exceptions=True)
+
+            for i, resultado in zip(pending, resultados):
+                if isinstance(resultado, Exception):
+                    print(f"⚠️  Error generando gráficos de {requests[i][0]}: {resultado}")
+                    reports[i]['error'] = f"Gráficos: {resultado}"
+                    sin_graficos.add(i)
+                else:
+                    charts[i] = resultado
+
+        # 4. Archivos
+        for formato in formatos:
+            with self._stage(formato):
+                for i in pending:
+                    if formato == 'pdf' and i in sin_graficos:
+                        continue
+                    compania, año = requests[i]
+                    d = data[requests[i]]
+                    try:
+                        if formato == 'pdf':
+                            path = self.generators['pdf'].build_report(
+                                compania, año, d['company_data'], analyses[i], d['productos_pdf'], charts[i]
+                            )
+                        else:
+                            path = self.generators['xlsx'].build_report(
+                                compania, año, d['company_data'], analyses[i], d['productos_xlsx'], d['temporal']
+                            )
+                        reports[i][formato] = path
+                    except Exception as e:
+                        print(f"⚠️  Error generando {formato} de {compania}: {e}")
+                        reports[i]['error'] = str(e)
+
+        self.timings['total'] = round(time.perf_counter() - start, 2)
+        self._print_summary(reports)
+        return {'reports': reports, 'timings': dict(self.timings)}
+
+    @contextmanager
+    def _stage(self, name: str):
+        """Mide la duración de una etapa en self.timings."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 2)
+            print(f"  ⏱️  {name}: {self.timings[name]}s")
+
+    def _print_summary(self, reports: List[Dict]) -> None:
+        ok = sum(1 for r in reports if not r['error'])
+        print(f"\n✅ {ok}/{len(reports)} informe(s) generados en {self.timings['total']}s")
+        for stage, seconds in self.timings.items():
+            if stage != 'total':
+                print(f"   {stage:<10} {seconds:>8.2f}s")
+        for r in reports:
+            if r['error']:
+                print(f"   ⚠️  {r['compania']} {r['año'] or 'histórico'}: {r['error']}")
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    job = BatchReportJob(
+        llm_model="qwen2.5:3b",
+        use_claude=False,
+        output_dir="./reports",
+        max_concurrency=4,
+        requests_per_minute=30
+    )
+
+    # Informe trimestral: todas las compañías con datos
+    companias = pd.read_sql_query(
+        "SELECT DISTINCT origen FROM huella_concretos WHERE origen IS NOT NULL ORDER BY origen",
+        job.sql_tool.conn
+    )['origen'].tolist()
+
+    resultado = job.run(companias, años=[2024])
+    print(resultado['timings'])
@@ -0,0 +1,279 @@
+"""
+Gráficos de los Informes de Benchmarking
+Piloto IA - FICEM BD
+
+Funciones de módulo (sin estado compartido) que dibujan con la API de
+objetos de matplotlib (Figure/Axes, sin pyplot) y devuelven la imagen en
+memoria, lista para insertarse en reportlab sin pasar por disco. Son
+seguras entre hilos (sesiones de Streamlit) y se pueden generar en
+paralelo con hilos o procesos al preparar informes en lote.
+"""
+
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+# Matplotlib sin pyplot: cada gráfico usa su propia Figure
+from matplotlib.figure import Figure
+
+
+# Valores de referencia de los gráficos de comparación
+BENCHMARKS_REF = {
+    'regional': 250,
+    'gcca_a': 150,
+    'gcca_c': 300
+}
+
+# Plantilla común de los gráficos del informe
+PLANTILLA_INFORME = {
+    'figsize': (10, 6),
+    'dpi': 150
+}
+
+# Formatos de salida: 'png' (raster) o 'svg' (vectorial, requiere svglib)
+FORMATO_DEFECTO = 'png'
+FORMATOS = ('png', 'svg')
+
+# Figuras reutilizadas por hilo (una por tamaño)
+_local = threading.local()
+
+
+def _figura(figsize: Tuple[float, float]) -> Figure:
+    """
+    Figura vacía de la plantilla, reutilizada dentro del hilo actual.
+
+    Args:
+        figsize: Tamaño en pulgadas
+
+    Returns:
+        Figure limpia (sin ejes)
+    """
+    figuras = getattr(_local, 'figuras', None)
+    if figuras is None:
+        figuras = _local.figuras = {}
+
+    fig = figuras.get(figsize)
+    if fig is None:
+        fig = figuras[figsize] = Figure(figsize=figsize)
+    else:
+        fig.clear()
+    return fig
+
+
+def _exportar(fig: Figure, formato: str) -> bytes:
+    """
+    Renderiza la figura en memoria.
+
+    Args:
+        fig: Figura dibujada
+        formato: 'png' o 'svg'
+
+    Returns:
+        Contenido del archivo de imagen
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}. Use: {FORMATOS}")
+
+    buffer = BytesIO()
+    fig.tight_layout()
+    fig.savefig(buffer, format=formato, dpi=PLANTILLA_INFORME['dpi'], bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def chart_huella_comparacion(company_data: Dict, benchmarks: Dict, formato: str = FORMATO_DEFECTO) -> bytes:
+    """
+    Crea gráfico de comparación de huella.
+
+    Args:
+        company_data: Datos de la empresa
+        benchmarks: Benchmarks de referencia
+        formato: 'png' o 'svg'
+
+    Returns:
+        Imagen en memoria (bytes)
+    """
+    fig = _figura(PLANTILLA_INFORME['figsize'])
+    ax = fig.add_subplot()
+
+    # Datos
+    labels = ['Empresa', 'Promedio Regional', 'GCCA Banda A', 'GCCA Banda C']
+    values = [
+        company_data.get('huella_promedio', 0),
+        benchmarks.get('regional', 250),
+        benchmarks.get('gcca_a', 150),
+        benchmarks.get('gcca_c', 300)
+    ]
+    colors_bars = ['#2E86AB', '#A23B72', '#52B788', '#FCA311']
+
+    # Crear barras
+    bars = ax.bar(labels, values, color=colors_bars, alpha=0.8, edgecolor='black')
+
+    # Personalización
+    ax.set_ylabel('Huella CO₂ (kg/m³)', fontsize=12, fontweight='bold')
+    ax.set_title('Comparación de Huella de Carbono', fontsize=14, fontweight='bold')
+    ax.grid(axis='y', alpha=0.3, linestyle='--')
+
+    # Agregar valores sobre barras
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+               f'{height:.1f}',
+               ha='center', va='bottom', fontweight='bold')
+
+    return _exportar(fig, formato)
+
+
+def chart_distribucion_resistencias(resistencias_data: List[Dict], formato: str = FORMATO_DEFECTO) -> bytes:
+    """
+    Crea gráfico de distribución de resistencias.
+
+    Args:
+        resistencias_data: Lista de datos de resistencias
+        formato: 'png' o 'svg'
+
+    Returns:
+        Imagen en memoria (bytes)
+    """
+    fig = _figura(PLANTILLA_INFORME['figsize'])
+    ax = fig.add_subplot()
+
+    # Extraer datos
+    resistencias = [d['resistencia'] for d in resistencias_data]
+    huellas = [d['huella_promedio'] for d in resistencias_data]
+    volumenes = [d['volumen_total'] for d in resistencias_data]
+
+    # Normalizar volúmenes para tamaño de burbujas
+    max_vol = max(volumenes) if volumenes else 1
+    sizes = [v/max_vol * 1000 for v in volumenes]
+
+    # Scatter plot
+    scatter = ax.scatter(resistencias, huellas, s=sizes, alpha=0.6,
+                        c=range(len(resistencias)), cmap='viridis',
+                        edgecolors='black', linewidth=1)
+
+    # Personalización
+    ax.set_xlabel('Resistencia (MPa)', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Huella CO₂ (kg/m³)', fontsize=12, fontweight='bold')
+    ax.set_title('Distribución Resistencia vs Huella (tamaño = volumen)',
+                 fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3, linestyle='--')
+
+    # Colorbar
+    cbar = fig.colorbar(scatter, ax=ax)
+    cbar.set_label('Productos', rotation=270, labelpad=15)
+
+    return _exportar(fig, formato)
+
+
+def render_report_charts(
+    company_data: Dict,
+    productos_data: List[Dict],
+    formato: str = FORMATO_DEFECTO
+) -> Dict[str, Optional[bytes]]:
+    """
+    Genera los gráficos del informe PDF de una compañía.
+
+    Args:
+        company_data: Datos de la empresa
+        productos_data: Distribución de productos por resistencia
+        formato: 'png' o 'svg'
+
+    Returns:
+        Diccionario con imágenes en memoria: huella y resistencias (None si no hay productos)
+    """
+    return {
+        'huella': chart_huella_comparacion(company_data, BENCHMARKS_REF, formato),
+        'resistencias': chart_distribucion_resistencias(productos_data, formato) if productos_data else None
+    }
+
+
+def _render_task(task: Tuple[Dict, List[Dict], str]) -> Dict[str, Optional[bytes]]:
+    """Punto de entrada serializable para los pools."""
+    company_data, productos_data, formato = task
+    return render_report_charts(company_data, productos_data, formato)
+
+
+def render_charts_parallel(
+    tasks: Sequence[Tuple[Dict, List[Dict]]],
+    max_workers: Optional[int] = None,
+    processes: bool = True,
+    formato: str = FORMATO_DEFECTO,
+    return_exceptions: bool = False
+) -> List[Union[Dict[str, Optional[bytes]], Exception]]:
+    """
+    Genera los gráficos de varios informes en paralelo.
+
+    Cada informe es una tarea independiente del pool.
+
+    Args:
+        tasks: Pares (company_data, productos_data), uno por informe
+        max_workers: Trabajadores del pool (None = según el ejecutor)
+        processes: Usar procesos (lotes grandes) o hilos (dentro de Streamlit)
+        formato: 'png' o 'svg'
+        return_exceptions: Devolver la excepción de un informe fallido en su
+            posición en lugar de propagarla (el resto del lote continúa)
+
+    Returns:
+        Gráficos (o excepción) de cada informe, en el orden de tasks
+    """
+    tasks = [(company_data, productos_data, formato) for company_data, productos_data in tasks]
+
+    def resultado(fn, task):
+        try:
+            return fn(task)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return e
+
+    if len(tasks) <= 1 or max_workers == 1:
+        return [resultado(_render_task, task) for task in tasks]
+
+    executor_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_cls(max_workers=max_workers) as executor:
+        futures = [executor.submit(_render_task, task) for task in tasks]
+        return [resultado(lambda f: f.result(), future) for future in futures]
+
+
+def chart_flowable(imagen: bytes, width: float, height: float):
+    """
+    Flowable de reportlab a partir de una imagen en memoria.
+
+    Los PNG se insertan como Image; los SVG como dibujo vectorial (svglib).
+
+    Args:
+        imagen: Contenido PNG o SVG
+        width: Ancho en puntos
+        height: Alto en puntos
+
+    Returns:
+        Flowable para agregar a la historia del documento
+    """
+    if imagen.lstrip()[:1] == b'<':
+        from svglib.svglib import svg2rlg
+
+        drawing = svg2rlg(BytesIO(imagen))
+        sx, sy = width / drawing.width, height / drawing.height
+        drawing.scale(sx, sy)
+        drawing.width, drawing.height = width, height
+        return drawing
+
+    from reportlab.platypus import Image
+    return Image(BytesIO(imagen), width=width, height=height)
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    import time
+
+    company = {'huella_promedio': 231.4}
+    productos = [
+        {'resistencia': r, 'huella_promedio': 150 + 4 * r, 'volumen_total': 1000 / r}
+        for r in range(15, 50, 5)
+    ]
+
+    inicio = time.perf_counter()
+    charts = render_charts_parallel([(company, productos)] * 8, processes=False)
+    print(f"✅ {len(charts)} informes en {time.perf_counter() - inicio:.2f}s "
+          f"({len(charts[0]['huella']):,} bytes por gráfico)")
@@ -19,7 +19,7 @@ from openpyxl.utils.dataframe import dataframe_to_rows
 
 # RAG y SQL
 from ai_modules.rag.rag_chain import BenchmarkingChain
-from ai_modules.rag.sql_tool import SQLTool
+from ai_modules.rag.sql_tool import SQLTool, company_filter
 
 
 class BenchmarkingReportExcel:
@@ -31,7 +31,9 @@ class BenchmarkingReportExcel:
         self,
         llm_model: str = "qwen2.5:3b",
         use_claude: bool = False,
-        output_dir: str = "./reports"
+        output_dir: str = "./reports",
+        rag: Optional[BenchmarkingChain] = None,
+        sql_tool: Optional[SQLTool] = None
     ):
         """
         Inicializa el generador de informes.
@@ -40,6 +42,8 @@ class BenchmarkingReportExcel:
             llm_model: Modelo LLM a usar
             use_claude: Si True, usa Claude API
             output_dir: Directorio de salida para Excel
+            rag: Chain ya inicializada (None = crear una nueva)
+            sql_tool: SQLTool ya inicializada (None = crear una nueva)
         """
         self.llm_model = llm_model
         self.use_claude = use_claude
@@ -49,7 +53,7 @@ class BenchmarkingReportExcel:
         os.makedirs(output_dir, exist_ok=True)
 
         # Inicializar RAG chain
-        self.rag = BenchmarkingChain(
+        self.rag = rag or BenchmarkingChain(
             llm_model=llm_model,
             temperature=0.1,
             top_k=5,
@@ -57,7 +61,7 @@ class BenchmarkingReportExcel:
         )
 
         # Inicializar SQL tool
-        self.sql_tool = SQLTool()
+        self.sql_tool = sql_tool or SQLTool()
 
     def _apply_header_style(self, ws, row_num: int, col_start: int, col_end: int):
         """
@@ -142,6 +146,7 @@ class BenchmarkingReportExcel:
         )
 
         # 3. Obtener distribución de productos
+        where_clause, params = company_filter("compania", compania, año)
         query_productos = f"""
         SELECT
             resistencia,
@@ -150,12 +155,11 @@ class BenchmarkingReportExcel:
             AVG(contenido_cemento) as cemento_promedio,
             SUM(volumen) as volumen_total
         FROM remitos_concretos
-        WHERE LOWER(compania) = LOWER('{compania}')
-        {'AND año = ' + str(año) if año else ''}
+        {where_clause}
         GROUP BY resistencia
         ORDER BY volumen_total DESC
         """
-        result_productos = self.sql_tool.execute_query(query_productos)
+        result_productos = self.sql_tool.execute_query(query_productos, params=params)
         productos_data = result_productos["rows"] if result_productos["success"] else []
 
         # 4. Obtener evolución temporal (si no hay año específico)
@@ -168,16 +172,41 @@ class BenchmarkingReportExcel:
                 AVG(resistencia) as resistencia_promedio,
                 SUM(volumen) as volumen_total
             FROM remitos_concretos
-            WHERE LOWER(compania) = LOWER('{compania}')
+            {where_clause}
             GROUP BY año
             ORDER BY año
             """
-            result_temporal = self.sql_tool.execute_query(query_temporal)
+            result_temporal = self.sql_tool.execute_query(query_temporal, params=params)
             temporal_data = result_temporal["rows"] if result_temporal["success"] else []
         else:
             temporal_data = []
 
         # 5. Crear archivo Excel
+        return self.build_report(compania, año, company_data, ai_analysis, productos_data, temporal_data)
+
+    def build_report(
+        self,
+        compania: str,
+        año: Optional[int],
+        company_data: Dict,
+        ai_analysis: Dict,
+        productos_data: List[Dict],
+        temporal_data: List[Dict]
+    ) -> str:
+        """
+        Construye el Excel a partir de datos ya obtenidos.
+
+        Args:
+            compania: Nombre de la compañía
+            año: Año (opcional)
+            company_data: Fila de get_huella_promedio_compania
+            ai_analysis: Resultado de compare_with_benchmark
+            productos_data: Productos por resistencia (con cemento_promedio)
+            temporal_data: Evolución por año (vacía si hay año)
+
+        Returns:
+            Ruta al archivo Excel generado
+        """
         year_str = str(año) if año else "historico"
         filename = f"benchmarking_{compania}_{year_str}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         filepath = os.path.join(self.output_dir, filename)
@@ -13,26 +13,29 @@ import os
 from datetime import datetime
 from typing import Dict, List, Optional
 import io
-import tempfile
 
 # ReportLab para PDF
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
 from reportlab.lib import colors
 from reportlab.lib.colors import HexColor
 
-# Matplotlib para gráficos
-import matplotlib
-matplotlib.use('Agg')  # Backend sin GUI
-import matplotlib.pyplot as plt
 import numpy as np
 
+# Gráficos (funciones de módulo, también usadas por los lotes)
+from ai_modules.report_generator.charts import (
+    BENCHMARKS_REF,
+    chart_huella_comparacion,
+    chart_distribucion_resistencias,
+    chart_flowable
+)
+
 # RAG y SQL
 from ai_modules.rag.rag_chain import BenchmarkingChain
-from ai_modules.rag.sql_tool import SQLTool
+from ai_modules.rag.sql_tool import SQLTool, company_filter
 
 
 class BenchmarkingReportPDF:
@@ -44,7 +47,9 @@ class BenchmarkingReportPDF:
         self,
         llm_model: str = "qwen2.5:3b",
         use_claude: bool = False,
-        output_dir: str = "./reports"
+        output_dir: str = "./reports",
+        rag: Optional[BenchmarkingChain] = None,
+        sql_tool: Optional[SQLTool] = None
     ):
         """
         Inicializa el generador de informes.
@@ -53,6 +58,8 @@ class BenchmarkingReportPDF:
             llm_model: Modelo LLM a usar
             use_claude: Si True, usa Claude API
             output_dir: Directorio de salida para PDFs
+            rag: Chain ya inicializada (None = crear una nueva)
+            sql_tool: SQLTool ya inicializada (None = crear una nueva)
         """
         self.llm_model = llm_model
         self.use_claude = use_claude
@@ -62,7 +69,7 @@ class BenchmarkingReportPDF:
         os.makedirs(output_dir, exist_ok=True)
 
         # Inicializar RAG chain
-        self.rag = BenchmarkingChain(
+        self.rag = rag or BenchmarkingChain(
             llm_model=llm_model,
             temperature=0.1,
             top_k=5,
@@ -70,7 +77,7 @@ class BenchmarkingReportPDF:
         )
 
         # Inicializar SQL tool
-        self.sql_tool = SQLTool()
+        self.sql_tool = sql_tool or SQLTool()
 
     def _create_chart_huella_comparacion(
         self,
@@ -85,43 +92,9 @@ class BenchmarkingReportPDF:
             benchmarks: Benchmarks de referencia
 
         Returns:
-            Ruta al archivo de imagen temporal
+            Imagen PNG en memoria
         """
-        fig, ax = plt.subplots(figsize=(10, 6))
-
-        # Datos
-        labels = ['Empresa', 'Promedio Regional', 'GCCA Banda A', 'GCCA Banda C']
-        values = [
-            company_data.get('huella_promedio', 0),
-            benchmarks.get('regional', 250),
-            benchmarks.get('gcca_a', 150),
-            benchmarks.get('gcca_c', 300)
-        ]
-        colors_bars = ['#2E86AB', '#A23B72', '#52B788', '#FCA311']
-
-        # Crear barras
-        bars = ax.bar(labels, values, color=colors_bars, alpha=0.8, edgecolor='black')
-
-        # Personalización
-        ax.set_ylabel('Huella CO₂ (kg/m³)', fontsize=12, fontweight='bold')
-        ax.set_title('Comparación de Huella de Carbono', fontsize=14, fontweight='bold')
-        ax.grid(axis='y', alpha=0.3, linestyle='--')
-
-        # Agregar valores sobre barras
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'{height:.1f}',
-                   ha='center', va='bottom', fontweight='bold')
-
-        plt.tight_layout()
-
-        # Guardar en archivo temporal
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-        plt.savefig(temp_file.name, dpi=150, bbox_inches='tight')
-        plt.close()
-
-        return temp_file.name
+        return chart_huella_comparacion(company_data, benchmarks)
 
     def _create_chart_distribucion_resistencias(
         self,
@@ -134,43 +107,9 @@ class BenchmarkingReportPDF:
             resistencias_data: Lista de datos de resistencias
 
         Returns:
-            Ruta al archivo temporal
+            Imagen PNG en memoria
         """
-        fig, ax = plt.subplots(figsize=(10, 6))
-
-        # Extraer datos
-        resistencias = [d['resistencia'] for d in resistencias_data]
-        huellas = [d['huella_promedio'] for d in resistencias_data]
-        volumenes = [d['volumen_total'] for d in resistencias_data]
-
-        # Normalizar volúmenes para tamaño de burbujas
-        max_vol = max(volumenes) if volumenes else 1
-        sizes = [v/max_vol * 1000 for v in volumenes]
-
-        # Scatter plot
-        scatter = ax.scatter(resistencias, huellas, s=sizes, alpha=0.6, 
-                            c=range(len(resistencias)), cmap='viridis', 
-                            edgecolors='black', linewidth=1)
-
-        # Personalización
-        ax.set_xlabel('Resistencia (MPa)', fontsize=12, fontweight='bold')
-        ax.set_ylabel('Huella CO₂ (kg/m³)', fontsize=12, fontweight='bold')
-        ax.set_title('Distribución Resistencia vs Huella (tamaño = volumen)', 
-                     fontsize=14, fontweight='bold')
-        ax.grid(True, alpha=0.3, linestyle='--')
-
-        # Colorbar
-        cbar = plt.colorbar(scatter, ax=ax)
-        cbar.set_label('Productos', rotation=270, labelpad=15)
-
-        plt.tight_layout()
-
-        # Guardar
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-        plt.savefig(temp_file.name, dpi=150, bbox_inches='tight')
-        plt.close()
-
-        return temp_file.name
+        return chart_distribucion_resistencias(resistencias_data)
 
     def generate_company_report(
         self,
@@ -207,6 +146,7 @@ class BenchmarkingReportPDF:
         )
 
         # 3. Obtener distribución de productos
+        where_clause, params = company_filter("compania", compania, año)
         query_productos = f"""
         SELECT
             resistencia,
@@ -214,16 +154,40 @@ class BenchmarkingReportPDF:
             AVG(huella_co2) as huella_promedio,
             SUM(volumen) as volumen_total
         FROM remitos_concretos
-        WHERE LOWER(compania) = LOWER('{compania}')
-        {'AND año = ' + str(año) if año else ''}
+        {where_clause}
         GROUP BY resistencia
         ORDER BY volumen_total DESC
         LIMIT 10
         """
-        result_productos = self.sql_tool.execute_query(query_productos)
+        result_productos = self.sql_tool.execute_query(query_productos, params=params)
         productos_data = result_productos["rows"] if result_productos["success"] else []
 
         # 4. Crear PDF
+        return self.build_report(compania, año, company_data, ai_analysis, productos_data)
+
+    def build_report(
+        self,
+        compania: str,
+        año: Optional[int],
+        company_data: Dict,
+        ai_analysis: Dict,
+        productos_data: List[Dict],
+        charts: Optional[Dict[str, Optional[bytes]]] = None
+    ) -> str:
+        """
+        Construye el PDF a partir de datos ya obtenidos.
+
+        Args:
+            compania: Nombre de la compañía
+            año: Año (opcional)
+            company_data: Fila de get_huella_promedio_compania
+            ai_analysis: Resultado de compare_with_benchmark
+            productos_data: Distribución de productos por resistencia
+            charts: Gráficos ya generados (render_report_charts); None = generarlos aquí
+
+        Returns:
+            Ruta al archivo PDF generado
+        """
         year_str = str(año) if año else "todos_los_años"
         filename = f"benchmarking_{compania}_{year_str}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         filepath = os.path.join(self.output_dir, filename)
@@ -303,19 +267,17 @@ class BenchmarkingReportPDF:
         story.append(Paragraph("3. Visualizaciones", heading_style))
 
         # Gráfico 1: Comparación de huella
-        benchmarks_ref = {
-            'regional': 250,
-            'gcca_a': 150,
-            'gcca_c': 300
-        }
-        chart1_path = self._create_chart_huella_comparacion(company_data, benchmarks_ref)
-        story.append(Image(chart1_path, width=6*inch, height=3.6*inch))
+        if charts is None:
+            charts = {
+                'huella': self._create_chart_huella_comparacion(company_data, BENCHMARKS_REF),
+                'resistencias': self._create_chart_distribucion_resistencias(productos_data) if productos_data else None
+            }
+        story.append(chart_flowable(charts['huella'], width=6*inch, height=3.6*inch))
         story.append(Spacer(1, 0.3*inch))
 
         # Gráfico 2: Distribución de productos
-        if productos_data:
-            chart2_path = self._create_chart_distribucion_resistencias(productos_data)
-            story.append(Image(chart2_path, width=6*inch, height=3.6*inch))
+        if productos_data and charts.get('resistencias'):
+            story.append(chart_flowable(charts['resistencias'], width=6*inch, height=3.6*inch))
             story.append(Spacer(1, 0.3*inch))
 
         # Sección 4: Top Productos
@@ -354,12 +316,6 @@ class BenchmarkingReportPDF:
         # Construir PDF
         doc.build(story)
 
-        # Limpiar archivos temporales
-        if 'chart1_path' in locals():
-            os.unlink(chart1_path)
-        if 'chart2_path' in locals():
-            os.unlink(chart2_path)
-
         print(f"✅ Informe generado: {filepath}")
         return filepath
 
@@ -0,0 +1,11 @@
+"""
+Modulo Sandbox
+Piloto IA - FICEM BD
+
+Componentes:
+- script_pool: Pool de procesos pre-calentados para ejecutar los scripts
+  de análisis generados por el LLM (límites por ejecución + reciclaje)
+- result_cache: Caché de resultados por hash de script + versión de datos
+"""
+
+__version__ = "0.1.0"
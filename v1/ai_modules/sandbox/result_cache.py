@@ -0,0 +1,274 @@
+"""
+Caché de Resultados de Scripts de Análisis
+Piloto IA - FICEM BD
+
+Guarda la salida de los scripts generados (stdout y archivos producidos:
+reportes .md, gráficos, tablas) para que volver a ejecutar un análisis
+sin cambios responda al instante, sin lanzar el script ni consultar la BD.
+
+La clave combina el hash del script normalizado (AST: ignora comentarios
+y formato) y la versión de datos de PostgreSQL. La versión de datos se
+consulta como mucho cada `version_ttl` segundos.
+"""
+
+import os
+import re
+import ast
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+
+# Archivos generados por los scripts que se guardan junto al stdout
+ARTIFACT_PATTERN = re.compile(r"(/tmp/[\w\-./]+\.(?:md|png|jpg|svg|csv|xlsx|html|json))")
+
+# Cambios en cualquier tabla de usuario (inserts/updates/deletes) o reinicio
+PG_DATA_VERSION_QUERY = """
+SELECT
+    COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0) AS cambios,
+    pg_postmaster_start_time() AS inicio
+FROM pg_stat_user_tables
+"""
+
+
+def normalize_script(code: str) -> str:
+    """
+    Forma canónica de un script para usarla como clave.
+
+    Usa el AST, así que comentarios, líneas en blanco y formato no cambian
+    la clave. Si el código no parsea, se normalizan solo los espacios.
+
+    Args:
+        code: Código Python
+
+    Returns:
+        Representación normalizada
+    """
+    try:
+        return ast.dump(ast.parse(code), annotate_fields=False)
+    except SyntaxError:
+        lines = [line.rstrip() for line in code.strip().splitlines()]
+        return "\n".join(line for line in lines if line)
+
+
+def postgres_data_version(engine=None) -> str:
+    """
+    Versión de datos de PostgreSQL a partir de pg_stat_user_tables.
+
+    Args:
+        engine: Engine SQLAlchemy (None = database.models.get_engine())
+
+    Returns:
+        String que cambia cuando cambia cualquier tabla
+    """
+    import pandas as pd
+
+    if engine is None:
+        from database.models import get_engine
+        engine = get_engine()
+
+    row = pd.read_sql_query(PG_DATA_VERSION_QUERY, engine).iloc[0]
+    return f"{int(row['cambios'])}@{row['inicio']}"
+
+
+class ScriptResultCache:
+    """
+    Caché LRU acotada en bytes para resultados de scripts.
+
+    Es thread-safe: una misma instancia se comparte entre sesiones de
+    Streamlit (ver get_result_cache).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entries: int = 128,
+        version_ttl: float = 60,
+        data_version_fn: Optional[Callable[[], str]] = None
+    ):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_bytes: Tamaño máximo (stdout + archivos) antes de expulsar
+            max_entries: Máximo de resultados guardados
+            version_ttl: Segundos que se reutiliza la versión de datos
+            data_version_fn: Función que devuelve la versión de datos
+                (None = postgres_data_version)
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self.data_version_fn = data_version_fn or postgres_data_version
+
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self._version: Optional[str] = None
+        self._version_checked = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def data_version(self) -> Optional[str]:
+        """
+        Versión de datos actual (consulta la BD como mucho cada version_ttl).
+
+        Returns:
+            Versión de datos o None si no se pudo obtener
+        """
+        now = time.monotonic()
+        if self._version is not None and now - self._version_checked < self.version_ttl:
+            return self._version
+
+        try:
+            self._version = self.data_version_fn()
+        except Exception as e:
+            print(f"⚠️  No se pudo obtener la versión de datos: {e}")
+            self._version = None
+        self._version_checked = now
+        return self._version
+
+    def make_key(self, code: str) -> Optional[str]:
+        """
+        Clave de un script: hash del script normalizado + versión de datos.
+
+        Args:
+            code: Código Python
+
+        Returns:
+            Hash SHA-256 o None si no hay versión de datos (no se cachea)
+        """
+        version = self.data_version()
+        if version is None:
+            return None
+        payload = f"{version}\n{normalize_script(code)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, code: str) -> Optional[str]:
+        """
+        Busca el resultado de un script y restaura sus archivos si faltan.
+
+        Args:
+            code: Código Python
+
+        Returns:
+            stdout guardado o None si no está en caché
+        """
+        key = self.make_key(code)
+
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        for path, content in entry["artifacts"].items():
+            file = Path(path)
+            if not file.exists():
+                file.parent.mkdir(parents=True, exist_ok=True)
+                file.write_bytes(content)
+            else:
+                # read_markdown_report usa la fecha de modificación
+                os.utime(file)
+
+        return entry["stdout"]
+
+    def set(self, code: str, stdout: str) -> None:
+        """
+        Guarda el resultado de un script exitoso y los archivos que menciona.
+
+        Args:
+            code: Código Python
+            stdout: Salida del script
+        """
+        key = self.make_key(code)
+        if key is None:
+            return
+
+        artifacts = self._collect_artifacts(stdout)
+        size = len(stdout.encode("utf-8")) + sum(len(c) for c in artifacts.values())
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)["size"]
+
+            self._entries[key] = {
+                "stdout": stdout,
+                "artifacts": artifacts,
+                "size": size,
+                "created": time.time()
+            }
+            self._size += size
+
+            while self._entries and (
+                self._size > self.max_bytes or len(self._entries) > self.max_entries
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted["size"]
+                self.evictions += 1
+
+    @staticmethod
+    def _collect_artifacts(stdout: str) -> Dict[str, bytes]:
+        artifacts = {}
+        for path in ARTIFACT_PATTERN.findall(stdout):
+            path = path.rstrip(".")
+            if path not in artifacts and os.path.isfile(path):
+                artifacts[path] = Path(path).read_bytes()
+        return artifacts
+
+    def clear(self) -> None:
+        """Vacía la caché (las métricas se conservan)."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_stats(self) -> Dict:
+        """
+        Métricas de uso de la caché.
+
+        Returns:
+            Diccionario con entradas, bytes, aciertos y tasa de acierto
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total > 0 else 0.0
+            }
+
+
+_cache: Optional[ScriptResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache(**kwargs) -> ScriptResultCache:
+    """
+    Caché compartida por todo el proceso (se crea en el primer uso).
+
+    Args:
+        **kwargs: Configuración de ScriptResultCache (solo en la primera llamada)
+
+    Returns:
+        Instancia única de ScriptResultCache
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ScriptResultCache(**kwargs)
+        return _cache
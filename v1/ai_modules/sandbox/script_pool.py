@@ -0,0 +1,434 @@
+"""
+Pool de Ejecución de Scripts de Análisis
+Piloto IA - FICEM BD
+
+Ejecuta los scripts generados en `pages/ai/10_generador_analisis.py` en
+procesos worker ya inicializados (pandas, numpy, matplotlib y psycopg2
+importados) en lugar de lanzar un `python3` nuevo por cada ejecución.
+
+- Cada worker mantiene una conexión PostgreSQL de solo lectura que se
+  reutiliza entre scripts (psycopg2.connect devuelve la conexión del pool);
+  tras cada script se hace rollback, y si falla la conexión se descarta
+- Antes de cada script se restaura el estado del worker: directorio de
+  trabajo, sys.path, rcParams de matplotlib y figuras abiertas
+- Límites por ejecución: tiempo (timeout), CPU (RLIMIT_CPU) y memoria
+  (RLIMIT_DATA)
+- Los workers se reciclan tras `max_jobs` ejecuciones o tras un error grave
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import threading
+import traceback
+import contextlib
+import subprocess
+from pathlib import Path
+from multiprocessing.connection import Connection
+from typing import Dict, Optional, Tuple
+
+
+# Módulos que los scripts generados usan casi siempre
+WARM_IMPORTS = ["numpy", "pandas", "matplotlib", "matplotlib.pyplot", "psycopg2"]
+
+
+# ============ LADO DEL WORKER ============
+
+class _PooledConnection:
+    """
+    Conexión psycopg2 compartida entre scripts de un mismo worker.
+
+    close() no cierra: hace rollback para dejarla limpia para el próximo
+    script (el worker además hace rollback al terminar cada script, aunque
+    no se llame a close). El resto de atributos se delegan a la conexión real.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def close(self):
+        if not self._conn.closed:
+            self._conn.rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _install_connection_pool(psycopg2) -> Dict[Tuple, object]:
+    """
+    Reemplaza psycopg2.connect por una versión que reutiliza conexiones.
+
+    Returns:
+        Diccionario de conexiones del pool (ver _reset_connections)
+    """
+    real_connect = psycopg2.connect
+    pooled: Dict[Tuple, object] = {}
+
+    def connect(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        conn = pooled.get(key)
+
+        if conn is None or conn.closed:
+            conn = real_connect(*args, **kwargs)
+            conn.set_session(readonly=True, autocommit=False)
+            pooled[key] = conn
+
+        return _PooledConnection(conn)
+
+    psycopg2.connect = connect
+    return pooled
+
+
+def _reset_connections(pooled: Dict[Tuple, object]) -> None:
+    """
+    Deja las conexiones del pool sin transacción abierta tras un script.
+
+    Un script que falla (transacción abortada) o que no llama a close()
+    ("idle in transaction", con locks) no debe afectar al siguiente. Si el
+    rollback falla, la conexión se cierra y se descarta: el próximo
+    psycopg2.connect abre otra.
+    """
+    for key, conn in list(pooled.items()):
+        if conn.closed:
+            del pooled[key]
+            continue
+        try:
+            conn.rollback()
+        except Exception:
+            with contextlib.suppress(Exception):
+                conn.close()
+            del pooled[key]
+
+
+def _set_limits(limits: Dict) -> None:
+    """Límite de memoria del proceso worker (se aplica una vez)."""
+    try:
+        import resource
+    except ImportError:
+        return
+
+    if limits.get("memory_mb"):
+        max_bytes = int(limits["memory_mb"]) * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_DATA)
+        resource.setrlimit(resource.RLIMIT_DATA, (max_bytes, hard))
+
+
+def _set_cpu_limit(cpu_seconds: Optional[float]) -> None:
+    """Límite de CPU de la próxima ejecución (SIGXCPU al superarlo)."""
+    if not cpu_seconds:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(used + cpu_seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _snapshot_state() -> Dict:
+    """Estado inicial del worker, que se restaura antes de cada script."""
+    state = {"cwd": os.getcwd(), "sys_path": list(sys.path), "rcparams": None}
+
+    matplotlib = sys.modules.get("matplotlib")
+    if matplotlib is not None:
+        state["rcparams"] = dict.copy(matplotlib.rcParams)
+
+    return state
+
+
+def _restore_state(state: Dict) -> None:
+    """
+    Restaura el estado del worker que un script pudo modificar.
+
+    Args:
+        state: Resultado de _snapshot_state
+    """
+    os.chdir(state["cwd"])
+    sys.path[:] = state["sys_path"]
+
+    # Figuras abiertas y rcParams de matplotlib no deben pasar al próximo script
+    plt = sys.modules.get("matplotlib.pyplot")
+    if plt is not None:
+        plt.close("all")
+
+    matplotlib = sys.modules.get("matplotlib")
+    if matplotlib is not None and state["rcparams"] is not None:
+        # dict.update evita la validación (y los avisos de claves obsoletas)
+        dict.update(matplotlib.rcParams, state["rcparams"])
+
+
+def _run_script(code: str) -> Dict:
+    """
+    Ejecuta un script en un namespace limpio capturando stdout/stderr.
+
+    Args:
+        code: Código Python
+
+    Returns:
+        Diccionario con success, stdout, stderr y seconds
+    """
+    stdout, stderr = io.StringIO(), io.StringIO()
+    success = True
+    start = time.perf_counter()
+
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            exec(compile(code, "<analisis>", "exec"), namespace)
+        except SystemExit as e:
+            success = e.code in (None, 0)
+        except MemoryError:
+            success = False
+            stderr.write("El script superó el límite de memoria del sandbox\n")
+        except BaseException:
+            success = False
+            traceback.print_exc(file=stderr)
+
+    return {
+        "success": success,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "seconds": time.perf_counter() - start
+    }
+
+
+def _worker_main(conn, limits: Dict) -> None:
+    """
+    Bucle del proceso worker: importa el stack de análisis una vez y
+    ejecuta scripts hasta recibir None.
+    """
+    for module in WARM_IMPORTS:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+
+    pooled: Dict[Tuple, object] = {}
+    psycopg2 = sys.modules.get("psycopg2")
+    if psycopg2 is not None:
+        pooled = _install_connection_pool(psycopg2)
+
+    _set_limits(limits)
+    state = _snapshot_state()
+
+    while True:
+        try:
+            code = conn.recv()
+        except EOFError:
+            break
+        if code is None:
+            break
+
+        _set_cpu_limit(limits.get("cpu_seconds"))
+        _restore_state(state)
+        try:
+            result = _run_script(code)
+        finally:
+            _reset_connections(pooled)
+        conn.send(result)
+
+
+# ============ LADO DEL PROCESO PRINCIPAL ============
+
+class _Worker:
+    """
+    Proceso worker y su extremo del canal.
+
+    Se lanza con `python -m ai_modules.sandbox.script_pool --worker`: un
+    intérprete limpio que no re-ejecuta el script de Streamlit ni hereda
+    su estado. El canal es un socketpair heredado por descriptor.
+    """
+
+    def __init__(self, limits: Dict):
+        parent_sock, child_sock = socket.socketpair()
+        project_root = str(Path(__file__).resolve().parents[2])
+
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [project_root, env.get("PYTHONPATH")]))
+        env.setdefault("MPLBACKEND", "Agg")
+
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "ai_modules.sandbox.script_pool",
+                "--worker", str(child_sock.fileno()), json.dumps(limits)
+            ],
+            pass_fds=(child_sock.fileno(),),
+            env=env
+        )
+        child_sock.close()
+        self.conn = Connection(parent_sock.detach())
+        self.jobs = 0
+
+    def stop(self, timeout: float = 2.0) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.conn.close()
+
+
+class ScriptPool:
+    """
+    Pool de workers pre-calentados para ejecutar scripts de análisis.
+
+    Es thread-safe: varias sesiones de Streamlit comparten el mismo pool
+    (ver get_script_pool) y esperan si todos los workers están ocupados.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_jobs: int = 20,
+        timeout: float = 60,
+        cpu_seconds: Optional[float] = 60,
+        memory_mb: Optional[int] = 2048
+    ):
+        """
+        Inicializa el pool y arranca los workers.
+
+        Args:
+            size: Número de workers
+            max_jobs: Ejecuciones por worker antes de reciclarlo
+            timeout: Tiempo máximo por script (segundos)
+            cpu_seconds: Tiempo de CPU máximo por script (None = sin límite)
+            memory_mb: Memoria máxima por worker (None = sin límite)
+        """
+        self.size = size
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.limits = {"cpu_seconds": cpu_seconds, "memory_mb": memory_mb}
+
+        self._idle: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.stats = {"jobs": 0, "errors": 0, "timeouts": 0, "recycled": 0}
+
+        for _ in range(size):
+            self._idle.put(_Worker(self.limits))
+
+    def run(self, code: str) -> Tuple[bool, str, str]:
+        """
+        Ejecuta un script en un worker libre.
+
+        Args:
+            code: Código Python (ya limpio y validado)
+
+        Returns:
+            Tupla (success, stdout, stderr), igual que execute_analysis_script
+        """
+        if self._closed:
+            raise RuntimeError("El pool de scripts está cerrado")
+
+        worker = self._idle.get()
+        recycle = False
+
+        try:
+            worker.conn.send(code)
+
+            if not worker.conn.poll(self.timeout):
+                recycle = True
+                self._count("timeouts")
+                return False, "", f"El script tardó demasiado (timeout {self.timeout:.0f}s)"
+
+            result = worker.conn.recv()
+            worker.jobs += 1
+            self._count("jobs")
+
+            if not result["success"]:
+                self._count("errors")
+                recycle = "límite de memoria" in result["stderr"]
+
+            return result["success"], result["stdout"], result["stderr"]
+
+        except (EOFError, OSError, BrokenPipeError):
+            # El worker murió (límite de CPU, crash del intérprete)
+            recycle = True
+            self._count("errors")
+            return False, "", "El script fue detenido por el sandbox (límite de CPU o error fatal)"
+
+        finally:
+            if recycle or worker.jobs >= self.max_jobs:
+                worker = self._replace(worker)
+            self._idle.put(worker)
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        """Detiene un worker y arranca otro (se calienta mientras espera)."""
+        worker.stop(timeout=0.5)
+        self._count("recycled")
+        return _Worker(self.limits)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def close(self) -> None:
+        """Detiene todos los workers."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+_pool: Optional[ScriptPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_script_pool(**kwargs) -> ScriptPool:
+    """
+    Pool compartido por todo el proceso (se crea en el primer uso).
+
+    Args:
+        **kwargs: Configuración de ScriptPool (solo en la primera llamada)
+
+    Returns:
+        Instancia única de ScriptPool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ScriptPool(**kwargs)
+        return _pool
+
+
+# Ejemplo de uso
+if __name__ == "__main__" and sys.argv[1:2] == ["--worker"]:
+    # Proceso worker lanzado por _Worker
+    _worker_main(Connection(int(sys.argv[2])), json.loads(sys.argv[3]))
+
+elif __name__ == "__main__":
+    pool = ScriptPool(size=1, max_jobs=5, timeout=10)
+
+    script = "import pandas as pd\nprint(pd.DataFrame({'a': [1, 2, 3]}).sum().to_dict())"
+    for i in range(3):
+        inicio = time.perf_counter()
+        success, output, error = pool.run(script)
+        print(f"Ejecución {i + 1}: {success} {output.strip()} ({time.perf_counter() - inicio:.3f}s)")
+
+    print(pool.run("while True: pass")[2])
+    print(pool.stats)
+    pool.close()
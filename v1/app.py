@@ -22,6 +22,20 @@ with st.sidebar:
 if 'db_engine' not in st.session_state:
     st.session_state.db_engine = init_db()
 
+# Precargar modelos ML al iniciar la app
+@st.cache_resource
+def precargar_modelos():
+    """Carga los modelos ML activos una vez por proceso (sin carga en frío en las páginas)"""
+    try:
+        from ai_modules.ml.model_registry import get_registry
+        return get_registry().preload()
+    except Exception as e:
+        print(f"⚠️  No se pudieron precargar los modelos ML: {e}")
+        return {}
+
+
+precargar_modelos()
+
 # Para compatibilidad con código migrado de ficem_bd
 if 'ruta_db' not in st.session_state:
     st.session_state.ruta_db = 'data/latam4c.db'  # Path simbólico para SQLite nativo
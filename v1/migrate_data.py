@@ -2,6 +2,7 @@
 Script para migrar datos desde SQLite de ficem_bd a PostgreSQL de latam4c
 """
 import sqlite3
+from pathlib import Path
 import pandas as pd
 from database import get_engine
 from sqlalchemy import text
@@ -18,6 +19,9 @@ TABLAS = [
 # Path a BD SQLite origen
 SQLITE_DB = '/home/cpinilla/databases/ficem_bd/data/ficem_bd.db'
 
+# Índices que to_sql(if_exists='replace') elimina al recrear las tablas
+INDICES_SQL = Path(__file__).parent / 'sql' / 'create_indices_compania.sql'
+
 def migrar_tabla(nombre_tabla, conn_sqlite, engine_pg):
     """Migra una tabla desde SQLite a PostgreSQL"""
     print(f"\n📦 Migrando tabla: {nombre_tabla}")
@@ -36,6 +40,17 @@ def migrar_tabla(nombre_tabla, conn_sqlite, engine_pg):
         print(f"  ✗ Error: {e}")
         return False
 
+def crear_indices(engine_pg):
+    """Recrea los índices por compañía sobre las tablas migradas"""
+    print(f"\n🗂️  Creando índices: {INDICES_SQL.name}")
+
+    try:
+        with engine_pg.begin() as conn:
+            conn.exec_driver_sql(INDICES_SQL.read_text(encoding='utf-8'))
+        print("  ✓ Índices creados")
+    except Exception as e:
+        print(f"  ✗ Error: {e}")
+
 def main():
     print("=" * 60)
     print("MIGRACIÓN DE DATOS: ficem_bd (SQLite) → latam4c (PostgreSQL)")
@@ -57,6 +72,8 @@ def main():
         if migrar_tabla(tabla, conn_sqlite, engine_pg):
             exitos += 1
 
+    crear_indices(engine_pg)
+
     # Cerrar conexiones
     conn_sqlite.close()
     engine_pg.dispose()
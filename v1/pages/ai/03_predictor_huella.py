@@ -8,25 +8,33 @@ import sys
 from pathlib import Path
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
 
 # Agregar path para imports
 sys.path.insert(0, str(Path.cwd()))
 
-from ai_modules.ml.predictor import HuellaPredictor
+from ai_modules.ml.model_registry import get_registry
+from ai_modules.ml.predictor import nombre_compania
+from ai_modules.ml.scenarios import ScenarioEngine, PARAMETER_LABELS
+
+
+@st.cache_resource
+def get_scenario_engine(version: str):
+    """Motor de escenarios por versión de modelo (la caché de grillas se comparte entre sesiones)"""
+    return ScenarioEngine(get_registry().get("huella_predictor"))
+
 
 def app():
     st.title("🎯 Predictor de Huella CO₂")
     st.markdown("### Prediccion basada en Machine Learning")
 
-    # Cargar modelo
-    @st.cache_resource
-    def load_model():
-        MODEL_PATH = "ai_modules/ml/saved_models/huella_predictor.pkl"
-        return HuellaPredictor(MODEL_PATH)
+    # Cargar modelo (caché del registro compartida por todo el proceso)
+    registry = get_registry()
 
     try:
-        predictor = load_model()
-        st.success(f"✅ Modelo cargado - R² = {predictor.stats.get('r2', 0):.3f}, RMSE = {predictor.stats.get('rmse', 0):.1f} kg CO₂/m³")
+        predictor = registry.get("huella_predictor")
+        version = registry.current_version("huella_predictor") or "legacy"
+        st.success(f"✅ Modelo {version} cargado - R² = {predictor.stats.get('r2', 0):.3f}, RMSE = {predictor.stats.get('rmse', 0):.1f} kg CO₂/m³")
     except Exception as e:
         st.error(f"❌ Error cargando modelo: {e}")
         st.info("Asegurate de haber entrenado el modelo primero ejecutando: `python ai_modules/ml/predictor.py`")
@@ -97,9 +105,13 @@ def app():
     with st.sidebar:
         st.header("⚙️ Parametros de Prediccion")
 
+        # Compañías conocidas por el modelo (códigos de origen, con su nombre)
+        companias_modelo = predictor.companias() or ["mzma"]
+
         compania = st.selectbox(
             "Compania",
-            options=["MZMA", "CEMEX"],
+            options=companias_modelo,
+            format_func=nombre_compania,
             help="Selecciona la compania"
         )
 
@@ -182,7 +194,11 @@ def app():
         }
 
         with st.spinner("Calculando prediccion..."):
-            resultado = predictor.predict(features)
+            try:
+                resultado = predictor.predict(features)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+                st.stop()
 
         # Mostrar resultado
         st.success("✅ Prediccion completada")
@@ -340,6 +356,108 @@ def app():
             - {predictor.stats.get('n_test', 0):,} remitos de prueba
             """)
 
+    # ESCENARIOS WHAT-IF
+    st.divider()
+    st.header("🧪 Escenarios What-If")
+    st.markdown("Evalúa miles de combinaciones en un solo lote para explorar palancas de descarbonización. "
+                "Año y A3 se toman de la barra lateral.")
+
+    with st.form("form_escenarios"):
+        col1, col2 = st.columns(2)
+
+        with col1:
+            companias_esc = st.multiselect("Compañías", options=companias_modelo, default=[compania],
+                                           format_func=nombre_compania)
+            rango_resistencia = st.slider("Resistencia (MPa)", 10.0, 50.0, (20.0, 40.0), step=1.0)
+            rango_cemento = st.slider("Contenido de Cemento (kg/m³)", 200.0, 500.0, (250.0, 450.0), step=10.0)
+            rango_a1 = st.slider("A1 - Extraccion de materias primas", 0.0, 500.0, (180.0, 300.0), step=5.0)
+
+        with col2:
+            rango_a2 = st.slider("A2 - Transporte a planta", 0.0, 50.0, (2.0, 30.0), step=0.5)
+            rango_a4 = st.slider("A4 - Transporte a obra", 0.0, 50.0, (5.0, 25.0), step=0.5)
+            puntos = st.slider("Puntos por parámetro", min_value=3, max_value=10, value=6,
+                               help="Valores equiespaciados en cada rango")
+
+        evaluar = st.form_submit_button("🧪 Evaluar Escenarios", use_container_width=True)
+
+    if evaluar:
+        st.session_state.grilla_escenarios = {
+            'compania': companias_esc or [compania],
+            'año': año,
+            'resistencia': np.linspace(*rango_resistencia, puntos),
+            'contenido_cemento': np.linspace(*rango_cemento, puntos),
+            'a1_intensidad': np.linspace(*rango_a1, puntos),
+            'a2_intensidad': np.linspace(*rango_a2, puntos),
+            'a3_intensidad': a3_intensidad,
+            'a4_intensidad': np.linspace(*rango_a4, puntos)
+        }
+
+    if st.session_state.get('grilla_escenarios'):
+        engine = get_scenario_engine(get_registry().current_version("huella_predictor") or "legacy")
+
+        try:
+            resultados, stats = engine.evaluate(st.session_state.grilla_escenarios)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            st.stop()
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Escenarios evaluados", f"{stats['rows']:,}")
+        col2.metric("Tiempo", "caché" if stats['cached'] else f"{stats['seconds']:.2f}s")
+        col3.metric("Huella mínima", f"{resultados['prediccion'].min():.1f} kg CO₂/m³")
+
+        # Superficie de respuesta (curva si solo varía un parámetro)
+        variables = [p for p in PARAMETER_LABELS if p in resultados and resultados[p].nunique() > 1]
+
+        if not variables:
+            st.info("ℹ️ Ningún parámetro varía en la grilla: amplía algún rango para ver la respuesta.")
+        elif len(variables) == 1:
+            eje_x = variables[0]
+            curva = engine.response_surface(resultados, eje_x)
+            fig_curva = go.Figure(go.Scatter(
+                x=curva.index,
+                y=curva.values,
+                mode='lines+markers',
+                line=dict(color='#2E86AB', width=3)
+            ))
+            fig_curva.update_layout(
+                title="Curva de Respuesta (promedio sobre el resto de parámetros)",
+                xaxis_title=PARAMETER_LABELS[eje_x],
+                yaxis_title="Huella CO₂ (kg/m³)",
+                height=450
+            )
+            st.plotly_chart(fig_curva, use_container_width=True)
+        else:
+            col1, col2 = st.columns(2)
+            eje_x = col1.selectbox("Eje X", variables, index=variables.index('contenido_cemento')
+                                   if 'contenido_cemento' in variables else 0,
+                                   format_func=PARAMETER_LABELS.get)
+            eje_y = col2.selectbox("Eje Y", [v for v in variables if v != eje_x],
+                                   format_func=PARAMETER_LABELS.get)
+
+            superficie = engine.response_surface(resultados, eje_x, eje_y)
+            fig_superficie = go.Figure(go.Heatmap(
+                z=superficie.values,
+                x=[str(round(v, 1)) if isinstance(v, float) else v for v in superficie.columns],
+                y=[str(round(v, 1)) if isinstance(v, float) else v for v in superficie.index],
+                colorscale='RdYlGn_r',
+                colorbar=dict(title="kg CO₂/m³")
+            ))
+            fig_superficie.update_layout(
+                title="Superficie de Respuesta (promedio sobre el resto de parámetros)",
+                xaxis_title=PARAMETER_LABELS[eje_x],
+                yaxis_title=PARAMETER_LABELS[eje_y],
+                height=450
+            )
+            st.plotly_chart(fig_superficie, use_container_width=True)
+
+        # Sensibilidad
+        st.subheader("📐 Sensibilidad por Parámetro")
+        st.dataframe(engine.sensitivity(resultados), use_container_width=True, hide_index=True)
+
+        with st.expander("🏆 Escenarios con menor huella"):
+            st.dataframe(resultados.nsmallest(10, 'prediccion').round(2), use_container_width=True, hide_index=True)
+
     # Footer
     st.divider()
     st.caption("🎯 Predictor de Huella - Piloto IA FICEM BD | Powered by Gradient Boosting")
@@ -4,10 +4,40 @@ Piloto IA - FICEM BD
 """
 
 import streamlit as st
+import sys
 from PIL import Image
 from pathlib import Path
 import pandas as pd
 
+# Agregar path para imports
+sys.path.insert(0, str(Path.cwd()))
+
+from database.connection import get_connection
+
+
+@st.cache_data(ttl=300)
+def get_resumen_anomalias():
+    """Resumen de anomalías precalculadas (ai_modules/ml/anomaly_scoring.py)"""
+    engine = get_connection()
+    resumen = pd.read_sql_query("""
+        SELECT
+            COUNT(*) AS remitos,
+            SUM(CASE WHEN a.is_anomaly THEN 1 ELSE 0 END) AS anomalias,
+            MAX(a.fecha_scoring) AS ultimo_scoring
+        FROM remitos_anomalias a
+    """, engine)
+    top = pd.read_sql_query("""
+        SELECT r.origen, r.planta, r.resistencia_mpa, r.co2_kg_m3,
+               a.anomaly_score, a.anomaly_reason
+        FROM remitos_anomalias a
+        JOIN remitos r ON r.id = a.remito_id
+        WHERE a.is_anomaly
+        ORDER BY a.anomaly_score DESC
+        LIMIT 20
+    """, engine)
+    return resumen, top
+
+
 def app():
     st.title("🤖 Modelos de Machine Learning")
     st.markdown("### Predictor de Huella de Carbono")
@@ -60,6 +90,26 @@ def app():
             st.warning(f"⚠️ Gráfico no encontrado: {img_file}")
         st.divider()
 
+    # ANOMALÍAS PRECALCULADAS
+    st.header("🚨 Anomalías en Remitos")
+    try:
+        resumen, top = get_resumen_anomalias()
+        fila = resumen.iloc[0]
+        remitos = int(fila['remitos'] or 0)
+        anomalias = int(fila['anomalias'] or 0)
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Remitos puntuados", f"{remitos:,}")
+        col2.metric("Anomalías", f"{anomalias:,}")
+        col3.metric("Tasa", f"{anomalias / remitos * 100:.2f}%" if remitos else "-")
+
+        st.caption(f"Último scoring: {fila['ultimo_scoring']}")
+        st.dataframe(top, use_container_width=True, hide_index=True)
+    except Exception as e:
+        st.info(f"Sin anomalías precalculadas. Ejecutar `python -m ai_modules.ml.anomaly_scoring` ({e})")
+
+    st.divider()
+
     # FEATURE IMPORTANCE
     st.header("🔍 Feature Importance")
     st.markdown("""
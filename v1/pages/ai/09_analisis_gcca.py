@@ -152,9 +152,8 @@ def app():
 
             st.divider()
 
-        with st.spinner("Consultando documento GCCA GNR y analizando..."):
-            # Construir contexto de datos
-            contexto_datos = f"""
+        # Construir contexto de datos
+        contexto_datos = f"""
 Datos reales de {compania_seleccionada} en {año_seleccionado}:
 - Número de entregas/remitos: {num_remitos:,}
 - Huella de carbono promedio: {huella_promedio:.2f} kg CO₂/m³
@@ -169,13 +168,10 @@ IMPORTANTE: Busca información específica del documento '20200702 GCCA GNR Conc
 5. Comparación con estándares internacionales
 """
 
-            # Consulta dirigida al RAG
-            pregunta = f"""
-Basándote EXCLUSIVAMENTE en el documento '20200702 GCCA GNR Concrete Pilot Project', analiza los siguientes datos reales de {compania_seleccionada}:
-
-- Huella de carbono promedio: {huella_promedio:.2f} kg CO₂/m³
-- Resistencia promedio: {resistencia_promedio:.1f} MPa
-- Volumen anual: {volumen_total:,.0f} m³
+        # Consulta dirigida al RAG: la pregunta no lleva cifras de la compañía
+        # (van en el contexto), así la caché no confunde compañías
+        pregunta = """
+Basándote EXCLUSIVAMENTE en el documento '20200702 GCCA GNR Concrete Pilot Project', analiza los datos reales de la compañía indicados en el contexto.
 
 Por favor proporciona:
 
@@ -188,29 +184,45 @@ Por favor proporciona:
 FUNDAMENTAL: Cita SOLO información del documento GCCA GNR Concrete Pilot Project. Si algo no está en ese documento específico, indícalo claramente.
 """
 
-            # Ejecutar consulta RAG
-            try:
-                result_rag = rag.query(pregunta)
-
-                st.subheader("🎯 Análisis con Métricas GCCA GNR")
-
-                # Mostrar respuesta
-                st.markdown(result_rag["answer"])
-
-                # Mostrar fuentes consultadas
-                if result_rag.get("sources"):
-                    with st.expander(f"📚 Fuentes consultadas ({len(result_rag['sources'])})"):
-                        for i, source in enumerate(result_rag["sources"], 1):
-                            st.markdown(f"""
-                            **{i}. {source['source']}**
-                            - Tipo: {source['document_type']}
-                            - Chunk: {source['chunk_id']}
-                            - Preview: {source['text_preview'][:200]}...
-                            """)
-
-            except Exception as e:
-                st.error(f"❌ Error durante el análisis: {e}")
-                st.info("Verifica que el sistema RAG esté funcionando correctamente")
+        # Ejecutar consulta RAG en streaming (fuentes primero, luego tokens)
+        try:
+            st.subheader("🎯 Análisis con Métricas GCCA GNR")
+
+            result_rag = {}
+
+            def tokens_respuesta():
+                for evento in rag.stream_with_context(pregunta, contexto_datos):
+                    if evento["type"] == "sources":
+                        st.caption(f"📚 {len(evento['sources'])} fuentes recuperadas "
+                                   f"({evento['retrieval_ms']:.0f} ms)")
+                    elif evento["type"] == "token":
+                        yield evento["text"]
+                    else:
+                        result_rag.update(evento)
+
+            # Mostrar respuesta a medida que se genera
+            st.write_stream(tokens_respuesta())
+
+            if result_rag.get("cached"):
+                st.caption(f"⚡ Respuesta desde caché ({result_rag.get('latency_ms', 0):.0f} ms, sin consumo de LLM)")
+            elif result_rag.get("ttft_ms") is not None:
+                st.caption(f"⏱️ Primer token: {result_rag['ttft_ms'] / 1000:.1f} s · "
+                           f"total: {result_rag['latency_ms'] / 1000:.1f} s")
+
+            # Mostrar fuentes consultadas
+            if result_rag.get("sources"):
+                with st.expander(f"📚 Fuentes consultadas ({len(result_rag['sources'])})"):
+                    for i, source in enumerate(result_rag["sources"], 1):
+                        st.markdown(f"""
+                        **{i}. {source['source']}**
+                        - Tipo: {source['document_type']}
+                        - Chunk: {source['chunk_id']}
+                        - Preview: {source['text_preview'][:200]}...
+                        """)
+
+        except Exception as e:
+            st.error(f"❌ Error durante el análisis: {e}")
+            st.info("Verifica que el sistema RAG esté funcionando correctamente")
 
     # Información adicional en sidebar
     with st.sidebar:
@@ -235,6 +247,17 @@ FUNDAMENTAL: Cita SOLO información del documento GCCA GNR Concrete Pilot Projec
         - Volumen producido (m³)
         """)
 
+        cache_stats = rag.get_cache_stats()
+        if cache_stats:
+            st.divider()
+            st.markdown("**Caché de respuestas:**")
+            st.caption(
+                f"{cache_stats['entries']} respuestas · "
+                f"tasa de acierto {cache_stats['hit_rate']*100:.0f}% "
+                f"({cache_stats['hits'] + cache_stats['semantic_hits']}/"
+                f"{cache_stats['hits'] + cache_stats['semantic_hits'] + cache_stats['misses']})"
+            )
+
     # Footer
     st.divider()
     provider_name = "Claude API" if use_claude else "Ollama"
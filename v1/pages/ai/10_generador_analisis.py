@@ -6,8 +6,10 @@ Crea scripts de análisis bajo demanda basado en peticiones del usuario
 import streamlit as st
 import os
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import Iterator
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
@@ -18,6 +20,8 @@ sys.path.insert(0, '/home/cpinilla/projects/latam-3c/v1')
 
 from ai_modules.rag.rag_chain import RAGChain
 from ai_modules.rag.sql_tool import SQLTool
+from ai_modules.sandbox.script_pool import get_script_pool
+from ai_modules.sandbox.result_cache import get_result_cache
 
 # ============ CONFIGURACIÓN DE PÁGINA ============
 st.set_page_config(
@@ -69,14 +73,11 @@ st.markdown("""
 
 # ============ FUNCIONES PRINCIPALES ============
 
-def generate_analysis_script(peticion: str, rag_chain=None) -> str:
+def build_script_prompt(peticion: str) -> str:
     """
-    Genera un script Python de análisis.
-    Intenta primero con RAGChain, fallback a Claude API directo.
+    Construye el prompt para generar el script de análisis.
     """
-    import anthropic
-
-    prompt = f"""Eres un especialista en análisis de datos de huella de carbono en la industria del cemento.
+    return f"""Eres un especialista en análisis de datos de huella de carbono en la industria del cemento.
 
 Genera un SCRIPT PYTHON que realice el análisis solicitado.
 
@@ -199,6 +200,16 @@ conn.close()
 Genera el script siguiendo estas pautas de sintaxis.
 """
 
+
+def generate_analysis_script(peticion: str, rag_chain=None) -> str:
+    """
+    Genera un script Python de análisis.
+    Intenta primero con RAGChain, fallback a Claude API directo.
+    """
+    import anthropic
+
+    prompt = build_script_prompt(peticion)
+
     # Intento 1: Usar RAGChain si está disponible
     if rag_chain:
         try:
@@ -241,17 +252,47 @@ Genera el script siguiendo estas pautas de sintaxis.
         return None
 
 
+def stream_analysis_script(peticion: str, metricas: dict) -> Iterator[str]:
+    """
+    Genera el script en streaming con la API de Claude.
+    Entrega el texto a medida que llega y registra en `metricas` el tiempo
+    al primer token (ttft_ms) y el tiempo total (total_ms).
+    """
+    import anthropic
+
+    api_key = os.getenv('ANTHROPIC_API_KEY')
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY no encontrada en variables de entorno")
+
+    client = anthropic.Anthropic(api_key=api_key)
+    inicio = time.perf_counter()
+
+    with client.messages.stream(
+        model="claude-sonnet-4-20250514",  # Modelo Sonnet 4
+        max_tokens=8192,
+        messages=[
+            {"role": "user", "content": build_script_prompt(peticion)}
+        ]
+    ) as stream:
+        for texto in stream.text_stream:
+            if 'ttft_ms' not in metricas:
+                metricas['ttft_ms'] = (time.perf_counter() - inicio) * 1000
+            yield texto
+
+    metricas['total_ms'] = (time.perf_counter() - inicio) * 1000
+
+
 def execute_analysis_script(script_code: str) -> tuple[bool, str, str]:
     """
     Ejecuta el script Python generado y retorna:
     - success: bool
     - output: stdout del script
     - error: stderr si hay error
-    """
-    import subprocess
-    import tempfile
-    import re
 
+    Se ejecuta en un worker pre-calentado del pool de sandbox (stack de
+    análisis ya importado y conexión a la BD reutilizada). Si el script y
+    los datos no cambiaron, se devuelve el resultado guardado.
+    """
     try:
         # Limpiar código: remover backticks de markdown si existen
         cleaned_code = script_code.strip()
@@ -273,29 +314,19 @@ def execute_analysis_script(script_code: str) -> tuple[bool, str, str]:
         except SyntaxError as e:
             return False, "", f"Error de sintaxis en el código generado:\nLínea {e.lineno}: {e.msg}\n{e.text or ''}"
 
-        # Guardar script en archivo temporal
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write(cleaned_code)
-            temp_script = f.name
-
-        # Ejecutar script
-        result = subprocess.run(
-            ['python3', temp_script],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
+        # Mismo script y mismos datos: resultado guardado, sin ejecutar nada
+        cache = get_result_cache()
+        cached_output = cache.get(cleaned_code)
+        if cached_output is not None:
+            st.caption("⚡ Resultado desde caché (script y datos sin cambios)")
+            return True, cached_output, ""
 
-        # Limpiar archivo temporal
-        os.unlink(temp_script)
-
-        if result.returncode == 0:
-            return True, result.stdout, ""
-        else:
-            return False, result.stdout, result.stderr
+        # Ejecutar en el pool (timeout 60s, límites de CPU/memoria por ejecución)
+        success, output, error = get_script_pool(timeout=60).run(cleaned_code)
+        if success:
+            cache.set(cleaned_code, output)
+        return success, output, error
 
-    except subprocess.TimeoutExpired:
-        return False, "", "El script tardó demasiado (timeout 60s)"
     except Exception as e:
         return False, "", str(e)
 
@@ -466,6 +497,9 @@ def app():
     if 'peticion_original' not in st.session_state:
         st.session_state.peticion_original = None
 
+    # Arrancar el pool de ejecución: los workers se calientan mientras se genera el script
+    get_script_pool(timeout=60)
+
     col1, col2 = st.columns([3, 1])
     with col1:
         st.markdown('<div class="main-header">🤖 Generador de Análisis Inteligente</div>',
@@ -616,26 +650,47 @@ def app():
     # ============ PROCESAMIENTO GENERACIÓN NUEVA ============
     if generar and peticion.strip():
 
-        # Inicializar RAGChain
-        with st.spinner("⏳ Inicializando..."):
-            try:
-                rag_chain = RAGChain()
-            except Exception as e:
-                st.error(f"❌ Error al inicializar: {str(e)}")
-                return
-
         # Paso 1: Generar script
         st.markdown('<div class="section-header">📋 Paso 1: Generando Script</div>',
                    unsafe_allow_html=True)
 
-        with st.spinner("🤖 Generando script Python..."):
-            script_code = generate_analysis_script(peticion, rag_chain)
+        # Streaming: el script se muestra a medida que se genera
+        metricas = {}
+        vista_previa = st.empty()
+        try:
+            partes = []
+            ultima_actualizacion = 0.0
+            for texto in stream_analysis_script(peticion, metricas):
+                partes.append(texto)
+                # Limitar redibujos del bloque de código (~7 por segundo)
+                if time.perf_counter() - ultima_actualizacion > 0.15:
+                    vista_previa.code(''.join(partes), language="python")
+                    ultima_actualizacion = time.perf_counter()
+            script_code = ''.join(partes)
+            vista_previa.empty()
+        except Exception as e:
+            vista_previa.empty()
+            print(f"⚠️ Streaming no disponible: {e}")
+
+            # Fallback sin streaming
+            with st.spinner("⏳ Inicializando..."):
+                try:
+                    rag_chain = RAGChain()
+                except Exception as e:
+                    st.error(f"❌ Error al inicializar: {str(e)}")
+                    return
+
+            with st.spinner("🤖 Generando script Python..."):
+                script_code = generate_analysis_script(peticion, rag_chain)
 
-            if not script_code:
-                st.error("❌ Error al generar el script. Intenta de nuevo.")
-                return
+        if not script_code:
+            st.error("❌ Error al generar el script. Intenta de nuevo.")
+            return
 
         st.success("✅ Script generado exitosamente")
+        if 'ttft_ms' in metricas:
+            st.caption(f"⏱️ Primer token: {metricas['ttft_ms'] / 1000:.1f} s · "
+                       f"total: {metricas.get('total_ms', 0) / 1000:.1f} s")
 
         # Guardar en historial
         from datetime import datetime
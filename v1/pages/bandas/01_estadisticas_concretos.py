@@ -7,22 +7,19 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import seaborn as sns
 from scipy import stats
-from io import BytesIO
 from database.connection import get_connection
+from services.snapshots import leer_tabla
+from services.reporte_excel import ReporteExcel
 
 def generar_excel_estadisticas(df_stats, df_por_resistencia, df_por_origen):
     """
     Genera un archivo Excel con estadísticas completas
     """
-    output = BytesIO()
-
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df_stats.to_excel(writer, sheet_name='Estadísticas Generales', index=True)
-        df_por_resistencia.to_excel(writer, sheet_name='Por Resistencia', index=False)
-        df_por_origen.to_excel(writer, sheet_name='Por Origen', index=False)
-
-    output.seek(0)
-    return output
+    reporte = ReporteExcel()
+    reporte.hoja_tabla('Estadísticas Generales', df_stats, index=True)
+    reporte.hoja_tabla('Por Resistencia', df_por_resistencia)
+    reporte.hoja_tabla('Por Origen', df_por_origen)
+    return reporte.cerrar()
 
 def app():
     # Obtener conexión de session_state
@@ -30,7 +27,7 @@ def app():
     conn = get_connection(ruta_db)
 
     # Cargar datos desde la base de datos
-    df = pd.read_sql_query("SELECT * FROM huella_concretos", conn)
+    df = leer_tabla('huella_concretos', engine=conn)
 
     # Verificar que hay datos
     if df.empty:
@@ -7,10 +7,10 @@ import numpy as np
 from matplotlib.colors import LinearSegmentedColormap, Normalize
 from matplotlib.cm import ScalarMappable
 from database.connection import get_connection
+from services.snapshots import leer_tabla
 import plotly.graph_objects as go
 import plotly.express as px
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from services.reporte_excel import ReporteExcel, ESTILO_ENCABEZADO, excel_desde_hojas
 from io import BytesIO
 
 def cargar_bandas(json_path):
@@ -30,52 +30,7 @@ def generar_excel_analisis(df_csv, bandas):
     """
     resistencias_estandar = [20, 25, 30, 35, 40, 45, 50]
 
-    # Crear workbook
-    wb = Workbook()
-    wb.remove(wb.active)  # Remover hoja por defecto
-
-    # Estilos
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True)
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-
-    # HOJA 1: Índice con comparativa
-    ws_indice = wb.create_sheet("Índice")
-
-    # Título
-    ws_indice['A1'] = "Análisis Comparativo de Opciones de Filtrado"
-    ws_indice['A1'].font = Font(size=14, bold=True)
-
-    # Definiciones
-    ws_indice['A3'] = "Definiciones:"
-    ws_indice['A3'].font = Font(bold=True)
-
-    ws_indice['A4'] = "1. Todas las Resistencias"
-    ws_indice['B4'] = "Incluye todos los valores de resistencia sin filtrado"
-
-    ws_indice['A5'] = "2. Solo Exactos"
-    ws_indice['B5'] = f"Solo resistencias exactas: {', '.join(map(str, resistencias_estandar))} MPa"
-
-    ws_indice['A6'] = "3. Rangos ±2 MPa"
-    ws_indice['B6'] = "Agrupa resistencias en rangos de ±2 MPa alrededor de valores estándar"
-
-    # Calcular estadísticas para cada opción
-    ws_indice['A8'] = "Comparativa de Métricas"
-    ws_indice['A8'].font = Font(bold=True, size=12)
-
-    # Encabezados
-    headers = ['Métrica', 'Todas', 'Solo Exactos', 'Rangos ±2']
-    for col, header in enumerate(headers, start=1):
-        cell = ws_indice.cell(row=9, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center')
+    reporte = ReporteExcel()
 
     # Calcular métricas
     # Opción 1: Todas
@@ -104,6 +59,22 @@ def generar_excel_analisis(df_csv, bandas):
     huella_prom_rangos = df_rangos['huella_co2'].mean() if not df_rangos.empty else 0
     volumen_rangos = df_rangos['volumen'].sum() if 'volumen' in df_rangos.columns and not df_rangos.empty else 0
 
+    # HOJA 1: Índice con comparativa
+    ws_indice = reporte.agregar_hoja("Índice")
+    ws_indice.set_column(0, 0, 30)
+    ws_indice.set_column(1, 3, 15)
+
+    ws_indice.write(0, 0, "Análisis Comparativo de Opciones de Filtrado", reporte.formato(bold=True, font_size=14))
+    ws_indice.write(2, 0, "Definiciones:", reporte.formato(bold=True))
+    ws_indice.write_row(3, 0, ["1. Todas las Resistencias", "Incluye todos los valores de resistencia sin filtrado"])
+    ws_indice.write_row(4, 0, ["2. Solo Exactos", f"Solo resistencias exactas: {', '.join(map(str, resistencias_estandar))} MPa"])
+    ws_indice.write_row(5, 0, ["3. Rangos ±2 MPa", "Agrupa resistencias en rangos de ±2 MPa alrededor de valores estándar"])
+    ws_indice.write(7, 0, "Comparativa de Métricas", reporte.formato(bold=True, font_size=12))
+
+    # Encabezados
+    headers = ['Métrica', 'Todas', 'Solo Exactos', 'Rangos ±2']
+    ws_indice.write_row(8, 0, headers, reporte.formato(**ESTILO_ENCABEZADO))
+
     # Escribir métricas
     metricas = [
         ['Huella CO₂ Mínima (kg/m³)', huella_min_todas, huella_min_exactos, huella_min_rangos],
@@ -112,101 +83,29 @@ def generar_excel_analisis(df_csv, bandas):
         ['Volumen Total (m³)', volumen_todas, volumen_exactos, volumen_rangos]
     ]
 
-    for row_idx, metrica_data in enumerate(metricas, start=10):
-        for col_idx, valor in enumerate(metrica_data, start=1):
-            cell = ws_indice.cell(row=row_idx, column=col_idx, value=valor)
-            cell.border = border
-            if col_idx > 1:
-                cell.number_format = '0.00' if row_idx <= 12 else '0'
-            cell.alignment = Alignment(horizontal='center')
-
-    # Ajustar anchos
-    ws_indice.column_dimensions['A'].width = 30
-    ws_indice.column_dimensions['B'].width = 15
-    ws_indice.column_dimensions['C'].width = 15
-    ws_indice.column_dimensions['D'].width = 15
-
-    # HOJA 2: Todas las resistencias
-    ws_todas = wb.create_sheet("Todas las Resistencias")
-    ws_todas['A1'] = "Resistencia (MPa)"
-    ws_todas['B1'] = "Huella CO₂ (kg/m³)"
-    ws_todas['C1'] = "Volumen (m³)"
-
-    for col in ['A1', 'B1', 'C1']:
-        ws_todas[col].fill = header_fill
-        ws_todas[col].font = header_font
-        ws_todas[col].border = border
-        ws_todas[col].alignment = Alignment(horizontal='center')
-
-    df_todas_sorted = df_todas.sort_values('REST')
-    for row_idx, (_, row) in enumerate(df_todas_sorted.iterrows(), start=2):
-        ws_todas.cell(row=row_idx, column=1, value=row['REST']).border = border
-        ws_todas.cell(row=row_idx, column=2, value=row['huella_co2']).border = border
-        ws_todas.cell(row=row_idx, column=2).number_format = '0.00'
-        if 'volumen' in row:
-            ws_todas.cell(row=row_idx, column=3, value=row['volumen']).border = border
-            ws_todas.cell(row=row_idx, column=3).number_format = '0'
-
-    ws_todas.column_dimensions['A'].width = 20
-    ws_todas.column_dimensions['B'].width = 20
-    ws_todas.column_dimensions['C'].width = 15
-
-    # HOJA 3: Solo exactos
-    ws_exactos = wb.create_sheet("Solo Exactos")
-    ws_exactos['A1'] = "Resistencia (MPa)"
-    ws_exactos['B1'] = "Huella CO₂ (kg/m³)"
-    ws_exactos['C1'] = "Volumen (m³)"
-
-    for col in ['A1', 'B1', 'C1']:
-        ws_exactos[col].fill = header_fill
-        ws_exactos[col].font = header_font
-        ws_exactos[col].border = border
-        ws_exactos[col].alignment = Alignment(horizontal='center')
-
-    df_exactos_sorted = df_exactos.sort_values('REST') if not df_exactos.empty else pd.DataFrame()
-    for row_idx, (_, row) in enumerate(df_exactos_sorted.iterrows(), start=2):
-        ws_exactos.cell(row=row_idx, column=1, value=row['REST']).border = border
-        ws_exactos.cell(row=row_idx, column=2, value=row['huella_co2']).border = border
-        ws_exactos.cell(row=row_idx, column=2).number_format = '0.00'
-        if 'volumen' in row:
-            ws_exactos.cell(row=row_idx, column=3, value=row['volumen']).border = border
-            ws_exactos.cell(row=row_idx, column=3).number_format = '0'
-
-    ws_exactos.column_dimensions['A'].width = 20
-    ws_exactos.column_dimensions['B'].width = 20
-    ws_exactos.column_dimensions['C'].width = 15
-
-    # HOJA 4: Rangos ±2 MPa
-    ws_rangos = wb.create_sheet("Rangos ±2 MPa")
-    ws_rangos['A1'] = "Resistencia (MPa)"
-    ws_rangos['B1'] = "Huella CO₂ (kg/m³)"
-    ws_rangos['C1'] = "Volumen (m³)"
-
-    for col in ['A1', 'B1', 'C1']:
-        ws_rangos[col].fill = header_fill
-        ws_rangos[col].font = header_font
-        ws_rangos[col].border = border
-        ws_rangos[col].alignment = Alignment(horizontal='center')
-
-    df_rangos_sorted = df_rangos.sort_values('REST') if not df_rangos.empty else pd.DataFrame()
-    for row_idx, (_, row) in enumerate(df_rangos_sorted.iterrows(), start=2):
-        ws_rangos.cell(row=row_idx, column=1, value=row['REST']).border = border
-        ws_rangos.cell(row=row_idx, column=2, value=row['huella_co2']).border = border
-        ws_rangos.cell(row=row_idx, column=2).number_format = '0.00'
-        if 'volumen' in row:
-            ws_rangos.cell(row=row_idx, column=3, value=row['volumen']).border = border
-            ws_rangos.cell(row=row_idx, column=3).number_format = '0'
-
-    ws_rangos.column_dimensions['A'].width = 20
-    ws_rangos.column_dimensions['B'].width = 20
-    ws_rangos.column_dimensions['C'].width = 15
-
-    # Guardar en BytesIO
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    return output
+    for row_idx, metrica_data in enumerate(metricas, start=9):
+        ws_indice.write(row_idx, 0, metrica_data[0], reporte.formato(border=1, align='center'))
+        ws_indice.write_row(row_idx, 1, metrica_data[1:], reporte.formato(
+            border=1, align='center', num_format='0.00' if row_idx <= 11 else '0'
+        ))
+
+    # HOJAS 2-4: datos por opción de filtrado
+    columnas = ['REST', 'huella_co2'] + (['volumen'] if 'volumen' in df_csv.columns else [])
+    tabla = {
+        'encabezados': {'REST': "Resistencia (MPa)", 'huella_co2': "Huella CO₂ (kg/m³)", 'volumen': "Volumen (m³)"},
+        'formatos': {'huella_co2': '0.00', 'volumen': '0'},
+        'anchos': {'REST': 20, 'huella_co2': 20, 'volumen': 15}
+    }
+
+    for nombre, df_hoja in [
+        ("Todas las Resistencias", df_todas),
+        ("Solo Exactos", df_exactos),
+        ("Rangos ±2 MPa", df_rangos)
+    ]:
+        df_hoja = df_hoja.sort_values('REST')[columnas] if not df_hoja.empty else pd.DataFrame(columns=columnas)
+        reporte.hoja_tabla(nombre, df_hoja, **tabla)
+
+    return reporte.cerrar()
 
 def app():
     # Obtener conexión de session_state
@@ -224,7 +123,7 @@ def app():
     bandas = cargar_bandas(json_path)
 
     # Cargar datos desde la base de datos
-    df_csv = pd.read_sql_query("SELECT * FROM huella_concretos", conn)
+    df_csv = leer_tabla('huella_concretos', engine=conn)
 
     # Crear mapeo de nombres reales a anónimos (alfabéticamente ordenados)
     origenes_unicos = sorted(df_csv['origen'].unique())
@@ -940,11 +839,10 @@ def app():
             st.divider()
 
             # Generar Excel para descarga
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df_compania_ano.to_excel(writer, sheet_name='Por Compañía y Año', index=False)
-                df_por_compania.to_excel(writer, sheet_name='Resumen por Compañía', index=False)
-            output.seek(0)
+            output = excel_desde_hojas({
+                'Por Compañía y Año': df_compania_ano,
+                'Resumen por Compañía': df_por_compania
+            })
 
             st.download_button(
                 label="📥 Descargar Análisis por Compañía (Excel)",
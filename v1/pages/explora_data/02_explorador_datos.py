@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 from database.connection import get_connection
+from services.pivote_cubo import get_motor_pivote
 from services.explora_data_utils import (
     descargar_excel,
     get_indicadores_dict,
@@ -31,19 +32,16 @@ def app():
 
     st.write(f"---")
 
-    df_cubo = pd.read_sql_query("SELECT * FROM tb_cubo", conn)
-
-
+    # Filtros, etiquetas y pivote se resuelven en el motor (snapshot Parquet o SQL)
+    motor = get_motor_pivote()
 
     col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
 
     # Filtrar por fuente - Simple multiselect
-    lista_fuentes = pd.read_sql_query("SELECT distinct fuente FROM tb_cubo", conn)
-    lista_fuentes = lista_fuentes['fuente'].tolist()
+    lista_fuentes = motor.valores('fuente', {}, conn)
     fuentes_selected = col1.multiselect("📂 Fuente", lista_fuentes)
-    if fuentes_selected:
-        df_cubo = df_cubo[df_cubo['fuente'].isin(fuentes_selected)]
-    else:
+    filtros = {'fuente': fuentes_selected} if fuentes_selected else {}
+    if not fuentes_selected:
         fuentes_selected = lista_fuentes  # Para el diálogo de indicadores
 
     # Filtrar por indicadores - Solo botón con diálogo
@@ -57,14 +55,13 @@ def app():
 
     # Aplicar filtro de indicadores si hay selección
     if st.session_state.indicadores_seleccionados:
-        df_cubo = df_cubo[df_cubo['codigo_indicador'].isin(st.session_state.indicadores_seleccionados)]
+        filtros['codigo_indicador'] = st.session_state.indicadores_seleccionados
 
     # Filtrar por años - Simple multiselect
-    lista_años = df_cubo['año'].unique().tolist()
-    lista_años.sort()
+    lista_años = motor.valores('año', filtros, conn)
     años_selected = col3.multiselect("📅 Años", lista_años)
     if años_selected:
-        df_cubo = df_cubo[df_cubo['año'].isin(años_selected)]
+        filtros['año'] = años_selected
 
     # Filtrar por entidades - Solo botón con diálogo
     with col4:
@@ -77,22 +74,13 @@ def app():
 
     # Aplicar filtro de entidades si hay selección
     if st.session_state.entidades_seleccionadas:
-        df_cubo = df_cubo[df_cubo['iso_3'].isin(st.session_state.entidades_seleccionadas)]
+        filtros['iso_3'] = st.session_state.entidades_seleccionadas
 
 
     st.write(f"---")
 
-    df_cubo['indicador'] = df_cubo['codigo_indicador'].map(indicadores_dict)
-    df_cubo['entidad'] = df_cubo['iso_3'].map(entidades_dict)
-
-    df_pivot = df_cubo.pivot_table(
-        index=["fuente", "entidad", "indicador"],
-        columns=["año"],
-        values="valor",
-        aggfunc=sum
-    )
+    df_pivot = motor.pivotear(filtros, indicadores_dict, entidades_dict, conn)
 
-    # st.dataframe(df_cubo, use_container_width=True)
     st.dataframe(df_pivot, use_container_width=True)
 
 
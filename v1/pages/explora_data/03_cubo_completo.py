@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
-import io
-from services.explora_data_utils import descargar_excel
+from services.explora_data_utils import descargar_archivo, exportar_con_progreso, nombre_descarga
+from services.exportacion import FORMATOS_EXPORTACION
 from database.connection import get_connection
 
 
+QUERY_CUBO = "SELECT * FROM cubo_expandido WHERE codigo_indicador IS NOT NULL"
+
+
 def app():
     # Obtener conexión de session_state
     ruta_db = st.session_state.get('ruta_db')
@@ -12,14 +15,33 @@ def app():
 
     st.title("📋 Cubo Completo")
 
+    formato = st.radio(
+        "Formato de descarga",
+        list(FORMATOS_EXPORTACION),
+        format_func=lambda f: FORMATOS_EXPORTACION[f]['nombre'],
+        horizontal=True
+    )
+
+    filename = nombre_descarga('Descargar cubo completo', f"cubo_completo.{formato}")
+
     boton_cargar_cubo_completo = st.button("Preparar 'Cubo Completo' para descarga")
     if boton_cargar_cubo_completo:
-        df_cubo = pd.read_sql_query("SELECT * FROM cubo_expandido", conn)
-        df_cubo = df_cubo[df_cubo['codigo_indicador'].notnull()]
-        st.write(f"Número de filas: {df_cubo.shape[0]}")
-        st.dataframe(df_cubo, use_container_width=True)
-        descargar_excel(df_cubo, 'Descargar cubo completo',  'cubo_completo.xlsx')
+        num_filas = pd.read_sql_query(
+            "SELECT COUNT(*) AS n FROM cubo_expandido WHERE codigo_indicador IS NOT NULL", conn
+        )['n'].iloc[0]
+        st.session_state.cubo_num_filas = int(num_filas)
+        st.session_state.cubo_preview = pd.read_sql_query(f"{QUERY_CUBO} LIMIT 1000", conn)
+        # El cubo se escribe por bloques a un archivo temporal, sin cargarlo en memoria
+        st.session_state.cubo_exportacion = exportar_con_progreso(QUERY_CUBO, conn, formato, total=num_filas)
+
+    exportacion = st.session_state.get('cubo_exportacion')
+    if exportacion:
+        st.write(f"Número de filas: {st.session_state.cubo_num_filas:,}")
+        st.caption("Vista previa: primeras 1.000 filas")
+        st.dataframe(st.session_state.cubo_preview, use_container_width=True)
+        # El botón solo se muestra en la ejecución que generó el archivo (luego se borra)
+        descargar_archivo(exportacion, 'Descargar cubo completo', filename)
 
 
 # Run the app
-app()
\ No newline at end of file
+app()
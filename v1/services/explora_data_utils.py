@@ -2,44 +2,119 @@
 Utilidades para módulo Explora Data
 Funciones compartidas entre páginas de exploración de datos
 """
+import os
 import streamlit as st
 import pandas as pd
-import io
+
+from services.exportacion import (
+    FORMATOS_EXPORTACION,
+    exportar_consulta,
+    exportar_dataframe
+)
+
+
+def nombre_descarga(nombre_boton='Descargar', nombre_archivo='datos.xlsx'):
+    """
+    Campo de texto con el nombre del archivo a descargar
+
+    Se muestra antes de generar el archivo: editarlo provoca un rerun, y el
+    botón de descarga solo aparece en la ejecución que genera el archivo.
+
+    Args:
+        nombre_boton: Texto del botón de descarga
+        nombre_archivo: Nombre sugerido para el archivo
+
+    Returns:
+        Nombre elegido
+    """
+    return st.text_input(
+        f"Nombre del archivo {nombre_boton.replace('Descargar','')} :",
+        nombre_archivo
+    )
 
 
 def descargar_excel(df, nombre_boton='Descargar Excel', nombre_archivo='datos.xlsx'):
     """
     Crea un botón para descargar un DataFrame como archivo Excel
 
+    El archivo se escribe por bloques a un temporal (no se arma en un buffer
+    en memoria) solo al pulsar "Preparar", una vez por exportación.
+
     Args:
         df: DataFrame a descargar
         nombre_boton: Texto del botón de descarga
         nombre_archivo: Nombre sugerido para el archivo
     """
-    # Crear un buffer para el archivo Excel
-    buffer = io.BytesIO()
+    filename = nombre_descarga(nombre_boton, nombre_archivo)
+    clave = f"exportacion_{nombre_boton}"
 
-    # Crear archivo Excel
-    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-        df.to_excel(writer, sheet_name='Datos')
+    if st.button(f"Preparar {nombre_boton.replace('Descargar', '').strip() or 'Excel'}", key=f"preparar_{clave}"):
+        st.session_state[clave] = exportar_dataframe(df, 'xlsx')
+        descargar_archivo(st.session_state[clave], nombre_boton, filename)
+    elif st.session_state.get(clave):
+        st.caption("El archivo ya se entregó: vuelve a prepararlo para descargarlo otra vez.")
 
-    # Preparar el buffer para descarga
-    buffer.seek(0)
 
-    # Crear columna para el botón de descarga
-    col_download = st.columns(1)[0]
-    filename = col_download.text_input(
-        f"Nombre del archivo {nombre_boton.replace('Descargar','')} :",
-        nombre_archivo
-    )
+def descargar_archivo(exportacion, nombre_boton='Descargar', nombre_archivo='datos.xlsx'):
+    """
+    Crea un botón para descargar un archivo generado por services.exportacion
+
+    Llamar solo en la ejecución que generó el archivo: su contenido se
+    entrega a Streamlit una vez y el temporal se borra en seguida (en cada
+    rerun el botón volvería a cargar el archivo completo en memoria).
+
+    Args:
+        exportacion: Estadísticas devueltas por exportar_consulta/exportar_dataframe
+        nombre_boton: Texto del botón de descarga
+        nombre_archivo: Nombre del archivo (ver nombre_descarga)
+    """
+    if not os.path.exists(exportacion['path']):
+        st.caption("El archivo ya se entregó: vuelve a prepararlo para descargarlo otra vez.")
+        return
+
+    # Botón de descarga (se entrega el archivo, no un DataFrame)
+    with open(exportacion['path'], 'rb') as archivo:
+        st.download_button(
+            label=nombre_boton,
+            data=archivo,
+            file_name=nombre_archivo,
+            mime=FORMATOS_EXPORTACION[exportacion['formato']]['mime']
+        )
 
-    # Botón de descarga
-    st.download_button(
-        label=nombre_boton,
-        data=buffer,
-        file_name=filename,
-        mime="application/vnd.ms-excel"
+    os.remove(exportacion['path'])
+
+
+def exportar_con_progreso(query, conn, formato='xlsx', total=None, params=None):
+    """
+    Exporta una consulta por bloques mostrando avance y throughput
+
+    Args:
+        query: Consulta SQL (parámetros con :nombre)
+        conn: Engine de la base de datos
+        formato: 'xlsx', 'csv' o 'parquet'
+        total: Filas esperadas (para la barra de avance)
+        params: Parámetros de la consulta
+
+    Returns:
+        Estadísticas de la exportación (path, filas, bytes, segundos, ...)
+    """
+    barra = st.progress(0.0, text="Preparando exportación...")
+
+    def progreso(stats):
+        avance = min(stats['filas'] / total, 1.0) if total else 0.0
+        barra.progress(
+            avance,
+            text=f"{stats['filas']:,} filas · {stats['filas_por_s'] or 0:,} filas/s · "
+                 f"{stats['mb_por_s'] or 0} MB/s"
+        )
+
+    exportacion = exportar_consulta(query, conn, formato, params=params, progreso=progreso)
+    barra.progress(
+        1.0,
+        text=f"✅ {exportacion['filas']:,} filas en {exportacion['segundos']}s "
+             f"({exportacion['bytes'] / 1024 / 1024:.1f} MB)"
     )
+    return exportacion
 
 
 def get_indicadores_dict(conn):
@@ -0,0 +1,410 @@
+"""
+Exportación por streaming de tablas grandes
+Escribe resultados de consultas (o DataFrames) a XLSX, CSV o Parquet por
+bloques, en un archivo temporal, sin mantener el dataset completo en memoria.
+
+- Lectura con cursor del lado del servidor (stream_results) en bloques
+- XLSX con xlsxwriter en modo constant_memory (fila a fila)
+- Parquet con pyarrow.ParquetWriter (un row group por bloque), con el
+  esquema tomado de los tipos declarados de las columnas (una columna
+  numérica vacía en el primer bloque no se guarda como texto)
+"""
+import os
+import time
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+from sqlalchemy import inspect, text
+from sqlalchemy import types as sqltypes
+
+
+# Formatos soportados
+FORMATOS_EXPORTACION = {
+    'xlsx': {
+        'nombre': 'Excel (.xlsx)',
+        'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    },
+    'csv': {
+        'nombre': 'CSV (.csv)',
+        'mime': 'text/csv'
+    },
+    'parquet': {
+        'nombre': 'Parquet (.parquet)',
+        'mime': 'application/octet-stream'
+    }
+}
+
+# Archivos temporales de exportación (se borran después de EXPORT_TTL segundos)
+EXPORT_DIR = Path(tempfile.gettempdir()) / "latam4c_exports"
+EXPORT_TTL = 3600
+
+# Filas máximas por hoja de Excel (incluye encabezado)
+XLSX_MAX_FILAS = 1_048_576
+
+# Tipos de PostgreSQL (OID de cursor.description) -> tipo Arrow
+TIPOS_PG_ARROW = {
+    16: 'bool',
+    20: 'int64', 21: 'int64', 23: 'int64', 26: 'int64',
+    700: 'float64', 701: 'float64', 1700: 'float64',
+    1082: 'date32',
+    1114: 'timestamp',
+    1184: 'timestamptz',
+    18: 'string', 19: 'string', 25: 'string', 1042: 'string', 1043: 'string'
+}
+
+
+class _EscritorCSV:
+    def __init__(self, path: Path, columnas: List[str]):
+        self.archivo = open(path, 'w', newline='', encoding='utf-8')
+        pd.DataFrame(columns=columnas).to_csv(self.archivo, index=False)
+
+    def escribir(self, bloque: pd.DataFrame) -> None:
+        bloque.to_csv(self.archivo, header=False, index=False)
+
+    def cerrar(self) -> None:
+        self.archivo.close()
+
+
+class _EscritorXLSX:
+    """Escritura fila a fila; abre una hoja nueva al llegar al límite de Excel."""
+
+    def __init__(self, path: Path, columnas: List[str], hoja: str = 'Datos'):
+        import xlsxwriter
+
+        self.workbook = xlsxwriter.Workbook(str(path), {'constant_memory': True})
+        self.columnas = columnas
+        self.hoja = hoja
+        self.num_hojas = 0
+        self._nueva_hoja()
+
+    def _nueva_hoja(self) -> None:
+        self.num_hojas += 1
+        nombre = self.hoja if self.num_hojas == 1 else f"{self.hoja}_{self.num_hojas}"
+        self.worksheet = self.workbook.add_worksheet(nombre)
+        self.worksheet.write_row(0, 0, self.columnas)
+        self.fila = 1
+
+    def escribir(self, bloque: pd.DataFrame) -> None:
+        # NaN/NaT -> celda vacía (xlsxwriter no admite NaN)
+        bloque = bloque.astype(object).where(bloque.notna(), None)
+        for valores in bloque.itertuples(index=False, name=None):
+            if self.fila >= XLSX_MAX_FILAS:
+                self._nueva_hoja()
+            self.worksheet.write_row(self.fila, 0, valores)
+            self.fila += 1
+
+    def cerrar(self) -> None:
+        self.workbook.close()
+
+
+class _EscritorParquet:
+    """Un row group por bloque con los tipos declarados (o los del primer bloque)."""
+
+    def __init__(self, path: Path, columnas: List[str], tipos: Optional[Dict] = None):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Exportar a Parquet requiere pyarrow (pip install pyarrow)")
+
+        self.path = path
+        self.tipos = tipos
+        self.writer = None
+        self.schema = None
+
+    def escribir(self, bloque: pd.DataFrame) -> None:
+        import pyarrow.parquet as pq
+
+        if self.writer is None:
+            self.schema = esquema_arrow(bloque, self.tipos)
+            self.writer = pq.ParquetWriter(str(self.path), self.schema, compression='snappy')
+
+        self.writer.write_table(tabla_arrow(bloque, self.schema))
+
+    def cerrar(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _tipo_arrow(nombre: str):
+    """Tipo Arrow a partir de su nombre en TIPOS_PG_ARROW."""
+    import pyarrow as pa
+
+    if nombre == 'timestamp':
+        return pa.timestamp('us')
+    if nombre == 'timestamptz':
+        return pa.timestamp('us', tz='UTC')
+    return getattr(pa, nombre)()
+
+
+def _tipo_sqlalchemy(tipo) -> Optional[str]:
+    """Nombre del tipo Arrow de un tipo SQLAlchemy (None = inferir de los datos)."""
+    if isinstance(tipo, sqltypes.Boolean):
+        return 'bool'
+    if isinstance(tipo, sqltypes.Integer):
+        return 'int64'
+    if isinstance(tipo, (sqltypes.Float, sqltypes.Numeric)):
+        return 'float64'
+    if isinstance(tipo, sqltypes.DateTime):
+        return 'timestamptz' if tipo.timezone else 'timestamp'
+    if isinstance(tipo, sqltypes.Date):
+        return 'date32'
+    if isinstance(tipo, sqltypes.String):
+        return 'string'
+    return None
+
+
+def tipos_tabla(engine, tabla: str) -> Dict:
+    """
+    Tipos Arrow declarados de las columnas de una tabla.
+
+    Args:
+        engine: Engine SQLAlchemy
+        tabla: Nombre de la tabla
+
+    Returns:
+        Diccionario columna -> tipo Arrow (columnas de tipo desconocido se omiten)
+    """
+    tipos = {}
+    for columna in inspect(engine).get_columns(tabla):
+        nombre = _tipo_sqlalchemy(columna['type'])
+        if nombre is not None:
+            tipos[columna['name']] = _tipo_arrow(nombre)
+    return tipos
+
+
+def tipos_consulta(query: str, engine, params: Optional[Dict] = None) -> Dict:
+    """
+    Tipos Arrow de las columnas de una consulta según cursor.description.
+
+    Ejecuta la consulta con LIMIT 0. Solo PostgreSQL informa los tipos
+    (OID); con otros motores se devuelve un diccionario vacío.
+
+    Args:
+        query: Consulta SQL (parámetros con :nombre)
+        engine: Engine SQLAlchemy
+        params: Parámetros de la consulta
+
+    Returns:
+        Diccionario columna -> tipo Arrow (columnas de tipo desconocido se omiten)
+    """
+    consulta = text(f"SELECT * FROM ({query}) AS q LIMIT 0")
+    with engine.connect() as conn:
+        descripcion = conn.execute(consulta, params or {}).cursor.description or []
+
+    tipos = {}
+    for columna in descripcion:
+        nombre = TIPOS_PG_ARROW.get(columna[1]) if isinstance(columna[1], int) else None
+        if nombre is not None:
+            tipos[columna[0]] = _tipo_arrow(nombre)
+    return tipos
+
+
+def esquema_arrow(bloque: pd.DataFrame, tipos: Optional[Dict] = None):
+    """
+    Esquema Arrow de un bloque para escribir los siguientes con el mismo.
+
+    Args:
+        bloque: Primer bloque de datos
+        tipos: Tipos declarados por columna (ver tipos_tabla/tipos_consulta);
+            prevalecen sobre los inferidos del bloque
+
+    Las columnas sin tipo declarado y sin datos en el bloque (tipo null) se
+    guardan como texto.
+    """
+    import pyarrow as pa
+
+    tipos = tipos or {}
+    schema = pa.Schema.from_pandas(bloque, preserve_index=False)
+    campos = []
+    for f in schema:
+        if f.name in tipos:
+            f = f.with_type(tipos[f.name])
+        elif pa.types.is_null(f.type):
+            f = f.with_type(pa.string())
+        campos.append(f)
+    return pa.schema(campos).remove_metadata()
+
+
+def tabla_arrow(bloque: pd.DataFrame, schema):
+    """Convierte un bloque a pyarrow.Table con el esquema dado."""
+    import pyarrow as pa
+
+    for campo in schema:
+        columna = bloque[campo.name]
+        if pa.types.is_string(campo.type) and columna.dtype != object:
+            bloque = bloque.assign(**{campo.name: columna.astype(str).where(columna.notna(), None)})
+        elif (pa.types.is_integer(campo.type) or pa.types.is_floating(campo.type)) and columna.dtype == object:
+            # Bloques sin ningún valor (solo None) o con Decimal
+            bloque = bloque.assign(**{campo.name: pd.to_numeric(columna)})
+
+    return pa.Table.from_pandas(bloque, schema=schema, preserve_index=False)
+
+
+ESCRITORES = {
+    'xlsx': _EscritorXLSX,
+    'csv': _EscritorCSV,
+    'parquet': _EscritorParquet
+}
+
+
+def limpiar_exportaciones(ttl: float = EXPORT_TTL) -> None:
+    """Borra archivos de exportación más antiguos que ttl segundos."""
+    if not EXPORT_DIR.exists():
+        return
+    limite = time.time() - ttl
+    for archivo in EXPORT_DIR.iterdir():
+        try:
+            if archivo.stat().st_mtime < limite:
+                archivo.unlink()
+        except OSError:
+            pass
+
+
+def exportar_bloques(
+    bloques: Iterable[pd.DataFrame],
+    formato: str = 'xlsx',
+    progreso: Optional[Callable[[Dict], None]] = None,
+    tipos: Optional[Dict] = None
+) -> Dict:
+    """
+    Escribe una secuencia de bloques a un archivo temporal.
+
+    Args:
+        bloques: DataFrames con las mismas columnas
+        formato: 'xlsx', 'csv' o 'parquet'
+        progreso: Función llamada después de cada bloque con las estadísticas
+        tipos: Tipos Arrow declarados por columna (solo Parquet)
+
+    Returns:
+        Diccionario con path, formato, filas, bytes (tamaño del archivo),
+        bytes_procesados (datos leídos), segundos, filas_por_s y mb_por_s
+    """
+    if formato not in ESCRITORES:
+        raise ValueError(f"Formato no soportado: {formato}. Opciones: {list(ESCRITORES)}")
+
+    limpiar_exportaciones()
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    fd, nombre = tempfile.mkstemp(suffix=f".{formato}", dir=EXPORT_DIR)
+    os.close(fd)
+    path = Path(nombre)
+
+    stats = {'path': str(path), 'formato': formato, 'filas': 0, 'bytes': 0, 'bytes_procesados': 0, 'bloques': 0}
+    inicio = time.perf_counter()
+    escritor = None
+
+    try:
+        for bloque in bloques:
+            if escritor is None:
+                columnas = [str(c) for c in bloque.columns]
+                escritor = ESCRITORES[formato](path, columnas, tipos) if formato == 'parquet' \
+                    else ESCRITORES[formato](path, columnas)
+            if bloque.empty:
+                continue
+
+            escritor.escribir(bloque)
+            stats['filas'] += len(bloque)
+            stats['bytes_procesados'] += int(bloque.memory_usage(index=False, deep=True).sum())
+            stats['bloques'] += 1
+
+            if progreso is not None:
+                _actualizar_throughput(stats, path, inicio)
+                progreso(stats)
+
+        if escritor is None:
+            raise ValueError("La consulta no devolvió columnas para exportar")
+        escritor.cerrar()
+
+    except BaseException:
+        if escritor is not None:
+            try:
+                escritor.cerrar()
+            except Exception:
+                pass
+        path.unlink(missing_ok=True)
+        raise
+
+    _actualizar_throughput(stats, path, inicio)
+    return stats
+
+
+def exportar_consulta(
+    query: str,
+    engine,
+    formato: str = 'xlsx',
+    params: Optional[Dict] = None,
+    chunksize: int = 50_000,
+    progreso: Optional[Callable[[Dict], None]] = None
+) -> Dict:
+    """
+    Exporta el resultado de una consulta leyendo por bloques.
+
+    Args:
+        query: Consulta SQL (parámetros con :nombre)
+        engine: Engine SQLAlchemy
+        formato: 'xlsx', 'csv' o 'parquet'
+        params: Parámetros de la consulta
+        chunksize: Filas por bloque
+        progreso: Función llamada después de cada bloque con las estadísticas
+
+    Returns:
+        Estadísticas de la exportación (ver exportar_bloques)
+    """
+    tipos = tipos_consulta(query, engine, params) if formato == 'parquet' else None
+    return exportar_bloques(leer_bloques(query, engine, params, chunksize), formato, progreso, tipos)
+
+
+def exportar_dataframe(
+    df: pd.DataFrame,
+    formato: str = 'xlsx',
+    chunksize: int = 50_000,
+    index: bool = True
+) -> Dict:
+    """
+    Exporta un DataFrame ya cargado sin duplicarlo en un buffer en memoria.
+
+    Args:
+        df: DataFrame a exportar
+        formato: 'xlsx', 'csv' o 'parquet'
+        chunksize: Filas por bloque
+        index: Incluir el índice como columnas (ej: tablas pivote)
+
+    Returns:
+        Estadísticas de la exportación (ver exportar_bloques)
+    """
+    if index and not isinstance(df.index, pd.RangeIndex):
+        df = df.reset_index()
+    if df.columns.nlevels > 1:
+        df = df.set_axis([" ".join(str(n) for n in c if str(n)) for c in df.columns], axis=1)
+
+    bloques = (df.iloc[i:i + chunksize] for i in range(0, max(len(df), 1), chunksize))
+    return exportar_bloques(bloques, formato)
+
+
+def leer_bloques(query: str, engine, params: Optional[Dict], chunksize: int) -> Iterator[pd.DataFrame]:
+    """Lee una consulta por bloques con cursor del lado del servidor."""
+    with engine.connect().execution_options(stream_results=True) as conn:
+        yield from pd.read_sql_query(text(query), conn, params=params, chunksize=chunksize)
+
+
+def _actualizar_throughput(stats: Dict, path: Path, inicio: float) -> None:
+    segundos = time.perf_counter() - inicio
+    stats['bytes'] = path.stat().st_size if path.exists() else 0
+    stats['segundos'] = round(segundos, 2)
+    stats['filas_por_s'] = round(stats['filas'] / segundos) if segundos > 0 else None
+    stats['mb_por_s'] = round(stats['bytes_procesados'] / 1024 / 1024 / segundos, 2) if segundos > 0 else None
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    from database.models import get_engine
+
+    resultado = exportar_consulta(
+        "SELECT * FROM cubo_expandido WHERE codigo_indicador IS NOT NULL",
+        get_engine(),
+        formato='csv',
+        progreso=lambda s: print(f"  {s['filas']:,} filas ({s['filas_por_s']:,} filas/s)")
+    )
+    print(f"✅ {resultado['filas']:,} filas -> {resultado['path']} "
+          f"({resultado['bytes'] / 1024 / 1024:.1f} MB en {resultado['segundos']}s)")
@@ -0,0 +1,245 @@
+"""
+Motor de pivotes de tb_cubo para Explora Data
+Ejecuta filtro + etiquetas + agregación como una sola consulta columnar en
+proceso (Arrow/Acero) sobre el snapshot de tb_cubo y pivotea solo el
+resultado agregado. Los pivotes recientes se memorizan por versión de datos
+y filtros, así que volver a una selección anterior es instantáneo.
+"""
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from services.snapshots import leer_tabla, version_datos
+
+
+# Dimensiones del pivote (filas) y columna pivoteada
+INDICE_PIVOTE = ['fuente', 'entidad', 'indicador']
+COLUMNA_PIVOTE = 'año'
+
+# Columnas de tb_cubo que usa el pivote
+COLUMNAS_CUBO = ['fuente', 'iso_3', 'codigo_indicador', 'año', 'valor']
+
+
+class MotorPivote:
+    """
+    Pivotes de tb_cubo con caché LRU.
+
+    Es thread-safe: una misma instancia se comparte entre sesiones de
+    Streamlit (ver get_motor_pivote).
+    """
+
+    def __init__(self, cache_size: int = 32, tablas_cache: int = 4):
+        """
+        Inicializa el motor.
+
+        Args:
+            cache_size: Pivotes guardados en caché
+            tablas_cache: Lecturas filtradas del cubo guardadas en caché
+        """
+        self.cache_size = cache_size
+        self.tablas_cache = tablas_cache
+
+        self._pivotes: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._tablas: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.last_stats: Dict = {}
+
+    def pivotear(
+        self,
+        filtros: Dict[str, Any],
+        indicadores: Dict,
+        entidades: Dict,
+        engine=None
+    ) -> pd.DataFrame:
+        """
+        Suma de valor por fuente × entidad × indicador (filas) y año (columnas).
+
+        Equivale a mapear codigo_indicador/iso_3 con los diccionarios de
+        etiquetas y llamar a pivot_table(aggfunc=sum) sobre el cubo filtrado.
+
+        Args:
+            filtros: {columna: valor | [valores] | (operador, valor)} sobre tb_cubo
+            indicadores: codigo_indicador → nombre (get_indicadores_dict)
+            entidades: iso_3 → nombre (get_entidades_dict)
+            engine: Engine SQLAlchemy (None = database.models.get_engine())
+
+        Returns:
+            DataFrame pivoteado
+        """
+        version = version_datos('tb_cubo', engine)
+        key = self._key(version, filtros, indicadores, entidades)
+
+        with self._lock:
+            if key is not None and key in self._pivotes:
+                self._pivotes.move_to_end(key)
+                self.last_stats = {'filas': len(self._pivotes[key]), 'cached': True, 'seconds': 0.0}
+                return self._pivotes[key]
+
+        start = time.perf_counter()
+        tabla = self._leer(version, filtros, engine)
+        pivote = pivotear_cubo(tabla, indicadores, entidades)
+        seconds = time.perf_counter() - start
+
+        if key is not None:
+            with self._lock:
+                self._pivotes[key] = pivote
+                while len(self._pivotes) > self.cache_size:
+                    self._pivotes.popitem(last=False)
+
+        self.last_stats = {
+            'filas_cubo': tabla.num_rows,
+            'filas': len(pivote),
+            'cached': False,
+            'seconds': round(seconds, 3)
+        }
+        return pivote
+
+    def valores(self, columna: str, filtros: Dict[str, Any], engine=None) -> List:
+        """
+        Valores distintos (ordenados) de una columna del cubo filtrado.
+
+        Args:
+            columna: Columna de COLUMNAS_CUBO
+            filtros: Filtros sobre tb_cubo
+            engine: Engine SQLAlchemy
+
+        Returns:
+            Lista de valores sin nulos
+        """
+        import pyarrow.compute as pc
+
+        tabla = self._leer(version_datos('tb_cubo', engine), filtros, engine)
+        return sorted(v for v in pc.unique(tabla[columna]).to_pylist() if v is not None)
+
+    def clear_cache(self) -> None:
+        """Vacía las cachés de pivotes y lecturas."""
+        with self._lock:
+            self._pivotes.clear()
+            self._tablas.clear()
+
+    def _leer(self, version: Optional[str], filtros: Dict[str, Any], engine):
+        """Lectura filtrada del cubo como pyarrow.Table (snapshot o SQL)."""
+        key = self._key(version, filtros)
+
+        with self._lock:
+            if key is not None and key in self._tablas:
+                self._tablas.move_to_end(key)
+                return self._tablas[key]
+
+        tabla = leer_tabla('tb_cubo', columnas=COLUMNAS_CUBO, filtros=filtros, engine=engine, arrow=True)
+
+        if key is not None:
+            with self._lock:
+                self._tablas[key] = tabla
+                while len(self._tablas) > self.tablas_cache:
+                    self._tablas.popitem(last=False)
+        return tabla
+
+    @staticmethod
+    def _key(version: Optional[str], filtros: Dict[str, Any], *etiquetas: Dict) -> Optional[str]:
+        """Clave de caché: versión de datos + filtros canónicos (+ etiquetas)."""
+        if version is None:
+            return None
+
+        canonical = {
+            c: sorted(v, key=str) if isinstance(v, (list, set)) else v
+            for c, v in sorted(filtros.items())
+        }
+        key = f"{version}|{json.dumps(canonical, ensure_ascii=False, default=str)}"
+        for d in etiquetas:
+            key += f"|{hash(frozenset(d.items()))}"
+        return key
+
+
+def pivotear_cubo(tabla, indicadores: Dict, entidades: Dict) -> pd.DataFrame:
+    """
+    Pivote de una tabla Arrow con las columnas de COLUMNAS_CUBO.
+
+    Las etiquetas se agregan con joins internos (códigos sin etiqueta se
+    descartan, igual que las claves NaN en pivot_table) y la suma se hace
+    con un group_by de Arrow; solo el resultado agregado pasa a pandas.
+
+    Args:
+        tabla: pyarrow.Table del cubo
+        indicadores: codigo_indicador → nombre
+        entidades: iso_3 → nombre
+
+    Returns:
+        DataFrame con índice INDICE_PIVOTE y una columna por año
+    """
+    import pyarrow.compute as pc
+
+    tabla = tabla.select(COLUMNAS_CUBO)
+    tabla = tabla.filter(pc.and_(pc.is_valid(tabla['fuente']), pc.is_valid(tabla[COLUMNA_PIVOTE])))
+
+    tabla = tabla.join(_etiquetas(indicadores, 'codigo_indicador', 'indicador', tabla.schema),
+                       'codigo_indicador', join_type='inner')
+    tabla = tabla.join(_etiquetas(entidades, 'iso_3', 'entidad', tabla.schema),
+                       'iso_3', join_type='inner')
+
+    # min_count=0: grupos con todos los valores nulos suman 0, como pandas
+    agregado = tabla.group_by(INDICE_PIVOTE + [COLUMNA_PIVOTE], use_threads=True).aggregate(
+        [('valor', 'sum', pc.ScalarAggregateOptions(skip_nulls=True, min_count=0))]
+    ).to_pandas()
+
+    if agregado.empty:
+        columnas = pd.Index([], name=COLUMNA_PIVOTE)
+        indice = pd.MultiIndex.from_arrays([[]] * len(INDICE_PIVOTE), names=INDICE_PIVOTE)
+        return pd.DataFrame(index=indice, columns=columnas, dtype=float)
+
+    pivote = agregado.pivot(index=INDICE_PIVOTE, columns=COLUMNA_PIVOTE, values='valor_sum')
+    return pivote.sort_index().sort_index(axis=1)
+
+
+def _etiquetas(diccionario: Dict, clave: str, nombre: str, schema):
+    """Tabla Arrow clave → etiqueta con el tipo de la columna del cubo."""
+    import pyarrow as pa
+
+    pares = [(k, v) for k, v in diccionario.items() if k is not None and not pd.isna(v)]
+    tipo = schema.field(clave).type
+    try:
+        claves = pa.array([k for k, _ in pares]).cast(tipo)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # Tipos incompatibles: ningún código coincide (como Series.map)
+        pares, claves = [], pa.array([], type=tipo)
+
+    return pa.table({clave: claves, nombre: pa.array([str(v) for _, v in pares], type=pa.string())})
+
+
+_motor: Optional[MotorPivote] = None
+_motor_lock = threading.Lock()
+
+
+def get_motor_pivote(**kwargs) -> MotorPivote:
+    """
+    Motor compartido por todo el proceso (se crea en el primer uso).
+
+    Args:
+        **kwargs: Configuración de MotorPivote (solo en la primera llamada)
+
+    Returns:
+        Instancia única de MotorPivote
+    """
+    global _motor
+    with _motor_lock:
+        if _motor is None:
+            _motor = MotorPivote(**kwargs)
+        return _motor
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    from database.models import get_engine
+    from services.explora_data_utils import get_indicadores_dict, get_entidades_dict
+
+    engine = get_engine()
+    motor = get_motor_pivote()
+    indicadores, entidades = get_indicadores_dict(engine), get_entidades_dict(engine)
+
+    for _ in range(2):
+        pivote = motor.pivotear({}, indicadores, entidades, engine)
+        print(f"{motor.last_stats} -> {pivote.shape}")
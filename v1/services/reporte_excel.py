@@ -0,0 +1,213 @@
+"""
+Reportes Excel con formato
+Escribe DataFrames completos en hojas con encabezado, bordes y formatos
+numéricos definidos por columna (xlsxwriter), sin recorrer ni formatear
+celda por celda. En modo constant_memory cada fila se vuelca a disco al
+escribirse, así que hojas de cientos de miles de filas no crecen en memoria.
+"""
+from io import BytesIO
+from typing import Dict, Optional
+
+import pandas as pd
+
+
+# Estilos compartidos por los reportes
+ESTILO_ENCABEZADO = {
+    'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#4472C4',
+    'border': 1, 'align': 'center', 'valign': 'vcenter'
+}
+ESTILO_CELDA = {'border': 1}
+
+# Ancho de columna por defecto (caracteres)
+ANCHO_COLUMNA = 15
+
+# Filas convertidas a la vez antes de escribir
+BLOQUE_FILAS = 50_000
+
+
+class ReporteExcel:
+    """
+    Libro Excel de varias hojas con formatos por columna.
+
+    Los formatos se crean una sola vez por combinación de propiedades.
+    """
+
+    def __init__(self, destino=None, constant_memory: bool = True):
+        """
+        Inicializa el libro.
+
+        Args:
+            destino: Ruta o buffer de salida (None = BytesIO nuevo)
+            constant_memory: Volcar cada fila a disco al escribirla (las
+                filas de una hoja deben escribirse en orden)
+        """
+        import xlsxwriter
+
+        self.destino = destino if destino is not None else BytesIO()
+        self.workbook = xlsxwriter.Workbook(self.destino, {
+            'constant_memory': constant_memory,
+            'nan_inf_to_errors': True,
+            'default_date_format': 'yyyy-mm-dd'
+        })
+        self._formatos: Dict[tuple, object] = {}
+
+    def formato(self, **propiedades):
+        """
+        Formato de xlsxwriter (reutilizado si ya existe uno igual).
+
+        Args:
+            **propiedades: Propiedades de xlsxwriter (bold, num_format, border, ...)
+
+        Returns:
+            Objeto Format
+        """
+        key = tuple(sorted(propiedades.items()))
+        if key not in self._formatos:
+            self._formatos[key] = self.workbook.add_format(dict(propiedades))
+        return self._formatos[key]
+
+    def agregar_hoja(self, nombre: str):
+        """
+        Agrega una hoja vacía para contenido libre (títulos, notas).
+
+        Args:
+            nombre: Nombre de la hoja (máx. 31 caracteres)
+
+        Returns:
+            Worksheet de xlsxwriter
+        """
+        return self.workbook.add_worksheet(nombre[:31])
+
+    def escribir_tabla(
+        self,
+        worksheet,
+        df: pd.DataFrame,
+        fila: int = 0,
+        encabezados: Optional[Dict[str, str]] = None,
+        formatos: Optional[Dict[str, str]] = None,
+        anchos: Optional[Dict[str, float]] = None,
+        estilo_celda: Optional[Dict] = None
+    ) -> int:
+        """
+        Escribe un DataFrame como tabla a partir de una fila.
+
+        Bordes y formato numérico se definen una vez por columna; las filas
+        se escriben completas con write_row.
+
+        Args:
+            worksheet: Hoja destino
+            df: Datos (se escriben las columnas en su orden)
+            fila: Fila (0-based) del encabezado
+            encabezados: Columna → texto del encabezado (por defecto el nombre)
+            formatos: Columna → formato numérico ('0.00', '#,##0', ...)
+            anchos: Columna → ancho (por defecto ANCHO_COLUMNA)
+            estilo_celda: Propiedades comunes de las celdas (por defecto ESTILO_CELDA)
+
+        Returns:
+            Siguiente fila libre
+        """
+        encabezados = encabezados or {}
+        formatos = formatos or {}
+        anchos = anchos or {}
+        estilo_celda = ESTILO_CELDA if estilo_celda is None else estilo_celda
+
+        for i, columna in enumerate(df.columns):
+            propiedades = dict(estilo_celda)
+            if columna in formatos:
+                propiedades['num_format'] = formatos[columna]
+            worksheet.set_column(i, i, anchos.get(columna, ANCHO_COLUMNA), self.formato(**propiedades))
+
+        worksheet.write_row(
+            fila, 0,
+            [encabezados.get(c, str(c)) for c in df.columns],
+            self.formato(**ESTILO_ENCABEZADO)
+        )
+        fila += 1
+
+        for inicio in range(0, len(df), BLOQUE_FILAS):
+            bloque = df.iloc[inicio:inicio + BLOQUE_FILAS]
+            # NaN/NaT -> celda vacía (hereda el formato de la columna)
+            bloque = bloque.astype(object).where(bloque.notna(), None)
+            for valores in bloque.itertuples(index=False, name=None):
+                worksheet.write_row(fila, 0, valores)
+                fila += 1
+
+        return fila
+
+    def hoja_tabla(
+        self,
+        nombre: str,
+        df: pd.DataFrame,
+        index: bool = False,
+        **kwargs
+    ):
+        """
+        Agrega una hoja con un DataFrame como única tabla.
+
+        Args:
+            nombre: Nombre de la hoja
+            df: Datos
+            index: Incluir el índice como primeras columnas
+            **kwargs: encabezados, formatos, anchos (ver escribir_tabla)
+
+        Returns:
+            Worksheet de xlsxwriter
+        """
+        if index:
+            sin_nombre = [i for i, n in enumerate(df.index.names) if n is None]
+            df = df.reset_index()
+            # Índice sin nombre: encabezado vacío, como DataFrame.to_excel
+            encabezados = {df.columns[i]: "" for i in sin_nombre}
+            kwargs['encabezados'] = {**encabezados, **(kwargs.get('encabezados') or {})}
+        worksheet = self.agregar_hoja(nombre)
+        self.escribir_tabla(worksheet, df, **kwargs)
+        return worksheet
+
+    def cerrar(self):
+        """
+        Cierra el libro.
+
+        Returns:
+            El destino (BytesIO posicionado al inicio o la ruta)
+        """
+        self.workbook.close()
+        if hasattr(self.destino, 'seek'):
+            self.destino.seek(0)
+        return self.destino
+
+
+def excel_desde_hojas(hojas: Dict[str, pd.DataFrame], index: bool = False) -> BytesIO:
+    """
+    Libro con una hoja por DataFrame (reemplazo de pd.ExcelWriter + to_excel).
+
+    Args:
+        hojas: Nombre de hoja → DataFrame
+        index: Incluir el índice de cada DataFrame
+
+    Returns:
+        BytesIO con el archivo .xlsx
+    """
+    reporte = ReporteExcel()
+    for nombre, df in hojas.items():
+        reporte.hoja_tabla(nombre, df, index=index)
+    return reporte.cerrar()
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    import time
+    import numpy as np
+
+    n = 300_000
+    df = pd.DataFrame({
+        'REST': np.random.randint(10, 55, n),
+        'huella_co2': np.random.normal(280, 40, n),
+        'volumen': np.random.uniform(1, 12, n)
+    })
+
+    inicio = time.perf_counter()
+    reporte = ReporteExcel('/tmp/reporte_ejemplo.xlsx')
+    for hoja in ['Todas', 'Copia 1', 'Copia 2']:
+        reporte.hoja_tabla(hoja, df, formatos={'huella_co2': '0.00', 'volumen': '0'})
+    reporte.cerrar()
+    print(f"✅ {3 * n:,} filas en {time.perf_counter() - inicio:.1f}s -> /tmp/reporte_ejemplo.xlsx")
@@ -0,0 +1,418 @@
+"""
+Snapshots Parquet de tablas de lectura intensiva
+Exporta tb_cubo, huella_concretos y remitos a Parquet particionado y
+versionado después de cada ETL, y los lee con memory-map aplicando poda de
+columnas y de particiones. Si el snapshot no existe o está desactualizado
+(la tabla cambió en PostgreSQL o superó max_age_horas) se lee por SQL.
+
+Estructura en disco:
+
+    data/snapshots/
+        tb_cubo/
+            CURRENT                      -> "20261019T180000"
+            20261019T180000/
+                _metadata.json            (filas, columnas, versión de datos)
+                fuente=GNR/año=2020/part-0.parquet
+"""
+import os
+import json
+import time
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+
+from services.exportacion import leer_bloques, esquema_arrow, tabla_arrow, tipos_tabla
+
+
+SNAPSHOT_ROOT = Path(__file__).resolve().parents[1] / "data" / "snapshots"
+
+# Tablas con snapshot y sus columnas de partición
+SNAPSHOT_TABLAS = {
+    'tb_cubo': {'particiones': ['fuente', 'año']},
+    'huella_concretos': {'particiones': ['origen', 'año']},
+    'remitos': {'particiones': ['origen', 'año']}
+}
+
+# Versiones que se conservan por tabla
+VERSIONES_CONSERVADAS = 2
+
+# Segundos que se reutiliza la versión de datos consultada a PostgreSQL
+VERSION_TTL = 60
+
+# Cambios acumulados de una tabla (inserts/updates/deletes) o reinicio del servidor
+VERSION_TABLA_QUERY = """
+SELECT
+    COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0) AS cambios,
+    pg_postmaster_start_time() AS inicio
+FROM pg_stat_user_tables
+WHERE relname = :tabla
+"""
+
+# Operadores admitidos en filtros (columna: (operador, valor))
+OPERADORES = {'==': '=', '!=': '!=', '>': '>', '>=': '>=', '<': '<', '<=': '<='}
+
+
+def version_tabla(engine, tabla: str) -> str:
+    """
+    Versión de datos de una tabla según pg_stat_user_tables.
+
+    Args:
+        engine: Engine SQLAlchemy
+        tabla: Nombre de la tabla
+
+    Returns:
+        String que cambia cuando la tabla cambia
+    """
+    row = pd.read_sql_query(text(VERSION_TABLA_QUERY), engine, params={'tabla': tabla}).iloc[0]
+    return f"{int(row['cambios'])}@{row['inicio']}"
+
+
+def crear_snapshot(
+    tabla: str,
+    engine=None,
+    root: Path = SNAPSHOT_ROOT,
+    chunksize: int = 100_000
+) -> Dict:
+    """
+    Exporta una tabla a Parquet particionado y la publica como versión actual.
+
+    La tabla se lee por bloques (cursor del lado del servidor) y se escribe
+    en un directorio temporal con el esquema de los tipos declarados de la
+    tabla; al terminar se publica con un cambio atómico del puntero CURRENT.
+
+    Args:
+        tabla: Tabla de SNAPSHOT_TABLAS
+        engine: Engine SQLAlchemy (None = database.models.get_engine())
+        root: Directorio de snapshots
+        chunksize: Filas por bloque
+
+    Returns:
+        Metadatos del snapshot
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if tabla not in SNAPSHOT_TABLAS:
+        raise ValueError(f"Tabla sin snapshot: {tabla}. Opciones: {list(SNAPSHOT_TABLAS)}")
+    engine = engine or _get_engine()
+    particiones = SNAPSHOT_TABLAS[tabla]['particiones']
+
+    # Versión antes de leer: cualquier cambio posterior deja el snapshot desactualizado
+    try:
+        data_version = version_tabla(engine, tabla)
+    except Exception as e:
+        print(f"⚠️  Sin versión de datos para {tabla} (solo se controlará la antigüedad): {e}")
+        data_version = None
+
+    version = datetime.now().strftime("%Y%m%dT%H%M%S")
+    tabla_dir = Path(root) / tabla
+    tmp_dir = tabla_dir / f".{version}.tmp"
+    tabla_dir.mkdir(parents=True, exist_ok=True)
+
+    inicio = time.perf_counter()
+    stats = {'filas': 0}
+    esquema = {}
+    tipos = tipos_tabla(engine, tabla)
+
+    def lotes():
+        for bloque in leer_bloques(f"SELECT * FROM {tabla}", engine, None, chunksize):
+            if not esquema:
+                esquema['schema'] = esquema_arrow(bloque, tipos)
+                esquema['columnas'] = [str(c) for c in bloque.columns]
+            stats['filas'] += len(bloque)
+            yield from tabla_arrow(bloque, esquema['schema']).to_batches()
+
+    try:
+        batches = lotes()
+        primero = next(batches, None)
+        if primero is None:
+            raise ValueError(f"La tabla {tabla} no devolvió columnas")
+
+        schema = esquema['schema']
+        ds.write_dataset(
+            _encadenar(primero, batches),
+            tmp_dir,
+            schema=schema,
+            format='parquet',
+            partitioning=ds.partitioning(
+                pa.schema([schema.field(c) for c in particiones]), flavor='hive'
+            ),
+            basename_template="part-{i}.parquet",
+            max_rows_per_group=chunksize,
+            existing_data_behavior='error'
+        )
+
+        metadata = {
+            'tabla': tabla,
+            'version': version,
+            'creado': datetime.now().isoformat(timespec='seconds'),
+            'data_version': data_version,
+            'filas': stats['filas'],
+            'columnas': esquema['columnas'],
+            'particiones': particiones,
+            'tipos_particion': {c: str(schema.field(c).type) for c in particiones},
+            'segundos': round(time.perf_counter() - inicio, 2)
+        }
+        (tmp_dir / "_metadata.json").write_text(json.dumps(metadata, ensure_ascii=False, indent=2))
+
+        os.replace(tmp_dir, tabla_dir / version)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    current = tabla_dir / "CURRENT"
+    tmp = current.with_name("CURRENT.tmp")
+    tmp.write_text(version)
+    os.replace(tmp, current)
+
+    _eliminar_versiones_antiguas(tabla_dir, version)
+    print(f"✅ Snapshot {tabla} {version}: {stats['filas']:,} filas en {metadata['segundos']}s")
+    return metadata
+
+
+def leer_snapshot(
+    tabla: str,
+    columnas: Optional[List[str]] = None,
+    filtros: Optional[Dict[str, Any]] = None,
+    engine=None,
+    max_age_horas: Optional[float] = 24,
+    root: Path = SNAPSHOT_ROOT,
+    arrow: bool = False
+):
+    """
+    Lee un snapshot con poda de columnas y particiones.
+
+    Args:
+        tabla: Tabla de SNAPSHOT_TABLAS
+        columnas: Columnas a leer (None = todas)
+        filtros: {columna: valor | [valores] | (operador, valor)}
+        engine: Engine para verificar la versión de datos (None = no verificar)
+        max_age_horas: Antigüedad máxima del snapshot (None = sin límite)
+        root: Directorio de snapshots
+        arrow: Devolver pyarrow.Table en lugar de DataFrame
+
+    Returns:
+        DataFrame (o pyarrow.Table) o None si no hay un snapshot vigente
+    """
+    metadata = _metadata_actual(tabla, root)
+    if metadata is None:
+        return None
+
+    if max_age_horas is not None:
+        edad = datetime.now() - datetime.fromisoformat(metadata['creado'])
+        if edad.total_seconds() > max_age_horas * 3600:
+            return None
+
+    if engine is not None and metadata['data_version'] is not None \
+            and not _version_vigente(engine, tabla, metadata['data_version']):
+        return None
+
+    try:
+        dataset = _dataset(Path(root) / tabla / metadata['version'], metadata['tipos_particion'])
+    except ImportError:
+        return None
+
+    columnas = columnas or metadata['columnas']
+    resultado = dataset.to_table(columns=columnas, filter=_expresion(filtros))
+    if arrow:
+        return resultado
+
+    df = resultado.to_pandas()
+    df.attrs['origen'] = f"snapshot {metadata['version']}"
+    return df
+
+
+def leer_tabla(
+    tabla: str,
+    columnas: Optional[List[str]] = None,
+    filtros: Optional[Dict[str, Any]] = None,
+    engine=None,
+    max_age_horas: Optional[float] = 24,
+    arrow: bool = False
+):
+    """
+    Lee una tabla desde su snapshot vigente o, si no lo hay, por SQL.
+
+    Args:
+        tabla: Nombre de la tabla
+        columnas: Columnas a leer (None = todas)
+        filtros: {columna: valor | [valores] | (operador, valor)}
+        engine: Engine SQLAlchemy (None = database.models.get_engine())
+        max_age_horas: Antigüedad máxima del snapshot
+        arrow: Devolver pyarrow.Table en lugar de DataFrame
+
+    Returns:
+        DataFrame (df.attrs['origen'] indica 'snapshot ...' o 'sql') o pyarrow.Table
+    """
+    engine = engine or _get_engine()
+
+    if tabla in SNAPSHOT_TABLAS:
+        df = leer_snapshot(tabla, columnas, filtros, engine, max_age_horas, arrow=arrow)
+        if df is not None:
+            return df
+
+    seleccion = ", ".join(columnas) if columnas else "*"
+    condiciones, params = _condiciones_sql(filtros)
+    where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    df = pd.read_sql_query(text(f"SELECT {seleccion} FROM {tabla}{where}"), engine, params=params)
+    if arrow:
+        return tabla_arrow(df, esquema_arrow(df, tipos_tabla(engine, tabla)))
+
+    df.attrs['origen'] = 'sql'
+    return df
+
+
+def version_datos(tabla: str, engine=None) -> Optional[str]:
+    """
+    Versión de datos actual de una tabla (consulta la BD como mucho cada VERSION_TTL).
+
+    Args:
+        tabla: Nombre de la tabla
+        engine: Engine SQLAlchemy (None = database.models.get_engine())
+
+    Returns:
+        Versión de datos o None si no se pudo obtener
+    """
+    ahora = time.monotonic()
+    cache = _versiones.get(tabla)
+
+    if cache is None or ahora - cache[1] > VERSION_TTL:
+        try:
+            cache = (version_tabla(engine or _get_engine(), tabla), ahora)
+        except Exception as e:
+            print(f"⚠️  No se pudo obtener la versión de datos de {tabla}: {e}")
+            cache = (None, ahora)
+        _versiones[tabla] = cache
+
+    return cache[0]
+
+
+def listar_snapshots(root: Path = SNAPSHOT_ROOT) -> List[Dict]:
+    """
+    Metadatos del snapshot actual de cada tabla.
+
+    Returns:
+        Lista de metadatos (tablas sin snapshot se omiten)
+    """
+    return [m for m in (_metadata_actual(t, root) for t in SNAPSHOT_TABLAS) if m is not None]
+
+
+# ============ INTERNOS ============
+
+_datasets: Dict[str, Any] = {}
+_versiones: Dict[str, tuple] = {}
+_lock = threading.Lock()
+
+
+def _get_engine():
+    from database.models import get_engine
+    return get_engine()
+
+
+def _metadata_actual(tabla: str, root: Path) -> Optional[Dict]:
+    current = Path(root) / tabla / "CURRENT"
+    if not current.exists():
+        return None
+    path = Path(root) / tabla / current.read_text().strip() / "_metadata.json"
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def _dataset(path: Path, tipos_particion: Dict[str, str]):
+    """Dataset memory-mapped (se abre una vez por versión en el proceso)."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    key = str(path)
+    with _lock:
+        if key not in _datasets:
+            esquema = pa.schema([(c, pa.type_for_alias(t)) for c, t in tipos_particion.items()])
+            _datasets[key] = ds.dataset(
+                key,
+                format='parquet',
+                filesystem=fs.LocalFileSystem(use_mmap=True),
+                partitioning=ds.partitioning(esquema, flavor='hive')
+            )
+        return _datasets[key]
+
+
+def _version_vigente(engine, tabla: str, data_version: str) -> bool:
+    """Compara la versión de datos del snapshot con la de la tabla."""
+    actual = version_datos(tabla, engine)
+
+    # Sin acceso a la BD se usa el snapshot (ya pasó el control de antigüedad)
+    return actual is None or actual == data_version
+
+
+def _expresion(filtros: Optional[Dict[str, Any]]):
+    """Filtros como expresión de pyarrow (poda de particiones y row groups)."""
+    import pyarrow.dataset as ds
+
+    expresion = None
+    for columna, valor in (filtros or {}).items():
+        campo = ds.field(columna)
+        if isinstance(valor, tuple):
+            operador, valor = valor
+            condicion = {
+                '==': campo == valor, '!=': campo != valor,
+                '>': campo > valor, '>=': campo >= valor,
+                '<': campo < valor, '<=': campo <= valor
+            }[operador]
+        elif isinstance(valor, (list, set)):
+            condicion = campo.isin(list(valor))
+        else:
+            condicion = campo == valor
+        expresion = condicion if expresion is None else expresion & condicion
+    return expresion
+
+
+def _condiciones_sql(filtros: Optional[Dict[str, Any]]):
+    """Mismos filtros como condiciones SQL con parámetros."""
+    condiciones, params = [], {}
+    for i, (columna, valor) in enumerate((filtros or {}).items()):
+        if isinstance(valor, tuple):
+            operador, valor = valor
+            condiciones.append(f"{columna} {OPERADORES[operador]} :p{i}")
+            params[f"p{i}"] = valor
+        elif isinstance(valor, (list, set)):
+            nombres = [f"p{i}_{j}" for j in range(len(valor))]
+            if not nombres:
+                condiciones.append("FALSE")
+                continue
+            condiciones.append(f"{columna} IN ({', '.join(':' + n for n in nombres)})")
+            params.update(zip(nombres, valor))
+        else:
+            condiciones.append(f"{columna} = :p{i}")
+            params[f"p{i}"] = valor
+    return condiciones, params
+
+
+def _encadenar(primero, resto):
+    yield primero
+    yield from resto
+
+
+def _eliminar_versiones_antiguas(tabla_dir: Path, actual: str) -> None:
+    versiones = sorted(p for p in tabla_dir.iterdir() if p.is_dir() and not p.name.startswith('.'))
+    for path in versiones[:-VERSIONES_CONSERVADAS]:
+        if path.name != actual:
+            shutil.rmtree(path, ignore_errors=True)
+            _datasets.pop(str(path), None)
+
+
+# Ejemplo de uso (se ejecuta al final del ETL)
+if __name__ == "__main__":
+    import sys
+
+    tablas = sys.argv[1:] or list(SNAPSHOT_TABLAS)
+    for nombre in tablas:
+        try:
+            crear_snapshot(nombre)
+        except Exception as e:
+            print(f"⚠️  No se pudo crear el snapshot de {nombre}: {e}")
@@ -0,0 +1,23 @@
+-- ============================================================================
+-- ÍNDICES POR COMPAÑÍA NORMALIZADA
+-- ============================================================================
+-- Los informes y el SQLTool filtran con LOWER(columna) = LOWER(:compania)
+-- (ai_modules/rag/sql_tool.py: company_filter). Un índice sobre la columna
+-- sin normalizar no sirve para ese predicado; estos índices de expresión
+-- convierten cada consulta por compañía (y año) en un index scan.
+--
+-- Se ejecuta al final del ETL y después de migrate_data.py (to_sql con
+-- if_exists='replace' recrea huella_concretos sin índices).
+-- ============================================================================
+
+-- Remitos individuales: productos y evolución temporal de los informes
+CREATE INDEX IF NOT EXISTS idx_remitos_concretos_compania_key
+    ON remitos_concretos (LOWER(compania), año);
+
+-- Agregados por origen/año: resumen, bandas y productos problemáticos
+CREATE INDEX IF NOT EXISTS idx_huella_concretos_origen_key
+    ON huella_concretos (LOWER(origen), año);
+
+-- Estadísticas de las expresiones indexadas para el planificador
+ANALYZE remitos_concretos;
+ANALYZE huella_concretos;
@@ -0,0 +1,28 @@
+-- ============================================================================
+-- ANOMALÍAS PRECALCULADAS DE REMITOS
+-- ============================================================================
+-- Resultado del scoring por lotes de AnomalyDetector sobre la tabla remitos
+-- (ai_modules/ml/anomaly_scoring.py). Una fila por remito puntuado.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS remitos_anomalias (
+    remito_id INTEGER PRIMARY KEY REFERENCES remitos(id) ON DELETE CASCADE,
+
+    -- Resultado del detector
+    anomaly_score REAL NOT NULL,         -- 0-1, 1 = más anómalo
+    is_anomaly BOOLEAN NOT NULL,
+    anomaly_reason TEXT,
+    isolation_score REAL,
+    max_zscore REAL,
+
+    -- Metadata
+    detector_version TEXT,
+    fecha_scoring TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Índices para dashboards de calidad de datos
+CREATE INDEX IF NOT EXISTS idx_remitos_anomalias_is_anomaly ON remitos_anomalias(is_anomaly);
+CREATE INDEX IF NOT EXISTS idx_remitos_anomalias_score ON remitos_anomalias(anomaly_score DESC);
+
+COMMENT ON TABLE remitos_anomalias IS 'Anomalías de huella CO2 precalculadas por AnomalyDetector (scoring incremental por id)';
+COMMENT ON COLUMN remitos_anomalias.detector_version IS 'Identificador del detector que generó el score (archivo + fecha de modificación)';